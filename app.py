@@ -1,9 +1,10 @@
-import os
-import base64
 import streamlit as st
 import pandas as pd
 from sqlalchemy import text
 from data.db import engine
+from services.media import icon_src
+from services.settings import get_active_tournament_id, set_active_tournament_id
+from services.tournament_data import start_change_watcher
 
 st.set_page_config(page_title="Padel Tournamemt Application", page_icon="🎾", layout="wide", initial_sidebar_state="collapsed")
 
@@ -23,12 +24,7 @@ st.caption("Scoring and scheduling dashboard combined with Organizer section")
 st.markdown("Select a page from the sidebar: Overview, Admin, Scoring, Scheduling.")
 st.markdown("</div>", unsafe_allow_html=True)
 
-def set_setting(key: str, value: str):
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("INSERT INTO settings(key, value) VALUES(:k, :v) ON CONFLICT(key) DO UPDATE SET value=:v"), {"k": key, "v": value})
-    except Exception:
-        pass
+start_change_watcher()
 
 # Handle deep-link selection via query param (?tid=123) using st.query_params
 try:
@@ -36,7 +32,7 @@ try:
     raw = qp.get("tid")
     tid_q = raw[0] if isinstance(raw, list) else raw
     if tid_q not in (None, ""):
-        set_setting("active_tournament_id", str(int(tid_q)))
+        set_active_tournament_id(int(tid_q))
         try:
             # clear params to avoid loops
             st.query_params.clear()
@@ -49,21 +45,6 @@ try:
 except Exception:
     pass
 
-def get_setting(key: str):
-    try:
-        with engine.begin() as conn:
-            row = conn.execute(text("SELECT value FROM settings WHERE key=:k"), {"k": key}).first()
-        return row[0] if row else None
-    except Exception:
-        return None
-
-def get_active_tournament_id():
-    v = get_setting("active_tournament_id")
-    try:
-        return int(v) if v not in (None, "", "null") else None
-    except Exception:
-        return None
-
 # If a tournament is selected, show its image at the top-right
 try:
     active_tid = get_active_tournament_id()
@@ -131,23 +112,12 @@ if not tournaments_df.empty:
             icon = (getattr(r, 'icon_path') or '').replace('\\','/')
             tid = getattr(r, 'tournament_id')
             href = f"/?tid={int(tid)}" if pd.notna(tid) else "#"
-            # Build <img> tag; if local path, embed as base64 so it renders inside HTML
+            # Build <img> tag from the 180px thumbnail rather than the full upload
             img_html = ''
             if icon:
                 try:
-                    if icon.startswith('http://') or icon.startswith('https://'):
-                        img_html = f"<img src=\"{icon}\">"
-                    else:
-                        # Resolve relative to project root
-                        # Resolve relative to the Padellers/ directory
-                        base_dir = os.path.abspath(os.path.dirname(__file__))
-                        abs_path = icon if os.path.isabs(icon) else os.path.abspath(os.path.join(base_dir, icon))
-                        with open(abs_path, 'rb') as f:
-                            data = base64.b64encode(f.read()).decode('utf-8')
-                        # Try infer mime by extension
-                        ext = os.path.splitext(abs_path)[1].lower()
-                        mime = 'image/png' if ext in ('.png', '') else 'image/jpeg'
-                        img_html = f"<img src=\"data:{mime};base64,{data}\">"
+                    src = icon_src(icon, 180)
+                    img_html = f"<img src=\"{src}\">" if src else ''
                 except Exception:
                     img_html = ''
             html.append(
@@ -207,20 +177,12 @@ if not tournaments_df.empty:
             desc = (getattr(r, 'description') or '')
             icon = (getattr(r, 'icon_path') or '').replace('\\','/')
             tid = getattr(r, 'tournament_id')
-            # Images: same base64 logic as above
+            # Images: same thumbnail logic as above (held cards are 160px, the 180px variant covers them)
             img_html = ''
             if icon:
                 try:
-                    if icon.startswith('http://') or icon.startswith('https://'):
-                        img_html = f"<img src=\"{icon}\">"
-                    else:
-                        base_dir = os.path.abspath(os.path.dirname(__file__))
-                        abs_path = icon if os.path.isabs(icon) else os.path.abspath(os.path.join(base_dir, icon))
-                        with open(abs_path, 'rb') as f:
-                            data = base64.b64encode(f.read()).decode('utf-8')
-                        ext = os.path.splitext(abs_path)[1].lower()
-                        mime = 'image/png' if ext in ('.png', '') else 'image/jpeg'
-                        img_html = f"<img src=\"data:{mime};base64,{data}\">"
+                    src = icon_src(icon, 180)
+                    img_html = f"<img src=\"{src}\">" if src else ''
                 except Exception:
                     img_html = ''
             html_h.append(
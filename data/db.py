@@ -1,12 +1,104 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 from .models import Base
+from .migrations import migrate
 
 DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///" + os.path.join(os.getcwd(), "padel.db")
+# Optional replica for viewer reads (Postgres); defaults to the primary database
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
 
-engine = create_engine(DATABASE_URL, future=True)
+POOL_SIZE = int(os.getenv("PADEL_DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("PADEL_DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("PADEL_DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("PADEL_DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("PADEL_DB_STATEMENT_TIMEOUT_MS", "15000"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("PADEL_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Viewer sessions only read, so the read pool can be larger than the write pool
+READ_POOL_SIZE = int(os.getenv("PADEL_DB_READ_POOL_SIZE", str(POOL_SIZE * 2)))
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and (url.database or ":memory:") == ":memory:"
+
+
+def _sqlite_pragmas(engine: Engine, readonly: bool) -> None:
+    memory = _is_memory_sqlite(engine.url)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            # WAL lets viewers read while the organizer writes; NORMAL is durable enough under WAL
+            if not memory:
+                cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            if readonly:
+                cur.execute("PRAGMA query_only=ON")
+        finally:
+            cur.close()
+
+
+def make_engine(url: str, readonly: bool = False) -> Engine:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "sqlite":
+        kwargs = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if not _is_memory_sqlite(u):
+            kwargs.update(
+                pool_size=READ_POOL_SIZE if readonly else POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+            )
+        engine = create_engine(u, future=True, **kwargs)
+        _sqlite_pragmas(engine, readonly)
+        return engine
+    kwargs = {
+        "pool_size": READ_POOL_SIZE if readonly else POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if backend == "postgresql" and STATEMENT_TIMEOUT_MS > 0:
+        kwargs["connect_args"] = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"}
+    return create_engine(u, future=True, **kwargs)
+
+
+engine = make_engine(DATABASE_URL)
+if DATABASE_READ_URL:
+    read_engine = make_engine(DATABASE_READ_URL, readonly=True)
+elif engine.dialect.name == "sqlite" and not _is_memory_sqlite(engine.url):
+    read_engine = make_engine(DATABASE_URL, readonly=True)
+else:
+    read_engine = engine
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+
+def pool_stats() -> dict[str, dict]:
+    # Connection usage per engine, for spotting pool exhaustion under many sessions
+    out = {}
+    for name, eng in (("write", engine), ("read", read_engine)):
+        if name == "read" and eng is engine:
+            continue
+        pool = eng.pool
+        stats = {"class": type(pool).__name__, "status": pool.status()}
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, attr, None)
+            if callable(fn):
+                stats[attr] = fn()
+        out[name] = stats
+    return out
+
+
+_migrated = False
+
 def init_db() -> None:
+    global _migrated
     Base.metadata.create_all(bind=engine)
+    # Schema upgrades only need to run once per process, not on every Streamlit rerun
+    if not _migrated:
+        migrate(engine)
+        _migrated = True
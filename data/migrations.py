@@ -0,0 +1,66 @@
+import pandas as pd
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from .models import Base
+from .repository import _q, ensure_columns, insert_rows
+
+
+def _needs_rebuild(conn: Connection, table: Table) -> bool:
+    insp = inspect(conn)
+    existing = {c["name"]: c for c in insp.get_columns(table.name)}
+    pk = set(insp.get_pk_constraint(table.name).get("constrained_columns") or [])
+    declared_pk = {c.name for c in table.primary_key.columns}
+    # Columns declared NOT NULL that still accept NULLs (e.g. the old nullable tournament_id keys)
+    loose = [c.name for c in table.columns if not c.nullable and existing.get(c.name, {}).get("nullable")]
+    return not {c.name for c in table.columns} <= set(existing) or pk != declared_pk or bool(loose)
+
+
+def _active_tournament_id(conn: Connection):
+    try:
+        row = conn.execute(text("SELECT value FROM settings WHERE key='active_tournament_id'")).first()
+        return int(row[0]) if row and row[0] not in (None, "", "null") else None
+    except Exception:
+        return None
+
+
+def _rebuild(conn: Connection, table: Table) -> int:
+    # Tables written by to_sql(if_exists="replace") lost their keys and may lack tournament_id;
+    # copy the rows into a freshly created table with the declared schema. Columns the model
+    # does not declare are carried over as they are.
+    old = pd.read_sql(text(f"SELECT * FROM {_q(table.name)}"), conn)
+    if "tournament_id" in table.columns:
+        if "tournament_id" not in old.columns:
+            old["tournament_id"] = None
+        # Pages fell back to unfiltered reads for rows without a tournament, so they belonged to
+        # the active tournament
+        active = _active_tournament_id(conn)
+        if active is not None:
+            old["tournament_id"] = old["tournament_id"].fillna(active)
+        orphans = int(old["tournament_id"].isna().sum())
+        if orphans:
+            raise RuntimeError(
+                f"{orphans} row(s) in {table.name} have no tournament_id and no tournament is active. "
+                f"Set tournament_id on those rows (or the active_tournament_id setting) and restart."
+            )
+    pk = [c.name for c in table.primary_key.columns]
+    old = old.dropna(subset=pk).drop_duplicates(subset=pk, keep="last")
+    conn.execute(text(f"DROP TABLE {_q(table.name)}"))
+    table.create(conn)
+    ensure_columns(conn, table.name, old)
+    return insert_rows(conn, table.name, old)
+
+
+def migrate(engine: Engine) -> list[str]:
+    # Bring existing padel.db / Postgres tables up to the declared schema; returns the rebuilt tables
+    rebuilt = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspect(conn).has_table(table.name):
+                continue
+            if _needs_rebuild(conn, table):
+                _rebuild(conn, table)
+                rebuilt.append(table.name)
+            else:
+                for ix in table.indexes:
+                    ix.create(conn, checkfirst=True)
+    return rebuilt
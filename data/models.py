@@ -1,20 +1,35 @@
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, DateTime, Float, Index, Integer, LargeBinary, String, Text
 
 Base = declarative_base()
 
+class Tournament(Base):
+    __tablename__ = "tournaments"
+    tournament_id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(255))
+    location = Column(String(255))
+    start_date = Column(DateTime)
+    end_date = Column(DateTime)
+    description = Column(Text)
+    icon_path = Column(Text)
+
 class Team(Base):
     __tablename__ = "teams"
-    team_id = Column(Integer, primary_key=True)
+    tournament_id = Column(Integer, primary_key=True, autoincrement=False, nullable=False)
+    team_id = Column(Integer, primary_key=True, autoincrement=False)
     team_name = Column(String(255))
     player1 = Column(String(255))
     player2 = Column(String(255))
     group = Column(String(50))
     seed = Column(Integer)
+    __table_args__ = (
+        Index("ix_teams_tournament_group", "tournament_id", "group"),
+    )
 
 class Match(Base):
     __tablename__ = "matches"
-    match_id = Column(Integer, primary_key=True)
+    tournament_id = Column(Integer, primary_key=True, autoincrement=False, nullable=False)
+    match_id = Column(Integer, primary_key=True, autoincrement=False)
     group = Column(String(50))
     team1_id = Column(Integer)
     team2_id = Column(Integer)
@@ -25,8 +40,101 @@ class Match(Base):
     set2_t2 = Column(Integer)
     set3_t1 = Column(Integer)
     set3_t2 = Column(Integer)
+    # Filled by the scheduler: round within the group, court number and time slot
+    round_no = Column(Integer)
+    court = Column(Integer)
+    slot = Column(Integer)
+    scheduled_at = Column(DateTime)
+    # Knockout matches: stage is set (NULL for group matches) and the winner/loser pointers
+    # name the match and side (1 or 2) each of them moves on to
+    stage = Column(String(50))
+    next_match_id = Column(Integer)
+    next_slot = Column(Integer)
+    loser_next_match_id = Column(Integer)
+    loser_next_slot = Column(Integer)
+    __table_args__ = (
+        Index("ix_matches_tournament_group", "tournament_id", "group"),
+        Index("ix_matches_tournament_status", "tournament_id", "status"),
+        Index("ix_matches_tournament_team1", "tournament_id", "team1_id"),
+        Index("ix_matches_tournament_team2", "tournament_id", "team2_id"),
+    )
 
 class Setting(Base):
     __tablename__ = "settings"
     key = Column(String(255), primary_key=True)
     value = Column(Text)
+
+class TeamStanding(Base):
+    __tablename__ = "team_standings"
+    tournament_id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, primary_key=True)
+    played = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    losses = Column(Integer, default=0)
+    sets_won = Column(Integer, default=0)
+    sets_lost = Column(Integer, default=0)
+    games_won = Column(Integer, default=0)
+    games_lost = Column(Integer, default=0)
+    points = Column(Integer, default=0)
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    scope = Column(String(255), primary_key=True)
+    version = Column(Integer, default=0)
+
+class Player(Base):
+    __tablename__ = "players"
+    player_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(255))
+    # Normalized name (see services.players.player_key); teams refer to players by name
+    name_key = Column(String(255), nullable=False)
+    __table_args__ = (
+        Index("ux_players_name_key", "name_key", unique=True),
+    )
+
+class PlayerStats(Base):
+    __tablename__ = "player_stats"
+    # Career totals over every tournament, maintained incrementally like team_standings
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+    matches = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    losses = Column(Integer, default=0)
+    sets_won = Column(Integer, default=0)
+    sets_lost = Column(Integer, default=0)
+    games_won = Column(Integer, default=0)
+    games_lost = Column(Integer, default=0)
+    rating = Column(Float)
+    rated_matches = Column(Integer, default=0)
+    __table_args__ = (
+        Index("ix_player_stats_rating", "rating"),
+    )
+
+class PlayerRatingEvent(Base):
+    __tablename__ = "player_rating_events"
+    # Rating change each completed match gave each player, so a corrected result can be undone
+    tournament_id = Column(Integer, primary_key=True, autoincrement=False)
+    match_id = Column(Integer, primary_key=True, autoincrement=False)
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+    delta = Column(Float)
+
+class TeamRating(Base):
+    __tablename__ = "team_ratings"
+    # A team across tournaments is its pair of players (player_b_id = 0 for a one-player entry)
+    player_a_id = Column(Integer, primary_key=True, autoincrement=False)
+    player_b_id = Column(Integer, primary_key=True, autoincrement=False)
+    rating = Column(Float)
+    rated_matches = Column(Integer, default=0)
+
+class RatingDirty(Base):
+    __tablename__ = "ratings_dirty"
+    # Tournaments whose ratings changed since the last batch run of services.rating_job
+    tournament_id = Column(Integer, primary_key=True, autoincrement=False)
+
+class RatingCheckpoint(Base):
+    __tablename__ = "rating_checkpoints"
+    # Rating state before the tournament at `position` in play order, written by services.rating_job
+    position = Column(Integer, primary_key=True, autoincrement=False)
+    tournament_id = Column(Integer)
+    order_hash = Column(String(64))
+    created_at = Column(DateTime)
+    state = Column(LargeBinary)
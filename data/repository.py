@@ -0,0 +1,246 @@
+import datetime as dt
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        # Nullable integer columns arrive as float64 from read_sql
+        vals = series.dropna()
+        return "INTEGER" if len(vals) and (vals == np.floor(vals)).all() else "FLOAT"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _to_param(v):
+    if v is None or v is pd.NaT:
+        return None
+    if isinstance(v, (float, np.floating)):
+        if np.isnan(v):
+            return None
+        return int(v) if float(v).is_integer() else float(v)
+    if isinstance(v, np.integer):
+        return int(v)
+    if isinstance(v, np.bool_):
+        return bool(v)
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    if isinstance(v, (str, int, bool, dt.date, dt.datetime)):
+        return v
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return v
+
+
+def _normalize(series: pd.Series) -> pd.Series:
+    # Comparable representation: numbers as float, datetimes as Timestamp, rest as str, missing as NaN
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    num = pd.to_numeric(series, errors="coerce")
+    if (num.notna() | series.isna()).all():
+        return num.astype("float64")
+    return series.astype(object).where(series.notna(), np.nan).map(lambda v: v if isinstance(v, float) else str(v))
+
+
+def table_columns(conn: Connection, table: str) -> list[str]:
+    insp = inspect(conn)
+    if not insp.has_table(table):
+        return []
+    return [c["name"] for c in insp.get_columns(table)]
+
+
+def ensure_columns(conn: Connection, table: str, df: pd.DataFrame, extra: dict | None = None) -> list[str]:
+    # Add columns present in df (or extra) but missing from an existing table; returns the final column list
+    existing = table_columns(conn, table)
+    for col in list(df.columns) + list((extra or {}).keys()):
+        if col in existing:
+            continue
+        sql_type = _sql_type(df[col]) if col in df.columns else "INTEGER"
+        conn.execute(text(f"ALTER TABLE {_q(table)} ADD COLUMN {_q(col)} {sql_type}"))
+        existing.append(col)
+    return existing
+
+
+def _where(scope: dict | None, params: dict) -> str:
+    clauses = []
+    for i, (col, val) in enumerate((scope or {}).items()):
+        if val is None:
+            clauses.append(f"{_q(col)} IS NULL")
+        else:
+            params[f"_s{i}"] = _to_param(val)
+            clauses.append(f"{_q(col)} = :_s{i}")
+    return (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+
+def read_rows(conn: Connection, table: str, scope: dict | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+    params: dict = {}
+    cols = ", ".join(_q(c) for c in columns) if columns else "*"
+    return pd.read_sql(text(f"SELECT {cols} FROM {_q(table)}" + _where(scope, params)), conn, params=params)
+
+
+def insert_rows(conn: Connection, table: str, df: pd.DataFrame, scope: dict | None = None) -> int:
+    if df.empty:
+        return 0
+    df = df.assign(**(scope or {}))
+    if not inspect(conn).has_table(table):
+        df.to_sql(table, conn, index=False)
+        return len(df)
+    ensure_columns(conn, table, df)
+    cols = list(df.columns)
+    sql = text(
+        f"INSERT INTO {_q(table)} (" + ", ".join(_q(c) for c in cols) + ") VALUES ("
+        + ", ".join(f":p{i}" for i in range(len(cols))) + ")"
+    )
+    conn.execute(sql, [{f"p{i}": _to_param(v) for i, v in enumerate(row)} for row in df.itertuples(index=False, name=None)])
+    return len(df)
+
+
+def sync_rows(
+    conn: Connection,
+    table: str,
+    df: pd.DataFrame,
+    key: str,
+    scope: dict | None = None,
+    stored: pd.DataFrame | None = None,
+    deletable: Iterable | None = None,
+) -> tuple[dict[str, int], pd.DataFrame]:
+    # Make the rows of `table` within `scope` match `df`, keyed by `key`. Only rows whose
+    # values differ are written, each kind as one batched statement on the caller's
+    # connection (wrap in engine.begin() for one transaction). `deletable` limits deletes
+    # to the given keys, e.g. the rows that were visible in a filtered editor. Returns the
+    # counts and the rows the table now holds for df: rows without a key are dropped and a
+    # repeated key keeps its last row.
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0, "skipped": 0}
+    scope = scope or {}
+    df = df.drop(columns=[c for c in scope if c in df.columns])
+    keys = pd.to_numeric(df[key], errors="coerce") if key in df.columns else pd.Series(np.nan, index=df.index)
+    counts["skipped"] = int(keys.isna().sum())
+    df = df[keys.notna()].assign(**{key: keys[keys.notna()]}).drop_duplicates(subset=[key], keep="last")
+
+    if not inspect(conn).has_table(table):
+        counts["inserted"] = insert_rows(conn, table, df, scope)
+        return counts, df
+    ensure_columns(conn, table, df, scope)
+    if stored is None:
+        stored = read_rows(conn, table, scope)
+    stored = stored.assign(**{key: pd.to_numeric(stored[key], errors="coerce")}).dropna(subset=[key])
+
+    new = df.set_index(key)
+    old = stored.drop(columns=[c for c in scope if c in stored.columns]).set_index(key)
+    new_keys = new.index.difference(old.index)
+    gone_keys = old.index.difference(new.index)
+    if deletable is not None:
+        gone_keys = gone_keys.intersection(pd.Index(pd.to_numeric(pd.Series(list(deletable)), errors="coerce").dropna()))
+    both = new.index.intersection(old.index)
+
+    cols = [c for c in new.columns if c in old.columns]
+    changed = pd.Series(False, index=both)
+    for c in cols:
+        a = new.loc[both, c]
+        b = old.loc[both, c]
+        if pd.api.types.is_datetime64_any_dtype(a) != pd.api.types.is_datetime64_any_dtype(b):
+            a = pd.to_datetime(a, errors="coerce"); b = pd.to_datetime(b, errors="coerce")
+        a = _normalize(a); b = _normalize(b)
+        same = (a == b) | (a.isna() & b.isna())
+        changed |= ~same.to_numpy()
+    upd_keys = both[changed.to_numpy()]
+    counts["unchanged"] = len(both) - len(upd_keys)
+
+    params: dict = {}
+    where = _where(scope, params)
+    key_clause = (" AND " if where else " WHERE ") + f"{_q(key)} = :_key"
+    if len(gone_keys):
+        conn.execute(
+            text(f"DELETE FROM {_q(table)}" + where + key_clause),
+            [{**params, "_key": _to_param(k)} for k in gone_keys],
+        )
+        counts["deleted"] = len(gone_keys)
+    if len(upd_keys):
+        set_sql = ", ".join(f"{_q(c)} = :p{i}" for i, c in enumerate(new.columns))
+        conn.execute(
+            text(f"UPDATE {_q(table)} SET {set_sql}" + where + key_clause),
+            [
+                {**params, "_key": _to_param(k), **{f"p{i}": _to_param(v) for i, v in enumerate(row)}}
+                for k, row in zip(upd_keys, new.loc[upd_keys].itertuples(index=False, name=None))
+            ],
+        )
+        counts["updated"] = len(upd_keys)
+    if len(new_keys):
+        counts["inserted"] = insert_rows(conn, table, new.loc[new_keys].reset_index(), scope)
+    return counts, df
+
+
+def _same(conn: Connection, a: str, b: str) -> str:
+    # Null-safe equality
+    if conn.dialect.name == "sqlite":
+        return f"{a} IS {b}"
+    return f"{a} IS NOT DISTINCT FROM {b}"
+
+
+def merge_rows(conn: Connection, table: str, df: pd.DataFrame, key: str, scope: dict | None = None) -> dict[str, int]:
+    # Upsert `df` into the rows of `table` within `scope`, keyed by `key`, without touching
+    # rows that are not in `df`. The rows are staged in a temp table and merged with one
+    # INSERT ... SELECT ... ON CONFLICT, which needs a unique index on the scope columns + key.
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    scope = scope or {}
+    df = df.drop(columns=[c for c in scope if c in df.columns])
+    keys = pd.to_numeric(df[key], errors="coerce") if key in df.columns else pd.Series(np.nan, index=df.index)
+    counts["skipped"] = int(keys.isna().sum())
+    df = df[keys.notna()].assign(**{key: keys[keys.notna()]}).drop_duplicates(subset=[key], keep="last")
+    if df.empty:
+        return counts
+    if not inspect(conn).has_table(table):
+        counts["inserted"] = insert_rows(conn, table, df, scope)
+        return counts
+    ensure_columns(conn, table, df, scope)
+
+    target = list(scope) + [key]
+    cols = target + [c for c in df.columns if c != key]
+    values = [c for c in cols if c not in target]
+    stage = _q(f"_stage_{table}")
+    col_sql = ", ".join(_q(c) for c in cols)
+    conn.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+    conn.execute(text(f"CREATE TEMPORARY TABLE {stage} AS SELECT {col_sql} FROM {_q(table)} WHERE 1 = 0"))
+    try:
+        staged = df.assign(**scope)[cols]
+        conn.execute(
+            text(f"INSERT INTO {stage} ({col_sql}) VALUES (" + ", ".join(f":p{i}" for i in range(len(cols))) + ")"),
+            [{f"p{i}": _to_param(v) for i, v in enumerate(row)} for row in staged.itertuples(index=False, name=None)],
+        )
+        on_key = " AND ".join(_same(conn, f"t.{_q(c)}", f"s.{_q(c)}") for c in target)
+        all_same = " AND ".join(_same(conn, f"t.{_q(c)}", f"s.{_q(c)}") for c in values) or "1 = 1"
+        existing, unchanged = conn.execute(text(
+            f"SELECT COUNT(*), COALESCE(SUM(CASE WHEN {all_same} THEN 1 ELSE 0 END), 0) "
+            f"FROM {stage} s JOIN {_q(table)} t ON {on_key}"
+        )).one()
+        counts["inserted"] = len(df) - int(existing)
+        counts["unchanged"] = int(unchanged)
+        counts["updated"] = int(existing) - int(unchanged)
+        if values:
+            changed = " AND ".join(_same(conn, f"{_q(table)}.{_q(c)}", f"excluded.{_q(c)}") for c in values)
+            action = "DO UPDATE SET " + ", ".join(f"{_q(c)} = excluded.{_q(c)}" for c in values) + f" WHERE NOT ({changed})"
+        else:
+            action = "DO NOTHING"
+        # "WHERE 1 = 1" keeps SQLite from parsing ON CONFLICT as part of the SELECT
+        conn.execute(text(
+            f"INSERT INTO {_q(table)} ({col_sql}) SELECT {col_sql} FROM {stage} WHERE 1 = 1 "
+            f"ON CONFLICT ({', '.join(_q(c) for c in target)}) {action}"
+        ))
+    finally:
+        conn.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+    return counts
@@ -1,68 +1,61 @@
 import pandas as pd
-import json
 import streamlit as st
-from sqlalchemy import text
-from data.db import engine, init_db
-from services.standings import compute_standings
+from services.bootstrap import init_app
+from services import cache
+from services.media import icon_src
+from services.settings import get_active_tournament_id, get_json_setting
+from services.ranking import STANDINGS_DEFAULT_COLS, STANDINGS_EXTRA_COLS, format_delta
+from services.clinch import STATUS_LABELS
+from services.simulation import N_SIMULATIONS, qualify_probability
+from services.tournament_data import (
+    count_open_fixtures, get_leaderboard, get_leaderboard_normalization, get_matches, get_qualification_odds, get_qualification_status, get_qualifiers_per_group,
+    get_standings, get_teams, get_tournament, start_change_watcher, tournament_scope, view_version,
+)
+from services.standings import summarize_matches
+from services.table_html import cached_table_html
 try:
     from streamlit_autorefresh import st_autorefresh
 except Exception:
     st_autorefresh = None
 
-init_db()
+init_app()
+start_change_watcher()
+
+# Seconds between the in-memory version checks that decide whether the page must rerun
+VERSION_CHECK_SECONDS = 2
 
 st.set_page_config(page_title="Legends on Court Tournament - Overview", page_icon="🎾", layout="wide", initial_sidebar_state="collapsed")
 
 ## Title will be set dynamically after resolving active tournament
 
-def get_setting(key: str):
-    try:
-        with engine.begin() as conn:
-            row = conn.execute(text("SELECT value FROM settings WHERE key=:k"), {"k": key}).first()
-        return row[0] if row else None
-    except Exception:
-        return None
-
-def set_setting(key: str, value: str):
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("INSERT INTO settings(key, value) VALUES(:k, :v) ON CONFLICT(key) DO UPDATE SET value=:v"), {"k": key, "v": value})
-    except Exception:
-        pass
-
-def get_active_tournament_id():
-    v = get_setting("active_tournament_id")
-    try:
-        return int(v) if v not in (None, "", "null") else None
-    except Exception:
-        return None
-
-def set_active_tournament_id(tid):
-    set_setting("active_tournament_id", "" if tid in (None, "") else str(int(tid)))
-
 ## Title placeholder (set below after fetching active tournament)
 
 ## Tournaments block removed from Overview; selection is done on App page
 
 active_tid = get_active_tournament_id()
+# Captured before any data is read so a concurrent write always triggers a rerun
+rendered_version = view_version(active_tid)
+# Same for the process cache: table markup is only memoized while this is still current
+data_version = cache.data_version(tournament_scope(active_tid))
+# Odds come from a background simulation; the page reruns when a newer result lands
+odds, odds_fresh = get_qualification_odds(active_tid)
 # Set dynamic title based on selected tournament and show a top info card
 title_text = "Overview"
 card = {}
 try:
-    if active_tid is not None:
-        tinfo = pd.read_sql(text("SELECT name, location, start_date, end_date, description, icon_path FROM tournaments WHERE tournament_id = :tid"), engine, params={"tid": active_tid})
-        if not tinfo.empty:
-            tname = str(tinfo.loc[0, "name"]) if "name" in tinfo.columns else "Tournament"
-            tloc = str(tinfo.loc[0, "location"]) if "location" in tinfo.columns and pd.notna(tinfo.loc[0, "location"]) else ""
-            title_text = f"{tname} — Overview" if not tloc else f"{tname} @ {tloc} — Overview"
-            card = {
-                "name": tname,
-                "location": tloc,
-                "start": tinfo.loc[0, "start_date"] if "start_date" in tinfo.columns else None,
-                "end": tinfo.loc[0, "end_date"] if "end_date" in tinfo.columns else None,
-                "desc": str(tinfo.loc[0, "description"]) if "description" in tinfo.columns and pd.notna(tinfo.loc[0, "description"]) else "",
-                "icon": str(tinfo.loc[0, "icon_path"]) if "icon_path" in tinfo.columns and pd.notna(tinfo.loc[0, "icon_path"]) else "",
-            }
+    tinfo = get_tournament(active_tid)
+    if tinfo:
+        tname = str(tinfo.get("name")) if "name" in tinfo else "Tournament"
+        tloc = str(tinfo.get("location")) if pd.notna(tinfo.get("location")) else ""
+        title_text = f"{tname} — Overview" if not tloc else f"{tname} @ {tloc} — Overview"
+        card = {
+            "name": tname,
+            "location": tloc,
+            "start": tinfo.get("start_date"),
+            "end": tinfo.get("end_date"),
+            "desc": str(tinfo.get("description")) if pd.notna(tinfo.get("description")) else "",
+            "icon": str(tinfo.get("icon_path")) if pd.notna(tinfo.get("icon_path")) else "",
+        }
 except Exception:
     pass
 st.title(title_text)
@@ -70,7 +63,16 @@ st.markdown(
     f"<div style='color:#ffffff;font-size:1.1rem;'>Last updated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}</div>",
     unsafe_allow_html=True,
 )
-if st_autorefresh is not None:
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=VERSION_CHECK_SECONDS)
+    def _watch_for_updates():
+        # Only the fragment runs on the timer; the full page reruns when the data version moves
+        if view_version(active_tid) != rendered_version:
+            st.rerun()
+        if not odds_fresh and get_qualification_odds(active_tid)[1]:
+            st.rerun()
+    _watch_for_updates()
+elif st_autorefresh is not None:
     st_autorefresh(interval=10000, key="overview_auto")
 
 # Top card mirroring the App selection card
@@ -94,25 +96,12 @@ if card:
         """,
         unsafe_allow_html=True,
     )
-    import os, base64
     icon = (card.get("icon") or "").replace("\\", "/")
     img_html = ""
     if icon:
         try:
-            if icon.startswith("http://") or icon.startswith("https://"):
-                img_html = f"<img src=\"{icon}\">"
-            else:
-                # Resolve relative to project root (Padellers/), not pages/
-                project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-                abs_path = icon if os.path.isabs(icon) else os.path.abspath(os.path.join(project_root, icon))
-                if os.path.exists(abs_path):
-                    with open(abs_path, "rb") as f:
-                        data = base64.b64encode(f.read()).decode("utf-8")
-                    ext = os.path.splitext(abs_path)[1].lower()
-                    mime = 'image/png' if ext in ('.png', '') else ('image/jpeg' if ext in ('.jpg', '.jpeg') else 'image/png')
-                    img_html = f"<img src=\"data:{mime};base64,{data}\">"
-                else:
-                    img_html = ""
+            src = icon_src(icon, 220)
+            img_html = f"<img src=\"{src}\">" if src else ""
         except Exception:
             img_html = ""
     html = [
@@ -128,27 +117,9 @@ if card:
     ]
     st.markdown("\n".join(html), unsafe_allow_html=True)
 ## Top card added above; refresh stays active
-try:
-    if active_tid is None:
-        teams_df = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed FROM teams"), engine)
-    else:
-        try:
-            teams_df = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed FROM teams WHERE tournament_id = :tid"), engine, params={"tid": active_tid})
-        except Exception:
-            teams_df = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed FROM teams"), engine)
-except Exception:
-    teams_df = pd.DataFrame(columns=["team_id", "team_name", "player1", "player2", "group", "seed"])
-
-try:
-    if active_tid is None:
-        matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches"), engine)
-    else:
-        try:
-            matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches WHERE tournament_id = :tid"), engine, params={"tid": active_tid})
-        except Exception:
-            matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches"), engine)
-except Exception:
-    matches_df = pd.DataFrame(columns=["match_id", "group", "team1_id", "team2_id", "status", "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2"])
+# Shared across sessions and invalidated by Organizer writes; treat as read-only
+teams_df = get_teams(active_tid)
+matches_df = get_matches(active_tid)
 
 st.markdown(
     """
@@ -184,119 +155,97 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-def render_table(df: pd.DataFrame, columns: list[str], headers: list[str]):
-    safe_df = df.copy() if not df.empty else pd.DataFrame(columns=columns)
-    safe_df = safe_df.reindex(columns=columns)
-    html = [
-        "<div class='table-outer'>",
-        "<div class='table-wrap'>",
-        "<div class='table-scroll'>",
-        "<div class='table-inner'>",
-        f"<table class='custom'>",
-        "<thead><tr>"
-    ]
-    for h in headers:
-        html.append(f"<th>{h}</th>")
-    html.append("</tr></thead><tbody>")
-    for _, r in safe_df.iterrows():
-        html.append("<tr>")
-        for c in columns:
-            v = r.get(c, "")
-            html.append(f"<td>{'' if pd.isna(v) else v}</td>")
-        html.append("</tr>")
-    html.append("</tbody></table></div></div></div></div>")
-    st.markdown("\n".join(html), unsafe_allow_html=True)
+def render_table(df: pd.DataFrame, columns: list[str], headers: list[str], name: str):
+    # Markup is cached per tournament data version; an unchanged refresh reuses it
+    html = cached_table_html(tournament_scope(active_tid), name, df, columns, headers, data_version)
+    st.markdown(html, unsafe_allow_html=True)
 
-def get_json_setting(key: str):
-    try:
-        with engine.begin() as conn:
-            row = conn.execute(text("SELECT value FROM settings WHERE key=:k"), {"k": key}).first()
-        if not row or not row[0]:
-            return None
-        try:
-            return json.loads(row[0])
-        except Exception:
-            return None
-    except Exception:
-        return None
-
-if not teams_df.empty:
-    standings = compute_standings(teams_df, matches_df)
-else:
-    standings = pd.DataFrame()
+standings = get_standings(active_tid)
 
 played = pd.DataFrame()
 if not matches_df.empty:
     mm = matches_df.copy()
     mm["has_score"] = mm[["set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2"]].notna().any(axis=1)
     played_df = mm[(mm["status"] == "Completed") | (mm["has_score"])].copy()
-    label = (
-        teams_df.assign(
-            _lab=(teams_df["team_name"].fillna("")
-                  .where(teams_df["team_name"].fillna("").str.len() > 0,
-                         teams_df["player1"].fillna("") + " vs " + teams_df["player2"].fillna("")))
-        )[["team_id", "_lab"]]
-        if not teams_df.empty else pd.DataFrame(columns=["team_id", "_lab"])
-    )
-    id2lab = dict(zip(label["team_id"], label["_lab"]))
-    rows = []
-    for _, m in played_df.iterrows():
-        t1 = m.get("team1_id"); t2 = m.get("team2_id")
-        t1l = id2lab.get(int(t1)) if pd.notna(t1) else "?"
-        t2l = id2lab.get(int(t2)) if pd.notna(t2) else "?"
-        t1_sets = t2_sets = 0
-        gw1 = gw2 = 0
-        for a, b in [
-            (m.get("set1_t1"), m.get("set1_t2")),
-            (m.get("set2_t1"), m.get("set2_t2")),
-            (m.get("set3_t1"), m.get("set3_t2")),
-        ]:
-            if pd.isna(a) or pd.isna(b):
-                continue
-            if a > b:
-                t1_sets += 1
-            elif b > a:
-                t2_sets += 1
-            gw1 += int(a); gw2 += int(b)
-        rows.append({
-            "MatchId": int(m.get("match_id")) if pd.notna(m.get("match_id")) else "",
-            "Court": m.get("group", ""),
-            "Players": f"{t1l} vs {t2l}",
-            "Sets": f"{t1_sets} - {t2_sets}",
-            "Games": f"{gw1} : {gw2}",
-            "Status": m.get("status", ""),
-        })
-    played = pd.DataFrame(rows)
+    res = summarize_matches(played_df, teams_df)
+    played = pd.DataFrame({
+        "MatchId": pd.to_numeric(played_df["match_id"], errors="coerce").astype("Int64").to_numpy(),
+        "Court": played_df["group"].to_numpy(),
+        "Players": (res["team1_label"] + " vs " + res["team2_label"]).to_numpy(),
+        "Sets": (res["t1_sets"].astype(str) + " - " + res["t2_sets"].astype(str)).to_numpy(),
+        "Games": (res["t1_games"].astype(str) + " : " + res["t2_games"].astype(str)).to_numpy(),
+        "Status": played_df["status"].to_numpy(),
+    })
 
 st.markdown("<div class='section-title'>▶ Played Matches</div>", unsafe_allow_html=True)
 played_all_cols = ["MatchId", "Court", "Players", "Sets", "Games", "Status"]
 played_cols = get_json_setting("visible_cols_played") or played_all_cols
 played_labels_map = get_json_setting("header_labels_played") or {}
 played_headers = [played_labels_map.get(c, c) for c in played_cols]
-render_table(played, played_cols, played_headers)
+render_table(played, played_cols, played_headers, "played")
 
 st.markdown("<div class='section-title'>🏆 Winner Board / Standings</div>", unsafe_allow_html=True)
-leaderboard = (
-    standings.sort_values(by=["points", "wins", "sets_diff", "games_diff"], ascending=[False, False, False, False])
-    .reset_index(drop=True)
-    if not standings.empty else pd.DataFrame()
-)
-if not leaderboard.empty:
-    leaderboard.insert(0, "Rank", leaderboard.index + 1)
-    winners = leaderboard[[
-        "Rank", "team_name", "played", "wins", "losses", "points"
-    ]].copy()
-    winners.columns = [
-        "Rank", "Team", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"
-    ]
+standings_all_cols = STANDINGS_DEFAULT_COLS + STANDINGS_EXTRA_COLS
+board_norm = get_leaderboard_normalization(active_tid)
+board = get_leaderboard(active_tid)
+top_n = get_qualifiers_per_group(active_tid)
+qualify = pd.Series(dtype="float64")
+if odds is not None and not odds.empty:
+    qualify = pd.Series(qualify_probability(odds, top_n).to_numpy(), index=pd.to_numeric(odds["team_id"], errors="coerce").astype("float64"))
+    qualify = qualify[~qualify.index.duplicated()]
+try:
+    status = get_qualification_status(active_tid)
+    status = status[~status.index.duplicated()]
+except Exception:
+    status = pd.Series(dtype=object)
+# Cached markup must not outlive the odds it shows
+odds_tag = f"{top_n}:{'fresh' if odds_fresh else 'stale' if odds is not None else 'none'}"
+if not board.empty:
+    winners = pd.DataFrame({
+        "Rank": board["overall_rank"].to_numpy(),
+        "Team": board["team_name"].to_numpy(),
+        "MatchesPlayed": board["played"].to_numpy(),
+        "MatchesWon": board["wins"].to_numpy(),
+        "MatchesLost": board["losses"].to_numpy(),
+        "Points": board["points"].to_numpy(),
+        "Status": status.reindex(pd.to_numeric(board["team_id"], errors="coerce").astype("float64")).map(STATUS_LABELS).fillna("").to_numpy(),
+        "Group": board["group"].to_numpy(),
+        "GroupRank": board["group_rank"].to_numpy(),
+        "Score": board["score"].to_numpy(),
+        "Change": board["overall_rank_delta"].map(format_delta).to_numpy(),
+        "GroupChange": board["group_rank_delta"].map(format_delta).to_numpy(),
+        "Qualify": [f"{p:.0%}" if pd.notna(p) else "" for p in qualify.reindex(pd.to_numeric(board["team_id"], errors="coerce").astype("float64")).to_numpy()],
+    })
 else:
-    winners = pd.DataFrame(columns=["Rank", "Team", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"])
+    winners = pd.DataFrame(columns=standings_all_cols)
 
-standings_all_cols = ["Rank", "Team", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"]
-standings_cols = get_json_setting("visible_cols_standings") or standings_all_cols
+standings_cols = get_json_setting("visible_cols_standings") or STANDINGS_DEFAULT_COLS
 standings_labels_map = get_json_setting("header_labels_standings") or {}
 standings_headers = [standings_labels_map.get(c, c) for c in standings_cols]
-render_table(winners, standings_cols, standings_headers)
+render_table(winners, standings_cols, standings_headers, f"standings:{board_norm}:{odds_tag}")
+
+# Qualification odds while group matches remain, unscheduled round-robin pairs included
+remaining = count_open_fixtures(active_tid) if active_tid is not None else 0
+if remaining:
+    st.markdown("<div class='section-title'>🎯 Qualification Odds</div>", unsafe_allow_html=True)
+    if odds is None or odds.empty:
+        st.caption("Simulating the remaining group matches…")
+    else:
+        pos_cols = [c for c in odds.columns if c.startswith("pos_")]
+        names = pd.Series(standings["team_name"].to_numpy(), index=pd.to_numeric(standings["team_id"], errors="coerce").astype("float64")) if not standings.empty else pd.Series(dtype=object)
+        names = names[~names.index.duplicated()]
+        odds_tbl = pd.DataFrame({
+            "Team": names.reindex(pd.to_numeric(odds["team_id"], errors="coerce").astype("float64")).fillna("").to_numpy(),
+            "Group": odds["group"].to_numpy(),
+            **{f"#{k + 1}": odds[c].map(lambda p: f"{p:.0%}").to_numpy() for k, c in enumerate(pos_cols)},
+            "Qualify": qualify_probability(odds, top_n).map(lambda p: f"{p:.0%}").to_numpy(),
+        })
+        odds_cols = list(odds_tbl.columns)
+        st.caption(
+            f"Chance of each group position from {N_SIMULATIONS:,} simulations of the {remaining} remaining group matches; "
+            f"the top {top_n} of each group qualify." + ("" if odds_fresh else " Updating…")
+        )
+        render_table(odds_tbl, odds_cols, odds_cols, f"odds:{odds_tag}")
 
 # Teams roster section
 st.markdown("<div class='section-title'>👥 Teams</div>", unsafe_allow_html=True)
@@ -317,4 +266,4 @@ teams_all_cols = ["Team", "Players", "MatchesPlayed", "MatchesWon", "MatchesLost
 teams_cols = get_json_setting("visible_cols_teams") or teams_all_cols
 teams_labels_map = get_json_setting("header_labels_teams") or {}
 teams_headers = [teams_labels_map.get(c, c) for c in teams_cols]
-render_table(teams_tbl, teams_cols, teams_headers)
+render_table(teams_tbl, teams_cols, teams_headers, "teams")
@@ -1,5 +1,5 @@
 import hashlib
-import json
+import os
 import bcrypt
 import secrets
 import pandas as pd
@@ -7,10 +7,31 @@ import streamlit as st
 import streamlit.components.v1 as components
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from data.db import engine, SessionLocal, init_db
-from services.import_export import create_template_excel, load_excel, export_excel_bytes
+from data.db import engine, read_engine, SessionLocal, pool_stats
+from data.repository import insert_rows, read_rows, sync_rows
+from services.bootstrap import init_app
+from services.export import EXPORT_FORMATS, export_file_name, export_tournament_ids, write_export
+from services.import_export import capped_errors, create_template_excel, import_into_tournament, open_excel
+from services.knockout import advance_results, clear_bracket, generate_bracket, qualifiers
+from services.prediction import group_spread, match_win_probability, suggest_draw
+from services.media import ICON_UPLOAD_TYPES, make_thumbnails
+from services.schedule_optimizer import build_slots, optimize_schedule, unavailable_slots
+from services.scheduler import FIXED_STATUSES, replan_matches, schedule_round_robin
+from services.players import apply_roster_changes, read_team_rosters
+from services.standings_store import apply_match_changes, delete_tournament, forget_tournament_results, seed_standings
+from services.settings import (
+    get_active_tournament_id, get_json_setting, get_setting, set_active_tournament_id, set_json_setting, set_setting,
+)
+from services.ranking import NORMALIZATIONS, STANDINGS_DEFAULT_COLS, STANDINGS_EXTRA_COLS
+from services.tiebreaks import TIEBREAK_RULES
+from services.tournament_data import (
+    all_data_write, get_leaderboard_normalization, get_player_strengths, get_qualifiers_per_group, get_standings, get_teams,
+    get_tiebreak_rules, set_leaderboard_normalization, set_qualifiers_per_group, set_tiebreak_rules, start_change_watcher,
+    tournament_write,
+)
 
-init_db()
+init_app()
+start_change_watcher()
 
 st.title("Organizer")
 
@@ -18,19 +39,9 @@ with SessionLocal() as db:
     db.execute(text("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)"))
     db.commit()
 
-with SessionLocal() as db:
-    row = db.execute(text("SELECT value FROM settings WHERE key='admin_password_hash'"))
-    row = row.first()
-    stored_hash = row[0] if row and row[0] not in (None, "") else None
-    pwd_set = stored_hash is not None
-    tok_row = db.execute(text("SELECT value FROM settings WHERE key='admin_auto_token_hash'"))
-    tok_row = tok_row.first()
-    stored_token_hash = tok_row[0] if tok_row and tok_row[0] not in (None, "") else None
-
-def set_setting(key: str, value: str):
-    with SessionLocal() as db:
-        db.execute(text("INSERT INTO settings(key, value) VALUES(:k, :v) ON CONFLICT(key) DO UPDATE SET value=:v"), {"k": key, "v": value})
-        db.commit()
+stored_hash = get_setting("admin_password_hash") or None
+pwd_set = stored_hash is not None
+stored_token_hash = get_setting("admin_auto_token_hash") or None
 
 if not pwd_set:
     st.subheader("Set Admin Password")
@@ -215,6 +226,70 @@ else:
         with colB:
             st.caption("You are logged in as Organizer.")
 
+def export_panel(key: str) -> None:
+    # Exports are written to a file on disk in chunks; the download serves that file
+    scope = st.radio("Scope", ["Active tournament", "Date range", "All tournaments"], horizontal=True, key=f"{key}_scope")
+    start = end = None
+    if scope == "Date range":
+        c1, c2 = st.columns(2)
+        start = c1.date_input("From", value=None, key=f"{key}_from")
+        end = c2.date_input("To", value=None, key=f"{key}_to")
+    fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key=f"{key}_fmt")
+    if st.button("Build Export", key=f"{key}_build"):
+        try:
+            with read_engine.connect() as conn:
+                if scope == "Active tournament":
+                    tid = get_active_tournament_id()
+                    if tid is None:
+                        st.warning("Select an active tournament first.")
+                        return
+                    ids, label = [tid], f"tournament_{tid}"
+                elif scope == "Date range":
+                    ids, label = export_tournament_ids(conn, start, end), f"{start or 'start'}_{end or 'end'}"
+                else:
+                    ids, label = None, "all"
+                path = write_export(conn, fmt, ids)
+            st.session_state[f"{key}_file"] = (path, export_file_name(fmt, label), EXPORT_FORMATS[fmt][1])
+        except Exception as e:
+            st.error(f"Failed to export: {e}")
+    saved = st.session_state.get(f"{key}_file")
+    if saved and os.path.exists(saved[0]):
+        with open(saved[0], "rb") as f:
+            st.download_button("Download Export", data=f, file_name=saved[1], mime=saved[2], key=f"{key}_dl")
+
+def require_tournament():
+    # Teams and matches always belong to a tournament; refuse writes while none is active
+    tid = get_active_tournament_id()
+    if tid is None:
+        st.warning("Select an active tournament first.")
+    return tid
+
+def import_workbook(up) -> None:
+    # Merge the uploaded workbook into the active tournament, once per uploaded file
+    tid = get_active_tournament_id()
+    if tid is None:
+        st.warning("Select an active tournament before importing.")
+        return
+    done = st.session_state.setdefault("imported_files", {})
+    if done.get(up.file_id) != tid:
+        try:
+            # The sheets are merged chunk by chunk as they are parsed, in one transaction
+            with open_excel(up) as (teams_chunks, matches_chunks, errors):
+                with tournament_write(tid) as conn:
+                    summary = import_into_tournament(conn, tid, teams_chunks, matches_chunks)
+            row_errors = capped_errors(errors)
+        except Exception as e:
+            st.error(f"Failed to import: {e}")
+            return
+        done[up.file_id] = tid
+        st.session_state["import_result"] = (summary, row_errors)
+    summary, row_errors = st.session_state.get("import_result", ({}, []))
+    st.success("Data imported into the active tournament")
+    st.dataframe(pd.DataFrame(summary).T, use_container_width=True)
+    if row_errors:
+        st.warning("Some rows had invalid values: bad numbers were left empty and unknown statuses set to Scheduled")
+        st.code("\n".join(row_errors))
+
 st.subheader("Data Management")
 col1, col2, col3 = st.columns(3)
 with col1:
@@ -228,14 +303,7 @@ with col1:
 with col2:
     up = st.file_uploader("Upload Excel (Teams & Matches)", type=["xlsx"])
     if up is not None:
-        try:
-            teams_df, matches_df = load_excel(up.read())
-            with engine.begin() as conn:
-                teams_df.to_sql("teams", conn, if_exists="replace", index=False)
-                matches_df.to_sql("matches", conn, if_exists="replace", index=False)
-            st.success("Data imported")
-        except Exception as e:
-            st.error(f"Failed to import: {e}")
+        import_workbook(up)
 with col3:
     try:
         with engine.begin() as conn:
@@ -248,54 +316,7 @@ with col3:
         st.metric("Matches", 0)
 
 st.subheader("Export")
-if st.button("Export Excel"):
-    try:
-        with engine.begin() as conn:
-            teams_df = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed FROM teams"), conn)
-            matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches"), conn)
-        st.download_button(
-            label="Download Export",
-            data=export_excel_bytes(teams_df, matches_df),
-            file_name="padel_export.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-    except Exception as e:
-        st.error(f"Failed to export: {e}")
-
-def get_setting(key: str):
-    with SessionLocal() as db:
-        row = db.execute(text("SELECT value FROM settings WHERE key=:k"), {"k": key}).first()
-        return row[0] if row else None
-
-def set_setting(key: str, value: str):
-    with SessionLocal() as db:
-        db.execute(text("INSERT INTO settings(key, value) VALUES(:k, :v) ON CONFLICT(key) DO UPDATE SET value=:v"), {"k": key, "v": value})
-        db.commit()
-
-def get_json_setting(key: str):
-    val = get_setting(key)
-    if not val:
-        return None
-    try:
-        return json.loads(val)
-    except Exception:
-        return None
-
-def set_json_setting(key: str, obj):
-    try:
-        set_setting(key, json.dumps(obj))
-    except Exception:
-        set_setting(key, str(obj))
-
-def get_active_tournament_id():
-    v = get_setting("active_tournament_id")
-    try:
-        return int(v) if v not in (None, "", "null") else None
-    except Exception:
-        return None
-
-def set_active_tournament_id(tid: int | None):
-    set_setting("active_tournament_id", "" if tid is None else str(int(tid)))
+export_panel("export")
 
 # Active tournament selector (global for Admin)
 with engine.begin() as conn:
@@ -348,14 +369,7 @@ with tabs[0]:
     with col2:
         up = st.file_uploader("Upload Excel (Teams & Matches)", type=["xlsx"], key="up_xlsx")
         if up is not None:
-            try:
-                teams_df, matches_df = load_excel(up.read())
-                with engine.begin() as conn:
-                    teams_df.to_sql("teams", conn, if_exists="replace", index=False)
-                    matches_df.to_sql("matches", conn, if_exists="replace", index=False)
-                st.success("Data imported")
-            except Exception as e:
-                st.error(f"Failed to import: {e}")
+            import_workbook(up)
     with col3:
         try:
             with engine.begin() as conn:
@@ -367,21 +381,11 @@ with tabs[0]:
             st.metric("Teams", 0)
             st.metric("Matches", 0)
 
+    with st.expander("Database connections", expanded=False):
+        st.json(pool_stats())
+
     st.subheader("Export")
-    if st.button("Export Excel", key="export_xlsx"):
-        try:
-            with engine.begin() as conn:
-                teams_df = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed FROM teams"), conn)
-                matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches"), conn)
-            st.download_button(
-                label="Download Export",
-                data=export_excel_bytes(teams_df, matches_df),
-                file_name="padel_export.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="export_btn",
-            )
-        except Exception as e:
-            st.error(f"Failed to export: {e}")
+    export_panel("export_tab")
 
 with tabs[1]:
     st.subheader("Tournaments")
@@ -412,9 +416,14 @@ with tabs[1]:
             hide_index=True,
         )
         if st.button("Save Tournaments", key="save_tournaments"):
-            with engine.begin() as conn:
-                edited_t.to_sql("tournaments", conn, if_exists="replace", index=False)
-            st.success("Tournaments saved.")
+            with all_data_write() as conn:
+                before = read_rows(conn, "tournaments", columns=["tournament_id"])["tournament_id"]
+                res, _ = sync_rows(conn, "tournaments", edited_t, "tournament_id")
+                after = read_rows(conn, "tournaments", columns=["tournament_id"])["tournament_id"]
+                # Teams and matches of a removed tournament stay, but no longer count for players
+                for gone in set(before) - set(after):
+                    forget_tournament_results(conn, int(gone))
+            st.success(f"Tournaments saved ({res['inserted']} added, {res['updated']} updated, {res['deleted']} deleted).")
             st.rerun()
     with colf2:
         st.markdown("### Add Tournament")
@@ -440,15 +449,14 @@ with tabs[1]:
                         "end_date": pd.to_datetime(ed),
                         "description": desc,
                     }])
-                    out = pd.concat([t_df, new_row], ignore_index=True)
-                    with engine.begin() as conn:
-                        out.to_sql("tournaments", conn, if_exists="replace", index=False)
+                    with tournament_write(int(tid)) as conn:
+                        insert_rows(conn, "tournaments", new_row)
                     st.success("Tournament added.")
                     st.rerun()
 
     st.markdown("---")
     st.markdown("#### Tournament Icon Upload (Admins)")
-    st.caption("Upload an image per tournament. PNG/JPG supported.")
+    st.caption("Upload an image per tournament. PNG/JPG/WebP/GIF supported; card-sized thumbnails are generated on upload.")
     if t_df.empty:
         st.info("No tournaments yet.")
     else:
@@ -464,7 +472,7 @@ with tabs[1]:
             with st.expander(f"{tid} — {name}"):
                 colu1, colu2 = st.columns([2,1])
                 with colu1:
-                    upf = st.file_uploader("Upload icon (PNG/JPG)", type=["png", "jpg", "jpeg"], key=f"upl_{tid}")
+                    upf = st.file_uploader("Upload icon (PNG/JPG/WebP/GIF)", type=ICON_UPLOAD_TYPES, key=f"upl_{tid}")
                     if upf is not None and st.button("Upload", key=f"btn_upl_{tid}"):
                         ext = os.path.splitext(upf.name)[1].lower() or ".png"
                         fname = f"t_{tid}{ext}"
@@ -472,12 +480,9 @@ with tabs[1]:
                         try:
                             with open(fpath, "wb") as f:
                                 f.write(upf.read())
+                            make_thumbnails(fpath)
                             rel_path = os.path.relpath(fpath, start=os.path.dirname(os.path.dirname(__file__)))
-                            with engine.begin() as conn:
-                                try:
-                                    conn.execute(text("ALTER TABLE tournaments ADD COLUMN IF NOT EXISTS icon_path TEXT"))
-                                except Exception:
-                                    pass
+                            with tournament_write(tid) as conn:
                                 conn.execute(text("UPDATE tournaments SET icon_path=:p WHERE tournament_id=:tid"), {"p": rel_path.replace("\\", "/"), "tid": tid})
                             st.success("Icon uploaded.")
                             st.rerun()
@@ -506,17 +511,8 @@ with tabs[1]:
             if st.button("Delete selected tournament", type="primary", key="dz_delete_one") and sel != "-- pick --":
                 try:
                     tid = int(str(sel).split(" — ")[0])
-                    with engine.begin() as conn:
-                        conn.execute(text("DELETE FROM tournaments WHERE tournament_id=:tid"), {"tid": tid})
-                        if cascade:
-                            try:
-                                conn.execute(text("DELETE FROM teams WHERE tournament_id=:tid"), {"tid": tid})
-                            except Exception:
-                                pass
-                            try:
-                                conn.execute(text("DELETE FROM matches WHERE tournament_id=:tid"), {"tid": tid})
-                            except Exception:
-                                pass
+                    with tournament_write(tid) as conn:
+                        delete_tournament(conn, tid, cascade)
                     # Reset active tournament if it was the one deleted
                     cur_tid = get_active_tournament_id()
                     if cur_tid == tid:
@@ -529,17 +525,13 @@ with tabs[1]:
             cascade_all = st.checkbox("Also delete ALL Teams and Matches", value=False, key="dz_cascade_all")
             if st.button("Delete ALL tournaments", key="dz_delete_all"):
                 try:
-                    with engine.begin() as conn:
-                        conn.execute(text("DELETE FROM tournaments"))
+                    with all_data_write() as conn:
+                        for tid in read_rows(conn, "tournaments", columns=["tournament_id"])["tournament_id"]:
+                            delete_tournament(conn, int(tid), cascade_all)
                         if cascade_all:
-                            try:
-                                conn.execute(text("DELETE FROM teams"))
-                            except Exception:
-                                pass
-                            try:
-                                conn.execute(text("DELETE FROM matches"))
-                            except Exception:
-                                pass
+                            # Rows of tournaments that no longer exist go too
+                            for table in ("teams", "matches", "team_standings"):
+                                conn.execute(text(f"DELETE FROM {table}"))
                     set_active_tournament_id(None)
                     st.success("All tournaments deleted.")
                     st.rerun()
@@ -607,22 +599,82 @@ with tabs[2]:
     )
     if st.button("Save Team Changes", key="save_teams"):
         # Save only for the active tournament; keep other tournaments intact
-        active_tid = get_active_tournament_id()
-        upd = edited_teams.copy()
-        upd["tournament_id"] = active_tid
-        with engine.begin() as conn:
+        active_tid = require_tournament()
+        if active_tid is not None:
+            with tournament_write(active_tid) as conn:
+                old_rosters = read_team_rosters(conn, active_tid)
+                # Rows hidden by the filters are left alone; only rows removed from the editor are deleted
+                res, _ = sync_rows(conn, "teams", edited_teams, "team_id", {"tournament_id": active_tid}, deletable=view_df["team_id"])
+                # Career stats and ratings of the teams' matches follow the new players
+                apply_roster_changes(conn, active_tid, old_rosters)
+                seed_standings(conn, active_tid)
+            if res["skipped"]:
+                st.warning(f"{res['skipped']} row(s) without a Team ID were not saved.")
+            st.success(f"Teams updated ({res['inserted']} added, {res['updated']} updated, {res['deleted']} deleted).")
+            st.rerun()
+
+    with st.expander("Seeding & Draw Suggestions"):
+        st.caption(
+            "Strengths are fitted to the games every player won and lost in past tournaments (recent ones count more). "
+            "The draw snakes the seeds over the groups, then swaps teams of the same pot to even out group strength."
+        )
+        if active_tid is None or teams_df.empty:
+            st.info("Select a tournament with teams first.")
+        else:
+            n_existing = teams_df["group"].dropna().nunique()
+            n_groups = st.number_input(
+                "Groups", min_value=1, max_value=max(1, len(teams_df)), step=1, key="draw_groups",
+                value=int(n_existing) if n_existing else max(1, round(len(teams_df) / 4)),
+            )
             try:
-                cur = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed, tournament_id FROM teams"), conn)
-            except Exception:
-                cur = pd.DataFrame(columns=["team_id", "team_name", "player1", "player2", "group", "seed", "tournament_id"])
-            if active_tid is None:
-                out_df = upd
-            else:
-                others = cur[cur["tournament_id"] != active_tid]
-                out_df = pd.concat([others, upd], ignore_index=True)
-            out_df.to_sql("teams", conn, if_exists="replace", index=False)
-        st.success("Teams updated.")
-        st.rerun()
+                strengths = get_player_strengths()
+                draw = suggest_draw(teams_df, strengths, int(n_groups))
+            except Exception as e:
+                draw = pd.DataFrame()
+                st.error(f"Could not compute suggestions: {e}")
+            if not draw.empty:
+                current = teams_df.assign(team_id=pd.to_numeric(teams_df["team_id"], errors="coerce")).drop_duplicates("team_id").set_index("team_id")
+                draw["current_seed"] = current["seed"].reindex(draw["team_id"].astype("float64")).to_numpy()
+                draw["current_group"] = current["group"].reindex(draw["team_id"].astype("float64")).to_numpy()
+                has_groups = draw["current_group"].notna().all()
+                spread_now = group_spread(draw["strength"], draw["current_group"].astype(str)) if has_groups else None
+                st.caption(
+                    f"Spread of group strength — suggested: {group_spread(draw['strength'], draw['group']):.3f}"
+                    + (f", current: {spread_now:.3f}" if spread_now is not None else "")
+                )
+                st.dataframe(
+                    draw[["team_id", "team_name", "strength", "seed", "group", "current_seed", "current_group"]].rename(columns={
+                        "team_id": "Team ID", "team_name": "Team", "strength": "Strength", "seed": "Suggested Seed",
+                        "group": "Suggested Group", "current_seed": "Seed", "current_group": "Group",
+                    }),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+                c1, c2 = st.columns(2)
+                apply_cols = []
+                if c1.button("Apply suggested seeds", key="apply_seeds"):
+                    apply_cols = ["seed"]
+                if c2.button("Apply suggested seeds and groups", key="apply_draw"):
+                    apply_cols = ["seed", "group"]
+                if apply_cols:
+                    sets = ", ".join(f'"{c}" = :{c}' for c in apply_cols)
+                    with tournament_write(active_tid) as conn:
+                        conn.execute(
+                            text(f"UPDATE teams SET {sets} WHERE team_id = :team_id AND tournament_id = :tid"),
+                            [{"team_id": int(r.team_id), "tid": active_tid, **{c: (int(getattr(r, c)) if c == "seed" else str(getattr(r, c))) for c in apply_cols}} for r in draw.itertuples(index=False)],
+                        )
+                    st.success("Suggestions applied.")
+                    st.rerun()
+
+                st.markdown("**Win probability**")
+                labels = dict(zip(draw["team_id"], draw["team_name"].fillna("").astype(str)))
+                strength_by_team = dict(zip(draw["team_id"], draw["strength"]))
+                w1, w2 = st.columns(2)
+                team_a = w1.selectbox("Team", options=list(labels), format_func=lambda t: labels[t], key="wp_team_a")
+                team_b = w2.selectbox("Opponent", options=list(labels), format_func=lambda t: labels[t], index=min(1, len(labels) - 1), key="wp_team_b")
+                if team_a != team_b:
+                    prob = float(match_win_probability(strength_by_team[team_a], strength_by_team[team_b]))
+                    st.metric(f"{labels[team_a]} beats {labels[team_b]}", f"{100 * prob:.0f}%")
 
     st.markdown("---")
     st.caption("Add a new team")
@@ -645,73 +697,38 @@ with tabs[2]:
                 "seed": int(seed) if seed is not None else None,
             }
             # Simple validation
-            if not new_row["team_name"]:
+            if get_active_tournament_id() is None:
+                st.warning("Select an active tournament first.")
+            elif not new_row["team_name"]:
                 st.error("Team name is required.")
             elif teams_df["team_id"].astype("Int64").eq(new_row["team_id"]).any():
                 st.error("Team ID already exists.")
             else:
                 active_tid = get_active_tournament_id()
                 new_row["tournament_id"] = active_tid
-                with engine.begin() as conn:
-                    try:
-                        cur = pd.read_sql(text("SELECT team_id, team_name, player1, player2, \"group\", seed, tournament_id FROM teams"), conn)
-                    except Exception:
-                        cur = pd.DataFrame(columns=["team_id", "team_name", "player1", "player2", "group", "seed", "tournament_id"])
-                    if active_tid is None:
-                        out_df = pd.concat([cur, pd.DataFrame([new_row])], ignore_index=True)
-                    else:
-                        others = cur[cur["tournament_id"] != active_tid]
-                        out_df = pd.concat([others, pd.DataFrame([new_row])], ignore_index=True)
-                    out_df.to_sql("teams", conn, if_exists="replace", index=False)
+                with tournament_write(active_tid) as conn:
+                    old_rosters = read_team_rosters(conn, active_tid)
+                    insert_rows(conn, "teams", pd.DataFrame([new_row]))
+                    apply_roster_changes(conn, active_tid, old_rosters)
+                    seed_standings(conn, active_tid)
                 st.success("Team added.")
                 st.rerun()
 
     st.markdown("---")
     del_id = st.number_input("Delete Team by ID", min_value=0, step=1, format="%d", key="del_team_id")
     if st.button("Delete Team", key="del_team_btn"):
-        with engine.begin() as conn:
-            try:
-                tid = get_active_tournament_id()
-                if tid is None:
-                    conn.exec_driver_sql("DELETE FROM teams WHERE team_id=?", (int(del_id),))
-                else:
-                    conn.execute(text("DELETE FROM teams WHERE team_id=:tid2 AND tournament_id=:tid"), {"tid2": int(del_id), "tid": tid})
-            except Exception:
-                tid = get_active_tournament_id()
-                if tid is None:
-                    conn.execute(text("DELETE FROM teams WHERE team_id=:tid2"), {"tid2": int(del_id)})
-                else:
-                    conn.execute(text("DELETE FROM teams WHERE team_id=:tid2 AND tournament_id=:tid"), {"tid2": int(del_id), "tid": tid})
-        st.info(f"Team {int(del_id)} deleted (if existed).")
-        st.rerun()
+        tid = require_tournament()
+        if tid is not None:
+            with tournament_write(tid) as conn:
+                old_rosters = read_team_rosters(conn, tid)
+                conn.execute(text("DELETE FROM teams WHERE team_id=:tid2 AND tournament_id=:tid"), {"tid2": int(del_id), "tid": tid})
+                apply_roster_changes(conn, tid, old_rosters)
+            st.info(f"Team {int(del_id)} deleted (if existed).")
+            st.rerun()
 
 with tabs[3]:
     st.subheader("Scheduler (Round-robin)")
-    st.caption("Generate fixtures per group. Choose replace or append.")
-    def generate_round_robin(df: pd.DataFrame) -> pd.DataFrame:
-        matches = []
-        next_id = 1
-        for grp, gdf in df.groupby("group"):
-            ids = [int(x) for x in gdf["team_id"].dropna().tolist()]
-            n = len(ids)
-            for i in range(n):
-                for j in range(i + 1, n):
-                    matches.append({
-                        "match_id": next_id,
-                        "group": grp,
-                        "team1_id": ids[i],
-                        "team2_id": ids[j],
-                        "status": "Scheduled",
-                        "set1_t1": pd.NA, "set1_t2": pd.NA,
-                        "set2_t1": pd.NA, "set2_t2": pd.NA,
-                        "set3_t1": pd.NA, "set3_t2": pd.NA,
-                    })
-                    next_id += 1
-        return pd.DataFrame(matches, columns=[
-            "match_id", "group", "team1_id", "team2_id", "status",
-            "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2"
-        ])
-
+    st.caption("Generate balanced rounds per group, spread over courts and time slots. Choose replace or append.")
     with engine.begin() as conn:
         try:
             tid = get_active_tournament_id()
@@ -729,29 +746,47 @@ with tabs[3]:
         mode = st.radio("Write mode", options=["Replace all", "Append"], horizontal=True)
     with scol3:
         start_id = st.number_input("Start MatchId", min_value=1, value=1, step=1)
+    ccol1, ccol2 = st.columns(2)
+    with ccol1:
+        n_courts = st.number_input("Courts", min_value=1, value=4, step=1, key="sched_courts")
+    with ccol2:
+        min_rest = st.number_input("Minimum rest (slots between a team's matches)", min_value=0, value=1, step=1, key="sched_rest")
 
-    if st.button("Generate Matches", key="gen_rr"):
+    if st.button("Generate Matches", key="gen_rr") and require_tournament() is not None:
         df = base_df.copy()
         if gen_groups:
             df = df[df["group"].isin(gen_groups)]
-        rr = generate_round_robin(df)
-        # Shift match ids to start at start_id
-        rr["match_id"] = range(int(start_id), int(start_id) + len(rr))
-        rr["tournament_id"] = get_active_tournament_id()
-        with engine.begin() as conn:
-            try:
-                cur = pd.read_sql(text("SELECT * FROM matches"), conn)
-            except Exception:
-                cur = pd.DataFrame(columns=rr.columns)
-            tid = get_active_tournament_id()
+        rr = schedule_round_robin(df, int(n_courts), int(min_rest), int(start_id))
+        tid = get_active_tournament_id()
+        clash = []
+        with tournament_write(tid) as conn:
             if mode == "Replace all":
-                others = cur[cur.get("tournament_id").fillna(-1) != (tid if tid is not None else -1)] if not cur.empty else pd.DataFrame(columns=rr.columns)
-                merged = pd.concat([others, rr], ignore_index=True)
+                try:
+                    prev = read_rows(conn, "matches", {"tournament_id": tid})
+                except Exception:
+                    prev = None
+                # Only group matches are replaced; the knockout bracket keeps its matches and ids
+                knockout = prev[prev["stage"].notna()] if prev is not None and "stage" in prev.columns else pd.DataFrame(columns=["match_id"])
+                taken = pd.to_numeric(knockout["match_id"], errors="coerce").dropna()
+                clash = sorted(set(rr["match_id"].astype(int)) & set(taken.astype(int)))
+                if not clash:
+                    group_prev = prev.drop(knockout.index) if prev is not None else None
+                    deletable = group_prev["match_id"] if group_prev is not None else []
+                    _, saved = sync_rows(conn, "matches", rr, "match_id", {"tournament_id": tid}, stored=prev, deletable=deletable)
+                    apply_match_changes(conn, tid, group_prev, saved)
             else:
-                merged = pd.concat([cur, rr], ignore_index=True)
-            merged.to_sql("matches", conn, if_exists="replace", index=False)
-        st.success(f"Generated {len(rr)} matches.")
-        st.rerun()
+                # Appended ids must be free, or the insert would fail on the (tournament, match) key
+                taken = pd.to_numeric(read_rows(conn, "matches", {"tournament_id": tid}, columns=["match_id"])["match_id"], errors="coerce").dropna()
+                clash = sorted(set(rr["match_id"].astype(int)) & set(taken.astype(int)))
+                if not clash:
+                    insert_rows(conn, "matches", rr, {"tournament_id": tid})
+        if clash:
+            shown = ", ".join(str(m) for m in clash[:10]) + (" …" if len(clash) > 10 else "")
+            what = "knockout matches" if mode == "Replace all" else "matches"
+            st.error(f"MatchIds already used by {what}: {shown}. Set Start MatchId to {int(taken.max()) + 1} or higher.")
+        else:
+            st.success(f"Generated {len(rr)} matches.")
+            st.rerun()
 
     try:
         with engine.begin() as conn:
@@ -760,6 +795,102 @@ with tabs[3]:
     except Exception:
         st.caption("Existing matches: 0")
 
+    st.markdown("**Re-plan remaining matches**")
+    st.caption("Reassign courts and time slots for matches that have not started, e.g. when a court goes down.")
+    if st.button("Re-plan", key="sched_replan") and require_tournament() is not None:
+        tid = get_active_tournament_id()
+        with tournament_write(tid) as conn:
+            current = read_rows(conn, "matches", {"tournament_id": tid})
+            planned = replan_matches(current, int(n_courts), int(min_rest))
+            res, _ = sync_rows(conn, "matches", planned, "match_id", {"tournament_id": tid}, stored=current, deletable=[])
+        st.success(f"Re-planned {res['updated']} matches on {int(n_courts)} court(s).")
+
+    st.markdown("---")
+    st.subheader("Knockout Stage")
+    st.caption("Seed the top teams of each group into a single-elimination bracket. Winners move on automatically when results are saved.")
+    kcol1, kcol2, kcol3, kcol4 = st.columns(4)
+    with kcol1:
+        ko_top_n = st.number_input("Qualifiers per group", min_value=1, value=get_qualifiers_per_group(get_active_tournament_id()), step=1, key="ko_top_n")
+    with kcol2:
+        ko_third = st.checkbox("3rd place match", value=True, key="ko_third")
+    with kcol3:
+        ko_consolation = st.checkbox("Consolation bracket", value=False, key="ko_consolation")
+    with kcol4:
+        ko_replace = st.checkbox("Replace existing knockout matches", value=True, key="ko_replace")
+    if st.button("Generate Bracket", key="ko_generate"):
+        tid = require_tournament()
+        if tid is not None:
+            teams_now = get_teams(tid)
+            qualified = qualifiers(get_standings(tid), teams_now, int(ko_top_n))
+            with tournament_write(tid) as conn:
+                if ko_replace:
+                    clear_bracket(conn, tid)
+                ids = read_rows(conn, "matches", {"tournament_id": tid}, columns=["match_id"])["match_id"]
+                first_id = int(pd.to_numeric(ids, errors="coerce").max()) + 1 if not ids.empty else 1
+                bracket = generate_bracket(qualified, first_id, third_place=ko_third, consolation=ko_consolation)
+                insert_rows(conn, "matches", bracket, {"tournament_id": tid})
+            st.success(f"Generated {len(bracket)} knockout matches for {len(qualified)} qualifiers.")
+
+    st.markdown("---")
+    st.subheader("Multi-day Schedule Optimizer")
+    st.caption("Plan the remaining matches over days, court opening hours and player unavailability. Players listed in several teams are never double-booked.")
+    tid = get_active_tournament_id()
+    days_key, away_key = f"schedule_days:{tid}", f"schedule_unavailable:{tid}"
+    days_df = pd.DataFrame(get_json_setting(days_key) or [], columns=["date", "start", "end", "courts"])
+    away_df = pd.DataFrame(get_json_setting(away_key) or [], columns=["player", "from", "to"])
+    st.markdown("Court opening hours (a date can have several rows, e.g. more courts in the morning)")
+    days_edit = st.data_editor(days_df.astype(str).replace({"None": "", "nan": ""}), num_rows="dynamic", use_container_width=True, key="opt_days")
+    st.markdown("Player unavailability (from/to as YYYY-MM-DD HH:MM)")
+    away_edit = st.data_editor(away_df.astype(str).replace({"None": "", "nan": ""}), num_rows="dynamic", use_container_width=True, key="opt_away")
+    ocol1, ocol2, ocol3 = st.columns(3)
+    with ocol1:
+        slot_minutes = st.number_input("Slot length (minutes)", min_value=10, value=60, step=5, key="opt_slot_minutes")
+    with ocol2:
+        opt_rest = st.number_input("Minimum rest (slots)", min_value=0, value=1, step=1, key="opt_rest")
+    with ocol3:
+        budget = st.number_input("Time budget (seconds)", min_value=1, max_value=120, value=10, step=1, key="opt_budget")
+
+    if st.button("Optimize Schedule", key="opt_run") and require_tournament() is not None:
+        days = [r for r in days_edit.to_dict("records") if str(r.get("date") or "").strip()]
+        away = [r for r in away_edit.to_dict("records") if str(r.get("player") or "").strip()]
+        set_json_setting(days_key, days)
+        set_json_setting(away_key, away)
+        try:
+            for r in days:
+                r["courts"] = int(float(r.get("courts") or 0))
+            slots = build_slots(days, int(slot_minutes))
+            with engine.begin() as conn:
+                current = read_rows(conn, "matches", {"tournament_id": tid})
+                roster = read_rows(conn, "teams", {"tournament_id": tid}, columns=["team_id", "player1", "player2"])
+            todo = current[~current["status"].isin(FIXED_STATUSES)] if not current.empty else current
+            if todo.empty or slots.empty:
+                st.warning("Nothing to plan: add opening hours and matches that have not started.")
+            else:
+                with st.spinner("Searching for a better schedule..."):
+                    plan, report = optimize_schedule(
+                        todo, roster, slots, unavailable_slots(slots, away, int(slot_minutes)),
+                        min_rest=int(opt_rest), time_budget=float(budget),
+                        fixed=current[current["status"].isin(FIXED_STATUSES)],
+                    )
+                st.session_state["opt_plan"] = (tid, plan, report)
+        except Exception as e:
+            st.error(f"Failed to optimize: {e}")
+
+    saved_plan = st.session_state.get("opt_plan")
+    if saved_plan and saved_plan[0] == tid:
+        _, plan, report = saved_plan
+        if report.get("feasible"):
+            st.success(f"Feasible plan over {report['span_slots']} slots (lower bound {report['span_lower_bound']}), ending {report['ends_at']}.")
+        else:
+            st.warning("No plan without conflicts was found; see the violations below.")
+        st.json(report, expanded=False)
+        st.dataframe(plan, use_container_width=True, hide_index=True)
+        if st.button("Apply Plan", key="opt_apply") and require_tournament() is not None:
+            with tournament_write(tid) as conn:
+                sync_rows(conn, "matches", plan[["match_id", "court", "slot", "scheduled_at"]], "match_id", {"tournament_id": tid}, deletable=[])
+            st.session_state.pop("opt_plan", None)
+            st.success(f"Applied the plan to {len(plan)} matches.")
+
     st.markdown("---")
     st.subheader("Manual Match Maker")
     st.caption("Create a single match by selecting group and teams. This will append to the matches table.")
@@ -799,30 +930,22 @@ with tabs[3]:
     if st.button("Add Match", key="mm_add"):
         t1_id = parse_team(t1)
         t2_id = parse_team(t2)
-        if not sel_grp:
+        if get_active_tournament_id() is None:
+            st.warning("Select an active tournament first.")
+        elif not sel_grp:
             st.error("Please select a group.")
         elif t1_id is None or t2_id is None:
             st.error("Please select both Team 1 and Team 2.")
         elif t1_id == t2_id:
             st.error("Team 1 and Team 2 must be different.")
         else:
-            with engine.begin() as conn:
+            tid = get_active_tournament_id()
+            with tournament_write(tid) as conn:
                 try:
-                    cur = pd.read_sql(text("SELECT * FROM matches"), conn)
+                    taken = pd.to_numeric(read_rows(conn, "matches", {"tournament_id": tid}, columns=["match_id"])["match_id"], errors="coerce")
+                    next_id_auto = int(taken.max()) + 1
                 except Exception:
-                    cur = pd.DataFrame(columns=[
-                        "match_id", "group", "team1_id", "team2_id", "status",
-                        "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2", "tournament_id"
-                    ])
-                tid = get_active_tournament_id()
-                cur_tid = cur[cur.get("tournament_id").fillna(-1) == (tid if tid is not None else -1)] if not cur.empty else pd.DataFrame(columns=cur.columns)
-                if cur_tid.empty:
-                    next_id_auto = 1
-                else:
-                    try:
-                        next_id_auto = int(pd.to_numeric(cur_tid["match_id"], errors="coerce").max()) + 1
-                    except Exception:
-                        next_id_auto = 1
+                    taken, next_id_auto = pd.Series(dtype=float), 1
                 new_id = int(custom_id) if custom_id and custom_id > 0 else next_id_auto
 
                 new_row = pd.DataFrame([{
@@ -836,11 +959,14 @@ with tabs[3]:
                     "set3_t1": pd.NA, "set3_t2": pd.NA,
                     "tournament_id": tid,
                 }])
-                others = cur[cur.get("tournament_id").fillna(-1) != (tid if tid is not None else -1)] if not cur.empty else pd.DataFrame(columns=new_row.columns)
-                merged = pd.concat([others, cur_tid, new_row], ignore_index=True).fillna({"tournament_id": tid})
-                merged.to_sql("matches", conn, if_exists="replace", index=False)
-            st.success(f"Match added: ID {new_id} — Team {t1_id} vs Team {t2_id} in Group {sel_grp}.")
-            st.rerun()
+                clash = bool(taken.eq(new_id).any())
+                if not clash:
+                    insert_rows(conn, "matches", new_row)
+            if clash:
+                st.error(f"MatchId {new_id} already exists.")
+            else:
+                st.success(f"Match added: ID {new_id} — Team {t1_id} vs Team {t2_id} in Group {sel_grp}.")
+                st.rerun()
 
 with tabs[4]:
     st.subheader("Matches Scoring")
@@ -856,11 +982,11 @@ with tabs[4]:
         try:
             tid = get_active_tournament_id()
             if tid is None:
-                matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, tournament_id FROM matches"), conn)
+                matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, tournament_id, stage FROM matches"), conn)
             else:
-                matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, tournament_id FROM matches WHERE tournament_id = :tid"), conn, params={"tid": tid})
+                matches_df = pd.read_sql(text("SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, tournament_id, stage FROM matches WHERE tournament_id = :tid"), conn, params={"tid": tid})
         except Exception:
-            matches_df = pd.DataFrame(columns=["match_id", "group", "team1_id", "team2_id", "status", "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2", "tournament_id"])
+            matches_df = pd.DataFrame(columns=["match_id", "group", "team1_id", "team2_id", "status", "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2", "tournament_id", "stage"])
     # Filters
     tmap = {}
     try:
@@ -899,31 +1025,32 @@ with tabs[4]:
         apply_groups_scope = st.checkbox("Apply current group filter", value=bool(sel_group), key="bulk_apply_groups")
     with cba3:
         if st.button("Clear scoring (sets) for matches", key="bulk_clear_scores"):
-            tid = get_active_tournament_id()
-            where_clauses = []
-            params = {}
+            tid = require_tournament()
             if tid is not None:
-                where_clauses.append("tournament_id = :tid")
-                params["tid"] = int(tid)
-            if apply_groups_scope and sel_group:
-                # build IN clause dynamically
-                groups_list = [str(g) for g in sel_group]
-                in_params = {f"g{i}": g for i, g in enumerate(groups_list)}
-                where_clauses.append("\"group\" IN (" + ",".join([":"+k for k in in_params.keys()]) + ")")
-                params.update(in_params)
-            where_sql = (" WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
-            set_status_sql = ", status='Scheduled'" if do_reset_status else ""
-            sql = (
-                "UPDATE matches SET set1_t1=NULL, set1_t2=NULL, set2_t1=NULL, set2_t2=NULL, set3_t1=NULL, set3_t2=NULL"
-                + set_status_sql + where_sql
-            )
-            try:
-                with engine.begin() as conn:
-                    conn.execute(text(sql), params)
-                st.success("Scoring cleared." + (" Status reset." if do_reset_status else ""))
-                st.rerun()
-            except Exception as e:
-                st.error(f"Failed to clear scores: {e}")
+                where_clauses = ["tournament_id = :tid"]
+                params = {"tid": int(tid)}
+                if apply_groups_scope and sel_group:
+                    # build IN clause dynamically
+                    groups_list = [str(g) for g in sel_group]
+                    in_params = {f"g{i}": g for i, g in enumerate(groups_list)}
+                    where_clauses.append("\"group\" IN (" + ",".join([":"+k for k in in_params.keys()]) + ")")
+                    params.update(in_params)
+                where_sql = " WHERE " + " AND ".join(where_clauses)
+                set_status_sql = ", status='Scheduled'" if do_reset_status else ""
+                sql = (
+                    "UPDATE matches SET set1_t1=NULL, set1_t2=NULL, set2_t1=NULL, set2_t2=NULL, set3_t1=NULL, set3_t2=NULL"
+                    + set_status_sql + where_sql
+                )
+                try:
+                    with tournament_write(tid) as conn:
+                        cleared = pd.read_sql(text("SELECT match_id, team1_id, team2_id, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, stage FROM matches" + where_sql), conn, params=params)
+                        apply_match_changes(conn, tid, cleared, None)
+                        conn.execute(text(sql), params)
+                        advance_results(conn, tid, cleared.loc[cleared["stage"].notna(), "match_id"])
+                    st.success("Scoring cleared." + (" Status reset." if do_reset_status else ""))
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Failed to clear scores: {e}")
 
     st.caption("Edit scores and status inline. Save to persist.")
     edited_matches = st.data_editor(
@@ -943,42 +1070,42 @@ with tabs[4]:
             "set2_t2": st.column_config.NumberColumn("S2 T2", min_value=0, max_value=7, step=1),
             "set3_t1": st.column_config.NumberColumn("S3 T1", min_value=0, max_value=7, step=1),
             "set3_t2": st.column_config.NumberColumn("S3 T2", min_value=0, max_value=7, step=1),
+            "stage": st.column_config.TextColumn("Stage", disabled=True),
         },
         hide_index=True,
     )
     if st.button("Save Match Changes", key="save_matches"):
-        tid = get_active_tournament_id()
-        upd = edited_matches.copy()
-        upd["tournament_id"] = tid
-        with engine.begin() as conn:
-            try:
-                cur = pd.read_sql(text("SELECT * FROM matches"), conn)
-            except Exception:
-                cur = pd.DataFrame(columns=upd.columns)
-            others = cur[cur.get("tournament_id").fillna(-1) != (tid if tid is not None else -1)] if not cur.empty else pd.DataFrame(columns=upd.columns)
-            out = pd.concat([others, upd], ignore_index=True)
-            out.to_sql("matches", conn, if_exists="replace", index=False)
-        st.success("Matches updated.")
-        st.rerun()
+        tid = require_tournament()
+        if tid is not None:
+            with tournament_write(tid) as conn:
+                try:
+                    prev = read_rows(conn, "matches", {"tournament_id": tid})
+                except Exception:
+                    prev = None
+                # Rows hidden by the filters are left alone; only rows removed from the editor are deleted
+                res, saved = sync_rows(conn, "matches", edited_matches, "match_id", {"tournament_id": tid}, stored=prev, deletable=view_m["match_id"])
+                if prev is not None:
+                    touched = set(view_m["match_id"].dropna()) | set(saved["match_id"])
+                    prev = prev[prev["match_id"].isin(touched)]
+                # Only the rows that were stored count: no unkeyed rows, one row per match_id
+                apply_match_changes(conn, tid, prev, saved)
+                advance_results(conn, tid, saved.loc[saved["stage"].notna(), "match_id"])
+            if res["skipped"]:
+                st.warning(f"{res['skipped']} row(s) without a MatchId were not saved.")
+            st.success(f"Matches updated ({res['inserted']} added, {res['updated']} updated, {res['deleted']} deleted).")
+            st.rerun()
 
     st.markdown("---")
     del_mid = st.number_input("Delete Match by ID", min_value=0, step=1, format="%d", key="del_match_id")
     if st.button("Delete Match", key="del_match_btn"):
-        with engine.begin() as conn:
-            try:
-                tid = get_active_tournament_id()
-                if tid is None:
-                    conn.exec_driver_sql("DELETE FROM matches WHERE match_id=?", (int(del_mid),))
-                else:
-                    conn.execute(text("DELETE FROM matches WHERE match_id=:mid AND tournament_id=:tid"), {"mid": int(del_mid), "tid": tid})
-            except Exception:
-                tid = get_active_tournament_id()
-                if tid is None:
-                    conn.execute(text("DELETE FROM matches WHERE match_id=:mid"), {"mid": int(del_mid)})
-                else:
-                    conn.execute(text("DELETE FROM matches WHERE match_id=:mid AND tournament_id=:tid"), {"mid": int(del_mid), "tid": tid})
-        st.info(f"Match {int(del_mid)} deleted (if existed).")
-        st.rerun()
+        tid = require_tournament()
+        if tid is not None:
+            with tournament_write(tid) as conn:
+                gone = pd.read_sql(text("SELECT * FROM matches WHERE match_id=:mid AND tournament_id=:tid"), conn, params={"mid": int(del_mid), "tid": tid})
+                conn.execute(text("DELETE FROM matches WHERE match_id=:mid AND tournament_id=:tid"), {"mid": int(del_mid), "tid": tid})
+                apply_match_changes(conn, tid, gone, None)
+            st.info(f"Match {int(del_mid)} deleted (if existed).")
+            st.rerun()
 
 with tabs[5]:
     st.subheader("Display Settings")
@@ -986,11 +1113,11 @@ with tabs[5]:
 
     with st.expander("Columns (Visibility)", expanded=True):
         played_all_cols = ["MatchId", "Court", "Players", "Sets", "Games", "Status"]
-        standings_all_cols = ["Rank", "Team", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"]
+        standings_all_cols = STANDINGS_DEFAULT_COLS + STANDINGS_EXTRA_COLS
         teams_all_cols = ["Team", "Players", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"]
 
         current_played = get_json_setting("visible_cols_played") or played_all_cols
-        current_stand = get_json_setting("visible_cols_standings") or standings_all_cols
+        current_stand = get_json_setting("visible_cols_standings") or STANDINGS_DEFAULT_COLS
         current_teams = get_json_setting("visible_cols_teams") or teams_all_cols
 
         sel_played = st.multiselect("Played Matches columns", options=played_all_cols, default=current_played, key="disp_played")
@@ -999,13 +1126,13 @@ with tabs[5]:
 
         if st.button("Save Column Visibility", key="save_disp_cols"):
             set_json_setting("visible_cols_played", sel_played or played_all_cols)
-            set_json_setting("visible_cols_standings", sel_stand or standings_all_cols)
+            set_json_setting("visible_cols_standings", sel_stand or STANDINGS_DEFAULT_COLS)
             set_json_setting("visible_cols_teams", sel_teams or teams_all_cols)
             st.success("Column visibility saved.")
 
     with st.expander("Header Labels", expanded=False):
         played_all_cols = ["MatchId", "Court", "Players", "Sets", "Games", "Status"]
-        standings_all_cols = ["Rank", "Team", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"]
+        standings_all_cols = STANDINGS_DEFAULT_COLS + STANDINGS_EXTRA_COLS
         teams_all_cols = ["Team", "Players", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points"]
 
         played_labels = get_json_setting("header_labels_played") or {}
@@ -1031,3 +1158,58 @@ with tabs[5]:
             set_json_setting("header_labels_standings", new_standings_labels)
             set_json_setting("header_labels_teams", new_teams_labels)
             st.success("Header labels saved.")
+
+    with st.expander("Tiebreak Rules", expanded=False):
+        tb_tid = get_active_tournament_id()
+        if tb_tid is None:
+            st.info("Set an active tournament to configure its tiebreak rules.")
+        else:
+            st.caption(
+                "Teams in a group are ordered by these rules, top to bottom; the next rule only decides between teams still tied. "
+                "Head-to-head rules only count matches among the tied teams (mini-league)."
+            )
+            tb_chain, tb_reapply = get_tiebreak_rules(tb_tid)
+            sel_chain = st.multiselect(
+                "Rules, in order",
+                options=list(TIEBREAK_RULES),
+                default=tb_chain,
+                format_func=lambda r: TIEBREAK_RULES[r],
+                key=f"tb_chain_{tb_tid}",
+            )
+            sel_reapply = st.checkbox(
+                "Restart head-to-head rules when they split a tie",
+                value=tb_reapply,
+                key=f"tb_reapply_{tb_tid}",
+            )
+            if st.button("Save Tiebreak Rules", key="save_tiebreaks"):
+                set_tiebreak_rules(tb_tid, sel_chain, sel_reapply)
+                st.success("Tiebreak rules saved.")
+
+    with st.expander("Winner Board Ranking", expanded=False):
+        lb_tid = get_active_tournament_id()
+        if lb_tid is None:
+            st.info("Set an active tournament to configure its Winner Board.")
+        else:
+            st.caption("How teams from different groups are compared on the Winner Board. Teams tied on it keep their group order.")
+            lb_options = list(NORMALIZATIONS)
+            lb_norm = st.selectbox(
+                "Rank teams across groups by",
+                options=lb_options,
+                index=lb_options.index(get_leaderboard_normalization(lb_tid)),
+                format_func=lambda n: NORMALIZATIONS[n],
+                key=f"lb_norm_{lb_tid}",
+            )
+            if st.button("Save Winner Board Ranking", key="save_lb_norm"):
+                set_leaderboard_normalization(lb_tid, lb_norm)
+                st.success("Winner Board ranking saved.")
+
+    with st.expander("Qualification Odds", expanded=False):
+        q_tid = get_active_tournament_id()
+        if q_tid is None:
+            st.info("Set an active tournament to configure its qualification odds.")
+        else:
+            st.caption("The Overview simulates the remaining group matches and shows each team's chance of finishing in the top places of its group.")
+            q_top = st.number_input("Teams qualifying per group", min_value=1, step=1, value=get_qualifiers_per_group(q_tid), key=f"q_top_{q_tid}")
+            if st.button("Save Qualification Odds", key="save_q_top"):
+                set_qualifiers_per_group(q_tid, int(q_top))
+                st.success("Qualification settings saved.")
@@ -0,0 +1,56 @@
+import pandas as pd
+import streamlit as st
+from data.db import read_engine
+from services.bootstrap import init_app
+from services.players import INITIAL_RATING, get_player_profile, search_players, top_players
+from services.tournament_data import start_change_watcher
+
+init_app()
+start_change_watcher()
+
+st.set_page_config(page_title="Players", page_icon="🎾", layout="wide", initial_sidebar_state="collapsed")
+st.title("Players")
+st.caption("Career results and ratings across every tournament. Players are matched by name, ignoring case and accents.")
+
+query = st.text_input("Find a player", key="player_query")
+if query.strip():
+    try:
+        with read_engine.connect() as conn:
+            names = search_players(conn, query)
+            chosen = st.selectbox("Player", options=names, key="player_pick") if names else None
+            profile = get_player_profile(conn, chosen) if chosen else None
+    except Exception as e:
+        names, profile = [], None
+        st.error(f"Player lookup failed: {e}")
+    if not names:
+        st.info("No player matches that name.")
+    elif profile:
+        played = int(profile.get("matches") or 0)
+        wins = int(profile.get("wins") or 0)
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Rating", f"{float(profile['rating'] if profile.get('rating') is not None else INITIAL_RATING):.0f}")
+        c2.metric("Matches", played)
+        c3.metric("Won / Lost", f"{wins} / {int(profile.get('losses') or 0)}")
+        c4.metric("Win %", f"{100.0 * wins / played:.0f}%" if played else "–")
+        st.dataframe(
+            pd.DataFrame({
+                "": ["Sets", "Games"],
+                "Won": [int(profile.get("sets_won") or 0), int(profile.get("games_won") or 0)],
+                "Lost": [int(profile.get("sets_lost") or 0), int(profile.get("games_lost") or 0)],
+            }),
+            hide_index=True,
+        )
+
+st.subheader("Top Rated")
+try:
+    with read_engine.connect() as conn:
+        top = top_players(conn, 50)
+except Exception:
+    top = pd.DataFrame()
+if top.empty:
+    st.info("No rated matches yet.")
+else:
+    top.insert(0, "Rank", range(1, len(top) + 1))
+    top["rating"] = top["rating"].round(0).astype(int)
+    top.columns = ["Rank", "Player", "Rating", "RatedMatches", "Matches", "Wins", "Losses"]
+    st.dataframe(top, hide_index=True, use_container_width=True)
@@ -0,0 +1,15 @@
+from data.db import engine, init_db
+from services.standings_store import backfill_standings
+
+_backfilled = False
+
+
+def init_app() -> None:
+    # Schema first (data.db), then data the services derive: standings aggregates missing for
+    # existing data are built here, once per process, so a viewer's read never has to write
+    global _backfilled
+    init_db()
+    if not _backfilled:
+        with engine.begin() as conn:
+            backfill_standings(conn)
+        _backfilled = True
@@ -0,0 +1,66 @@
+import threading
+from typing import Any, Callable, Hashable
+
+# Process-wide cache shared by every Streamlit session. Entries are keyed by
+# (scope, name) where scope is usually a tournament_id, and are only served while
+# the scope's data version is unchanged; write paths call invalidate() to bump it.
+# Cached values are shared between sessions and must be treated as read-only.
+
+_lock = threading.RLock()
+_epoch = 0
+_versions: dict[Hashable, int] = {}
+_entries: dict[tuple, tuple[tuple[int, int], Any]] = {}
+_loading: dict[tuple, threading.Lock] = {}
+
+
+def data_version(scope: Hashable) -> tuple[int, int]:
+    with _lock:
+        return _epoch, _versions.get(scope, 0)
+
+
+def invalidate(*scopes: Hashable) -> None:
+    with _lock:
+        for scope in scopes:
+            _versions[scope] = _versions.get(scope, 0) + 1
+            for key in [k for k in _entries if k[0] == scope]:
+                del _entries[key]
+
+
+def invalidate_all() -> None:
+    global _epoch
+    with _lock:
+        _epoch += 1
+        _entries.clear()
+
+
+def get_or_load(scope: Hashable, name: str, loader: Callable[[], Any], version: tuple[int, int] | None = None) -> Any:
+    # version: the scope's data_version() the caller captured before reading what loader uses.
+    # The value is then only served or stored at that version, so a value built from data read
+    # before a write is never cached under the version that follows it
+    key = (scope, name)
+    current = data_version(scope)
+    if version is not None and version != current:
+        return loader()
+    hit = _entries.get(key)
+    if hit is not None and hit[0] == current:
+        return hit[1]
+    with _lock:
+        key_lock = _loading.setdefault(key, threading.Lock())
+    # One loader per key at a time, so a burst of sessions after a write costs one query
+    with key_lock:
+        current = data_version(scope)
+        if version is not None and version != current:
+            return loader()
+        hit = _entries.get(key)
+        if hit is not None and hit[0] == current:
+            return hit[1]
+        value = loader()
+        with _lock:
+            if data_version(scope) == current:
+                _entries[key] = (current, value)
+        return value
+
+
+def stats() -> dict[str, int]:
+    with _lock:
+        return {"entries": len(_entries), "scopes": len(_versions), "epoch": _epoch}
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from services.simulation import open_fixtures
+from services.tiebreaks import WIN_POINTS
+
+# Exact "clinched / eliminated / alive" per team. Only points are certain before a group is
+# finished (set and game differences depend on scores still to come), so a tie on points is
+# counted against a team when deciding whether it has clinched and in its favour when
+# deciding whether it is out; a status shown is therefore never wrong. Each question is a
+# depth-first search over the group's remaining results: bounds on how many teams can still
+# end above (or must end above) the team cut most branches, and failed states are memoized.
+
+CLINCHED = "clinched"
+ELIMINATED = "eliminated"
+ALIVE = "alive"
+STATUS_LABELS = {CLINCHED: "Clinched", ELIMINATED: "Eliminated", ALIVE: "Alive"}
+# Larger groups only get the bound checks, which never claim a status that isn't certain
+MAX_EXACT_TEAMS = 8
+
+
+def _search(points: list[int], matches: list[tuple[int, int]], done, exact: bool = True) -> bool:
+    # Is there an outcome of `matches` for which done(points, left) returns True? done returns
+    # True (found), False (impossible from here) or None (keep branching); left[k] is how many
+    # of the still unplayed matches team k is in. Without `exact`, undecided means possible
+    n = len(points)
+    if not exact:
+        counts = [0] * n
+        for a, b in matches:
+            counts[a] += 1; counts[b] += 1
+        verdict = done(list(points), counts)
+        return True if verdict is None else verdict
+    left = [[0] * n for _ in range(len(matches) + 1)]
+    for m in range(len(matches) - 1, -1, -1):
+        left[m] = list(left[m + 1])
+        a, b = matches[m]
+        left[m][a] += 1; left[m][b] += 1
+    failed = set()
+
+    def go(m: int, pts: list[int]) -> bool:
+        verdict = done(pts, left[m])
+        if verdict is not None:
+            return verdict
+        if m == len(matches):
+            return False
+        key = (m, tuple(pts))
+        if key in failed:
+            return False
+        a, b = matches[m]
+        for w in (a, b):
+            pts[w] += WIN_POINTS
+            found = go(m + 1, pts)
+            pts[w] -= WIN_POINTS
+            if found:
+                return True
+        failed.add(key)
+        return False
+
+    return go(0, list(points))
+
+
+def _can_qualify(t: int, points: list[int], matches: list[tuple[int, int]], top_n: int, exact: bool = True) -> bool:
+    # Best case: t wins every match it has left, and fewer than top_n others end above it
+    pts = list(points)
+    pts[t] += WIN_POINTS * sum(t in m for m in matches)
+    best = pts[t]
+    others = [m for m in matches if t not in m]
+
+    def done(p, left):
+        above = sum(1 for k in range(len(p)) if k != t and p[k] > best)
+        if above >= top_n:
+            return False
+        could = sum(1 for k in range(len(p)) if k != t and p[k] + WIN_POINTS * left[k] > best)
+        return True if could < top_n else None
+
+    return _search(pts, others, done, exact)
+
+
+def _can_miss(t: int, points: list[int], matches: list[tuple[int, int]], top_n: int, exact: bool = True) -> bool:
+    # Worst case: t loses every match it has left, and top_n others end level or above it
+    pts = list(points)
+    for a, b in matches:
+        if t in (a, b):
+            pts[b if a == t else a] += WIN_POINTS
+    worst = pts[t]
+    others = [m for m in matches if t not in m]
+
+    def done(p, left):
+        level = sum(1 for k in range(len(p)) if k != t and p[k] >= worst)
+        if level >= top_n:
+            return True
+        could = sum(1 for k in range(len(p)) if k != t and p[k] + WIN_POINTS * left[k] >= worst)
+        return False if could < top_n else None
+
+    return _search(pts, others, done, exact)
+
+
+def group_status(points: list[int], matches: list[tuple[int, int]], top_n: int) -> list[str]:
+    # Status per team of one group from its points and remaining matches (index pairs)
+    n = len(points)
+    if n <= top_n:
+        return [CLINCHED] * n
+    exact = n <= MAX_EXACT_TEAMS
+    out = []
+    for t in range(n):
+        if not _can_qualify(t, points, matches, top_n, exact):
+            out.append(ELIMINATED)
+        elif not _can_miss(t, points, matches, top_n, exact):
+            out.append(CLINCHED)
+        else:
+            out.append(ALIVE)
+    return out
+
+
+def qualification_status(standings: pd.DataFrame, matches_df: pd.DataFrame, top_n: int) -> pd.Series:
+    # team_id -> status. standings are in group order (as get_standings returns them). Open
+    # fixtures include round-robin pairs not generated yet, so only a group whose every pair
+    # has a counted result is decided by that order, tiebreaks included
+    if standings is None or standings.empty:
+        return pd.Series(dtype=object)
+    table = standings.reset_index(drop=True)
+    team_ids = pd.to_numeric(table["team_id"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    codes, _ = pd.factorize(table["group"].astype(str))
+    points = pd.to_numeric(table["points"], errors="coerce").fillna(0).astype("int64").to_numpy()
+    i, j = open_fixtures(table, matches_df)
+
+    status = np.empty(len(table), dtype=object)
+    for g in range(codes.max() + 1):
+        members = np.flatnonzero(codes == g)
+        local = {int(k): x for x, k in enumerate(members)}
+        in_group = codes[i] == g
+        games = [(local[int(a)], local[int(b)]) for a, b in zip(i[in_group], j[in_group])]
+        if not games:
+            status[members] = [CLINCHED if x < top_n else ELIMINATED for x in range(len(members))]
+        else:
+            status[members] = group_status([int(points[k]) for k in members], games, top_n)
+    return pd.Series(status, index=team_ids, name="status")
@@ -0,0 +1,176 @@
+import csv
+import datetime as dt
+import importlib.util
+import io
+import os
+import tempfile
+import time
+import zipfile
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from services.import_export import MATCHES_COLUMNS, MATCHES_INT_COLUMNS, TEAMS_COLUMNS, TEAMS_INT_COLUMNS
+
+# Exports are read from the database in chunks and written straight to a file on disk, so a
+# season archive never has to fit in memory. Every sheet/file carries tournament_id, and the
+# Teams/Matches sheets keep the import template's columns so an export can be re-imported.
+
+EXPORT_FORMATS = {
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV (zip)", "application/zip"),
+}
+# Parquet needs the optional pyarrow package; it is only offered when that is installed
+if importlib.util.find_spec("pyarrow") is not None:
+    EXPORT_FORMATS["parquet"] = ("Parquet (zip)", "application/zip")
+EXPORT_CHUNK_ROWS = 10000
+EXPORT_DIR = os.getenv("PADEL_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "padel_exports")
+# Finished export files older than this are removed when the next export starts
+EXPORT_MAX_AGE_SECONDS = 24 * 3600
+
+TOURNAMENT_COLUMNS = ["tournament_id", "name", "location", "start_date", "end_date", "description"]
+_TABLES = {
+    # sheet: (table, columns, integer columns, date columns)
+    "Tournaments": ("tournaments", TOURNAMENT_COLUMNS, ["tournament_id"], ["start_date", "end_date"]),
+    "Teams": ("teams", ["tournament_id"] + TEAMS_COLUMNS, ["tournament_id"] + TEAMS_INT_COLUMNS, []),
+    "Matches": ("matches", ["tournament_id"] + MATCHES_COLUMNS, ["tournament_id"] + MATCHES_INT_COLUMNS, []),
+}
+
+
+def export_tournament_ids(conn: Connection, start: dt.date | None = None, end: dt.date | None = None) -> list[int]:
+    # Tournaments overlapping [start, end]; open ends match everything on that side
+    sql = "SELECT tournament_id FROM tournaments WHERE 1 = 1"
+    params = {}
+    if end is not None:
+        sql += " AND (start_date IS NULL OR start_date < :end)"
+        params["end"] = dt.datetime.combine(end, dt.time()) + dt.timedelta(days=1)
+    if start is not None:
+        sql += " AND (COALESCE(end_date, start_date) IS NULL OR COALESCE(end_date, start_date) >= :start)"
+        params["start"] = dt.datetime.combine(start, dt.time())
+    rows = conn.execute(text(sql + " ORDER BY tournament_id"), params).all()
+    return [int(r[0]) for r in rows]
+
+
+def _typed_chunk(chunk: pd.DataFrame, columns: list[str], int_columns: list[str], date_columns: list[str]) -> pd.DataFrame:
+    # Same dtypes for every chunk, whatever a given chunk's NULLs made read_sql infer
+    chunk = chunk.reindex(columns=columns)
+    for c in columns:
+        if c in int_columns:
+            chunk[c] = pd.to_numeric(chunk[c], errors="coerce").round().astype("Int64")
+        elif c in date_columns:
+            chunk[c] = pd.to_datetime(chunk[c], errors="coerce")
+        else:
+            chunk[c] = chunk[c].astype("string")
+    return chunk
+
+
+def iter_export_chunks(conn: Connection, sheet: str, tournament_ids: list[int] | None, chunk_size: int = EXPORT_CHUNK_ROWS):
+    table, columns, int_columns, date_columns = _TABLES[sheet]
+    sql = "SELECT " + ", ".join(f'"{c}"' for c in columns) + f" FROM {table}"
+    params = {}
+    if tournament_ids is not None:
+        if not tournament_ids:
+            return
+        sql += " WHERE tournament_id IN :tids"
+        params["tids"] = [int(t) for t in tournament_ids]
+    stmt = text(sql + " ORDER BY " + ", ".join(f'"{c}"' for c in columns[:2]))
+    if params:
+        stmt = stmt.bindparams(bindparam("tids", expanding=True))
+    # stream_results uses a server-side cursor on Postgres, so chunks are fetched as they are written
+    streaming = conn.execution_options(stream_results=True)
+    for chunk in pd.read_sql(stmt, streaming, params=params, chunksize=chunk_size):
+        yield _typed_chunk(chunk, columns, int_columns, date_columns)
+
+
+def _cell(v):
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    return v
+
+
+def _rows(chunk: pd.DataFrame):
+    for row in chunk.astype(object).itertuples(index=False, name=None):
+        yield [_cell(v) for v in row]
+
+
+def _write_xlsx(conn: Connection, path: str, tournament_ids: list[int] | None) -> None:
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for sheet, (_, columns, _, _) in _TABLES.items():
+        ws = wb.create_sheet(sheet)
+        ws.append(columns)
+        for chunk in iter_export_chunks(conn, sheet, tournament_ids):
+            for row in _rows(chunk):
+                ws.append(row)
+    wb.save(path)
+
+
+def _write_csv(conn: Connection, path: str, tournament_ids: list[int] | None) -> None:
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for sheet, (_, columns, _, _) in _TABLES.items():
+            with zf.open(f"{sheet.lower()}.csv", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for chunk in iter_export_chunks(conn, sheet, tournament_ids):
+                    writer.writerows(_rows(chunk))
+
+
+def _parquet_schema(pa, columns: list[str], int_columns: list[str], date_columns: list[str]):
+    return pa.schema([
+        (c, pa.int64() if c in int_columns else pa.timestamp("us") if c in date_columns else pa.string())
+        for c in columns
+    ])
+
+
+def _write_parquet(conn: Connection, path: str, tournament_ids: list[int] | None) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except Exception:
+        raise ValueError("Parquet export needs the pyarrow package")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for sheet, (_, columns, int_columns, date_columns) in _TABLES.items():
+            schema = _parquet_schema(pa, columns, int_columns, date_columns)
+            with zf.open(f"{sheet.lower()}.parquet", "w", force_zip64=True) as f:
+                writer = pq.ParquetWriter(f, schema)
+                try:
+                    for chunk in iter_export_chunks(conn, sheet, tournament_ids):
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                finally:
+                    writer.close()
+
+
+_WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv, "parquet": _write_parquet}
+
+
+def _cleanup_old_exports() -> None:
+    cutoff = time.time() - EXPORT_MAX_AGE_SECONDS
+    try:
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    except Exception:
+        pass
+
+
+def export_file_name(fmt: str, label: str) -> str:
+    ext = "xlsx" if fmt == "xlsx" else "zip"
+    return f"padel_export_{label}.{ext}"
+
+
+def write_export(conn: Connection, fmt: str, tournament_ids: list[int] | None = None) -> str:
+    # Writes the export to a new file under EXPORT_DIR and returns its path; None exports everything
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _cleanup_old_exports()
+    fd, path = tempfile.mkstemp(prefix="export_", suffix="." + ("xlsx" if fmt == "xlsx" else "zip"), dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        _WRITERS[fmt](conn, path, tournament_ids)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
@@ -1,5 +1,12 @@
 import io
+from contextlib import contextmanager
+from typing import Iterable
+import numpy as np
 import pandas as pd
+from sqlalchemy.engine import Connection
+from data.repository import merge_rows
+from services.players import apply_player_changes, apply_roster_changes, read_team_rosters
+from services.standings_store import read_tournament_matches, rebuild_standings, seed_standings
 
 TEAMS_COLUMNS = ["team_id", "team_name", "player1", "player2", "group", "seed"]
 MATCHES_COLUMNS = [
@@ -21,48 +28,194 @@ def create_template_excel() -> bytes:
     return buf.getvalue()
 
 
-def validate_excel(xl: pd.ExcelFile) -> tuple[bool, str | None]:
-    sheets = xl.sheet_names
-    if "Teams" not in sheets:
-        return False, "Missing 'Teams' sheet"
-    if "Matches" not in sheets:
-        return False, "Missing 'Matches' sheet"
-    teams_df = xl.parse("Teams")
-    matches_df = xl.parse("Matches")
-    missing_teams_cols = [c for c in TEAMS_COLUMNS if c not in teams_df.columns]
-    if missing_teams_cols:
-        return False, f"Teams sheet missing columns: {missing_teams_cols}"
-    missing_matches_cols = [c for c in MATCHES_COLUMNS if c not in matches_df.columns]
-    if missing_matches_cols:
-        return False, f"Matches sheet missing columns: {missing_matches_cols}"
-    return True, None
-
-
-def load_excel(file_bytes: bytes) -> tuple[pd.DataFrame, pd.DataFrame]:
-    xl = pd.ExcelFile(io.BytesIO(file_bytes))
-    ok, err = validate_excel(xl)
-    if not ok:
+TEAMS_INT_COLUMNS = ["team_id", "seed"]
+MATCHES_INT_COLUMNS = ["match_id", "team1_id", "team2_id", "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2"]
+IMPORT_SHEETS = {"Teams": (TEAMS_COLUMNS, TEAMS_INT_COLUMNS), "Matches": (MATCHES_COLUMNS, MATCHES_INT_COLUMNS)}
+IMPORT_CHUNK_ROWS = 5000
+# Row-level problems beyond this many are only counted, so a broken sheet can't flood the UI
+MAX_REPORTED_ERRORS = 200
+# Compressed workbook size up to which the optional python-calamine reader is used
+CALAMINE_MAX_BYTES = 2 * 1024 * 1024
+
+
+def validate_header(sheet: str, header: tuple, columns: list[str]) -> str | None:
+    names = [str(h).strip() if h is not None else "" for h in header]
+    missing = [c for c in columns if c not in names]
+    if missing:
+        return f"{sheet} sheet missing columns: {missing}"
+    return None
+
+
+def _coerce_chunk(sheet: str, chunk: pd.DataFrame, lines: np.ndarray, int_columns: list[str], errors: list[str]) -> pd.DataFrame:
+    found: list[tuple[int, str]] = []
+    for c in int_columns:
+        raw = chunk[c]
+        num = pd.to_numeric(raw, errors="coerce")
+        bad = (num.isna() & raw.notna() & (raw.astype(str).str.strip() != "")) | (num.notna() & (num % 1 != 0))
+        if bad.any():
+            for line, value in zip(lines[bad.to_numpy()], raw[bad]):
+                found.append((line, f"{sheet} line {line}: {c} {value!r} is not a whole number"))
+            num = num.mask(bad)
+        chunk[c] = num.astype("Int64")
+    if "status" in chunk.columns:
+        status = chunk["status"]
+        bad = status.notna() & ~status.isin(STATUS_VALUES)
+        for line, value in zip(lines[bad.to_numpy()], status[bad]):
+            found.append((line, f"{sheet} line {line}: status {value!r} is not one of {STATUS_VALUES}, using 'Scheduled'"))
+        chunk["status"] = status.where(status.isin(STATUS_VALUES), "Scheduled")
+    errors.extend(msg for _, msg in sorted(found, key=lambda f: f[0]))
+    return chunk
+
+
+def iter_sheet_chunks(rows, sheet: str, columns: list[str], int_columns: list[str], errors: list[str], chunk_size: int = IMPORT_CHUNK_ROWS):
+    # Streams a sheet's row tuples: the header comes from the first row only, then rows are
+    # buffered chunk_size at a time and coerced column-wise. Blank rows are skipped.
+    rows = iter(rows)
+    header = next(rows, ())
+    err = validate_header(sheet, header, columns)
+    if err:
         raise ValueError(err)
-    teams_df = xl.parse("Teams")
-    matches_df = xl.parse("Matches")
-    for c in ["team_id", "seed"]:
-        if c in teams_df.columns:
-            teams_df[c] = pd.to_numeric(teams_df[c], errors="coerce").astype("Int64")
-    for c in ["match_id", "team1_id", "team2_id", "set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2"]:
-        if c in matches_df.columns:
-            matches_df[c] = pd.to_numeric(matches_df[c], errors="coerce").astype("Int64")
-    if "status" in matches_df.columns:
-        matches_df["status"] = matches_df["status"].fillna("Scheduled")
-        matches_df.loc[~matches_df["status"].isin(STATUS_VALUES), "status"] = "Scheduled"
+    names = [str(h).strip() if h is not None else "" for h in header]
+    positions = [names.index(c) for c in columns]
+    width = max(positions) + 1
+
+    def flush(buf, lines):
+        chunk = pd.DataFrame(buf, columns=columns, dtype=object)
+        return _coerce_chunk(sheet, chunk, np.asarray(lines), int_columns, errors)
+
+    buf: list[tuple] = []
+    lines: list[int] = []
+    for line, row in enumerate(rows, start=2):
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        values = tuple(None if v == "" else v for v in (row[i] for i in positions))
+        if all(v is None or (isinstance(v, str) and not v.strip()) for v in values):
+            continue
+        buf.append(values)
+        lines.append(line)
+        if len(buf) >= chunk_size:
+            yield flush(buf, lines)
+            buf, lines = [], []
+    if buf:
+        yield flush(buf, lines)
+
+
+def _concat(chunks: list[pd.DataFrame], columns: list[str], int_columns: list[str]) -> pd.DataFrame:
+    if chunks:
+        return pd.concat(chunks, ignore_index=True)
+    return pd.DataFrame({c: pd.Series(dtype="Int64" if c in int_columns else object) for c in columns})
+
+
+def _whole_floats_to_int(v):
+    return int(v) if isinstance(v, float) and v.is_integer() else v
+
+
+def _size(src) -> int | None:
+    # Bytes left in a seekable file object, or None when it can't tell
+    try:
+        pos = src.tell()
+        end = src.seek(0, 2)
+        src.seek(pos)
+        return end - pos
+    except Exception:
+        return None
+
+
+def _open_workbook(src):
+    # Returns (sheet names, rows(sheet) -> iterator of row tuples, close). openpyxl read-only
+    # mode streams rows, so memory stays bounded whatever the sheet size. python-calamine is
+    # several times faster but reads a whole sheet into memory when it is opened, so it is only
+    # used, when installed, for workbooks up to CALAMINE_MAX_BYTES.
+    size = _size(src)
+    CalamineWorkbook = None
+    if size is not None and size <= CALAMINE_MAX_BYTES:
+        try:
+            from python_calamine import CalamineWorkbook
+        except Exception:
+            CalamineWorkbook = None
+    if CalamineWorkbook is not None:
+        wb = CalamineWorkbook.from_filelike(src)
+        # Calamine reports every number as float; match openpyxl's ints for whole numbers
+        rows = lambda sheet: (tuple(map(_whole_floats_to_int, r)) for r in wb.get_sheet_by_name(sheet).iter_rows())
+        return wb.sheet_names, rows, getattr(wb, "close", lambda: None)
+    from openpyxl import load_workbook
+    wb = load_workbook(src, read_only=True, data_only=True)
+    return wb.sheetnames, lambda sheet: wb[sheet].iter_rows(values_only=True), wb.close
+
+
+def capped_errors(errors: list[str]) -> list[str]:
+    if len(errors) > MAX_REPORTED_ERRORS:
+        return errors[:MAX_REPORTED_ERRORS] + [f"... and {len(errors) - MAX_REPORTED_ERRORS} more"]
+    return errors
+
+
+@contextmanager
+def open_excel(file):
+    # Yields (teams chunks, matches chunks, row errors) for one open workbook. The chunks are
+    # lazy: each sheet is parsed IMPORT_CHUNK_ROWS rows at a time while it is consumed, and the
+    # errors list fills as it goes. Header problems raise ValueError on the first chunk.
+    src = io.BytesIO(file) if isinstance(file, (bytes, bytearray)) else file
+    sheet_names, rows, close = _open_workbook(src)
+    try:
+        for sheet in IMPORT_SHEETS:
+            if sheet not in sheet_names:
+                raise ValueError(f"Missing '{sheet}' sheet")
+        errors: list[str] = []
+        teams, matches = (
+            iter_sheet_chunks(rows(sheet), sheet, columns, int_columns, errors)
+            for sheet, (columns, int_columns) in IMPORT_SHEETS.items()
+        )
+        yield teams, matches, errors
+    finally:
+        close()
+
+
+def read_excel(file) -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
+    # file is the workbook as bytes or a binary file object. Returns (teams, matches, row errors);
+    # header problems raise ValueError. Rows with bad values are kept with the bad cells blanked.
+    # Both sheets end up in memory; open_excel + import_into_tournament merge chunk by chunk.
+    with open_excel(file) as (teams, matches, errors):
+        frames = [
+            _concat(list(chunks), columns, int_columns)
+            for chunks, (columns, int_columns) in zip((teams, matches), IMPORT_SHEETS.values())
+        ]
+    return frames[0], frames[1], capped_errors(errors)
+
+
+def load_excel(file) -> tuple[pd.DataFrame, pd.DataFrame]:
+    teams_df, matches_df, _ = read_excel(file)
     return teams_df, matches_df
 
 
-def export_excel_bytes(teams_df: pd.DataFrame, matches_df: pd.DataFrame) -> bytes:
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        teams_df = teams_df.reindex(columns=TEAMS_COLUMNS)
-        matches_df = matches_df.reindex(columns=MATCHES_COLUMNS)
-        teams_df.to_excel(writer, sheet_name="Teams", index=False)
-        matches_df.to_excel(writer, sheet_name="Matches", index=False)
-    buf.seek(0)
-    return buf.getvalue()
+def _merge_chunks(conn: Connection, table: str, chunks, key: str, scope: dict) -> dict[str, int]:
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    total = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    for chunk in chunks:
+        for k, v in merge_rows(conn, table, chunk, key, scope).items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def import_into_tournament(
+    conn: Connection,
+    tournament_id: int,
+    teams: pd.DataFrame | Iterable[pd.DataFrame],
+    matches: pd.DataFrame | Iterable[pd.DataFrame],
+) -> dict[str, dict[str, int]]:
+    # Merges the workbook into one tournament; other tournaments and rows missing from the file are kept.
+    # teams/matches are DataFrames or iterables of chunks (see open_excel), merged one chunk at a time.
+    scope = {"tournament_id": tournament_id}
+    before = read_tournament_matches(conn, tournament_id)
+    rosters = read_team_rosters(conn, tournament_id)
+    summary = {"teams": _merge_chunks(conn, "teams", teams, "team_id", scope)}
+    # Existing matches move to the imported rosters first, so the match delta below sees one roster
+    apply_roster_changes(conn, tournament_id, rosters)
+    summary["matches"] = _merge_chunks(conn, "matches", matches, "match_id", scope)
+    if summary["matches"]["inserted"] or summary["matches"]["updated"] or summary["teams"]["inserted"]:
+        rebuild_standings(conn, tournament_id)
+        apply_player_changes(conn, tournament_id, before, read_tournament_matches(conn, tournament_id))
+    else:
+        seed_standings(conn, tournament_id)
+    return summary
+
@@ -0,0 +1,236 @@
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from services.import_export import MATCHES_COLUMNS
+from services.standings import summarize_matches
+from services.standings_store import MATCH_SELECT, apply_match_changes
+
+# Single-elimination brackets. Every knockout match stores where its winner (and, for
+# semifinals / consolation feeders, its loser) goes next as (match_id, side), so saving a
+# result moves the teams on with one indexed UPDATE per match instead of a bracket rescan.
+
+KNOCKOUT_STAGE = "knockout"
+CONSOLATION_STAGE = "consolation"
+BRACKET_COLUMNS = MATCHES_COLUMNS + ["round_no", "stage", "next_match_id", "next_slot", "loser_next_match_id", "loser_next_slot"]
+
+
+def qualifiers(standings: pd.DataFrame, teams_df: pd.DataFrame, top_n: int) -> pd.DataFrame:
+    # Top-N of each group, seeded group winners first, then runners-up, and so on; within a
+    # tier Team.seed decides (lower is better, unseeded last), then the group-stage record
+    table = standings.copy()
+    table["group_rank"] = table.groupby("group", sort=False).cumcount() + 1
+    table = table[table["group_rank"] <= int(top_n)]
+    seeds = pd.to_numeric(teams_df.set_index(pd.to_numeric(teams_df["team_id"], errors="coerce"))["seed"], errors="coerce") if "seed" in teams_df.columns else pd.Series(dtype="float64")
+    seeds = seeds[~seeds.index.duplicated()]
+    table["seed"] = pd.to_numeric(table["team_id"], errors="coerce").map(seeds)
+    table = table.sort_values(
+        ["group_rank", "seed", "points", "wins", "sets_diff", "games_diff", "group"],
+        ascending=[True, True, False, False, False, False, True],
+        na_position="last",
+        kind="stable",
+    )
+    return table.reset_index(drop=True)[["team_id", "group", "group_rank", "seed"]]
+
+
+def bracket_order(size: int) -> list[int]:
+    # Seed numbers in bracket position order, so seeds 1 and 2 can only meet in the final
+    order = [1]
+    while len(order) < size:
+        n = len(order) * 2
+        order = [x for s in order for x in (s, n + 1 - s)]
+    return order
+
+
+def _avoid_same_group(pairs: list[list], groups: dict) -> None:
+    # Swap lower-seeded sides between first-round pairs so group mates don't meet at once
+    def clash(p):
+        return p[0] is not None and p[1] is not None and groups.get(p[0]) == groups.get(p[1])
+    for i, p in enumerate(pairs):
+        if not clash(p):
+            continue
+        for j in sorted(range(len(pairs)), key=lambda j: abs(j - i)):
+            q = pairs[j]
+            if j == i or q[1] is None:
+                continue
+            if groups.get(q[1]) != groups.get(p[0]) and groups.get(p[1]) != groups.get(q[0]):
+                p[1], q[1] = q[1], p[1]
+                break
+
+
+def _round_label(remaining: int, prefix: str = "") -> str:
+    names = {2: "Final", 4: "Semifinal", 8: "Quarterfinal"}
+    return prefix + names.get(remaining, f"Round of {remaining}")
+
+
+class _Builder:
+    # Inputs are ("team", id), ("bye",) or ("match", index, "winner" | "loser"). A pair with a
+    # bye resolves without a match, so byes never show up as matches.
+    def __init__(self, start_id: int):
+        self.next_id = int(start_id)
+        self.rows: list[dict] = []
+
+    def _feed(self, src, match_id: int, side: int) -> None:
+        if src[0] != "match":
+            return
+        row = self.rows[src[1]]
+        prefix = "next" if src[2] == "winner" else "loser_next"
+        row[f"{prefix}_match_id"] = match_id
+        row[f"{prefix}_slot"] = side
+
+    def match(self, a, b, label: str, stage: str, round_no: int):
+        if a[0] == "bye":
+            return b, ("bye",)
+        if b[0] == "bye":
+            return a, ("bye",)
+        row = {c: pd.NA for c in BRACKET_COLUMNS}
+        row.update({
+            "match_id": self.next_id, "group": label, "status": "Scheduled", "stage": stage, "round_no": round_no,
+            "team1_id": a[1] if a[0] == "team" else pd.NA,
+            "team2_id": b[1] if b[0] == "team" else pd.NA,
+        })
+        self.rows.append(row)
+        idx = len(self.rows) - 1
+        self._feed(a, self.next_id, 1)
+        self._feed(b, self.next_id, 2)
+        self.next_id += 1
+        return ("match", idx, "winner"), ("match", idx, "loser")
+
+    def bracket(self, entries: list, stage: str, prefix: str = "") -> tuple[list, list]:
+        # Plays entries (already in bracket order) down to one; returns per-round loser lists
+        losers_by_round = []
+        current = entries
+        round_no = 1
+        while len(current) > 1:
+            label = _round_label(len(current), prefix)
+            nxt, losers = [], []
+            for a, b in zip(current[0::2], current[1::2]):
+                w, l = self.match(a, b, label, stage, round_no)
+                nxt.append(w)
+                losers.append(l)
+            losers_by_round.append(losers)
+            current = nxt
+            round_no += 1
+        return current, losers_by_round
+
+
+def generate_bracket(
+    qualified: pd.DataFrame,
+    start_id: int,
+    third_place: bool = False,
+    consolation: bool = False,
+) -> pd.DataFrame:
+    # Matches for a single-elimination bracket over the seeded qualifiers (best first)
+    team_ids = [int(t) for t in pd.to_numeric(qualified["team_id"], errors="coerce").dropna()]
+    if len(team_ids) < 2:
+        return pd.DataFrame(columns=BRACKET_COLUMNS)
+    size = 1
+    while size < len(team_ids):
+        size *= 2
+    seeded = {i + 1: t for i, t in enumerate(team_ids)}
+    slots = [seeded.get(s) for s in bracket_order(size)]
+    pairs = [[slots[i], slots[i + 1]] for i in range(0, size, 2)]
+    _avoid_same_group(pairs, dict(zip(team_ids, qualified["group"])))
+    entries = [("team", t) if t is not None else ("bye",) for p in pairs for t in p]
+
+    b = _Builder(start_id)
+    _, losers = b.bracket(entries, KNOCKOUT_STAGE)
+    if third_place and len(losers) >= 2:
+        semis = losers[-2]
+        if len(semis) == 2:
+            b.match(semis[0], semis[1], "3rd Place", KNOCKOUT_STAGE, len(losers))
+    if consolation and losers and len(losers[0]) >= 2:
+        # First-round losers play their own bracket
+        b.bracket(losers[0], CONSOLATION_STAGE, prefix="Consolation ")
+    return pd.DataFrame(b.rows, columns=BRACKET_COLUMNS)
+
+
+def clear_bracket(conn: Connection, tournament_id: int) -> int:
+    # Deletes every knockout and consolation match. Career stats and ratings count every stage,
+    # so the deleted results are taken back out first
+    gone = pd.read_sql(text(MATCH_SELECT + " WHERE tournament_id = :tid AND stage IS NOT NULL"), conn, params={"tid": tournament_id})
+    apply_match_changes(conn, tournament_id, gone, None)
+    conn.execute(text("DELETE FROM matches WHERE tournament_id = :tid AND stage IS NOT NULL"), {"tid": tournament_id})
+    return len(gone)
+
+
+def _same_team(a, b) -> bool:
+    return (pd.isna(a) and pd.isna(b)) or (pd.notna(a) and pd.notna(b) and int(a) == int(b))
+
+
+def _feeds(conn: Connection, tournament_id: int, ids: list[int]) -> list[tuple[int, int, int | None]]:
+    # (target match, side, team) for every pointer of the given matches; the team is None while
+    # the match is undecided
+    rows = pd.read_sql(
+        text(
+            "SELECT match_id, team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, "
+            "next_match_id, next_slot, loser_next_match_id, loser_next_slot FROM matches "
+            "WHERE tournament_id = :tid AND match_id IN :ids AND (next_match_id IS NOT NULL OR loser_next_match_id IS NOT NULL)"
+        ).bindparams(bindparam("ids", expanding=True)),
+        conn,
+        params={"tid": tournament_id, "ids": ids},
+    )
+    if rows.empty:
+        return []
+    res = summarize_matches(rows)
+    decided = (rows["status"] == "Completed").to_numpy() & res["winner_id"].notna().to_numpy()
+    winner = res["winner_id"].to_numpy(dtype="float64", na_value=float("nan"))
+    t1 = pd.to_numeric(rows["team1_id"], errors="coerce").to_numpy()
+    t2 = pd.to_numeric(rows["team2_id"], errors="coerce").to_numpy()
+    out = []
+    for i in range(len(rows)):
+        w = int(winner[i]) if decided[i] else None
+        l = (int(t2[i]) if w == t1[i] else int(t1[i])) if w is not None else None
+        for target, side, team in (
+            (rows["next_match_id"].iat[i], rows["next_slot"].iat[i], w),
+            (rows["loser_next_match_id"].iat[i], rows["loser_next_slot"].iat[i], l),
+        ):
+            if pd.notna(target) and pd.notna(side) and int(side) in (1, 2):
+                out.append((int(target), int(side), team))
+    return out
+
+
+def advance_results(conn: Connection, tournament_id: int, match_ids) -> int:
+    # Moves winners (and losers) of the given knockout matches into the matches their pointers
+    # name. Undecided or reopened matches clear the side they feed. A match whose side changes
+    # after it was played loses its result: the sets are cleared, it is Scheduled again
+    # (standings and player stats follow) and what it fed is updated in turn, down the bracket.
+    ids = [int(m) for m in pd.to_numeric(pd.Series(list(match_ids), dtype="object"), errors="coerce").dropna()]
+    count = 0
+    seen: set = set()
+    while ids:
+        seen.update(ids)
+        feeds = _feeds(conn, tournament_id, ids)
+        if not feeds:
+            break
+        targets = pd.read_sql(
+            text(MATCH_SELECT + " WHERE tournament_id = :tid AND match_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            conn,
+            params={"tid": tournament_id, "ids": sorted({f[0] for f in feeds})},
+        ).set_index("match_id", drop=False)
+        new = targets.copy()
+        updates = {1: [], 2: []}
+        for target, side, team in feeds:
+            if target not in new.index or _same_team(new.at[target, f"team{side}_id"], team):
+                continue
+            new.at[target, f"team{side}_id"] = team
+            updates[side].append({"tid": tournament_id, "mid": target, "team": team})
+        for side, params in updates.items():
+            if params:
+                conn.execute(text(f"UPDATE matches SET team{side}_id = :team WHERE tournament_id = :tid AND match_id = :mid"), params)
+                count += len(params)
+        moved = [m for m in new.index if not (_same_team(new.at[m, "team1_id"], targets.at[m, "team1_id"]) and _same_team(new.at[m, "team2_id"], targets.at[m, "team2_id"]))]
+        sets = [c for c in new.columns if c.startswith("set")]
+        played = [m for m in moved if targets.loc[m, sets].notna().any() or targets.at[m, "status"] in ("In Progress", "Completed")]
+        if played:
+            conn.execute(
+                text(
+                    "UPDATE matches SET " + ", ".join(f"{c} = NULL" for c in sets) + ", status = 'Scheduled' "
+                    "WHERE tournament_id = :tid AND match_id IN :ids"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"tid": tournament_id, "ids": played},
+            )
+            new.loc[played, sets] = None
+            new.loc[played, "status"] = "Scheduled"
+            apply_match_changes(conn, tournament_id, targets.loc[played].reset_index(drop=True), new.loc[played].reset_index(drop=True))
+        ids = [m for m in played if m not in seen]
+    return count
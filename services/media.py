@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image, features
+except Exception:
+    Image = None
+    features = None
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MEDIA_DIR = os.path.join(PROJECT_ROOT, "tournament_media")
+# Streamlit serves <app root>/static at app/static/ when server.enableStaticServing is on
+STATIC_DIR = os.path.join(PROJECT_ROOT, "static")
+THUMB_DIR = os.path.join(STATIC_DIR, "media")
+STATIC_URL_PREFIX = "app/static/media/"
+# Card thumbnail heights in CSS px: App page cards and the Overview header card
+THUMB_HEIGHTS = (180, 220)
+ICON_UPLOAD_TYPES = ["png", "jpg", "jpeg", "webp", "gif"]
+CACHE_MAX_BYTES = int(os.getenv("PADEL_THUMB_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+
+class _LRU:
+    # Bounded by the total size of the cached strings, not the number of entries
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self.size -= len(self._data.pop(key))
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and len(self._data) > 1:
+                _, old = self._data.popitem(last=False)
+                self.size -= len(old)
+
+
+_encoded = _LRU(CACHE_MAX_BYTES)
+
+
+def resolve_icon_path(icon: str | None) -> str | None:
+    if not icon:
+        return None
+    icon = str(icon).replace("\\", "/")
+    path = icon if os.path.isabs(icon) else os.path.abspath(os.path.join(PROJECT_ROOT, icon))
+    return path if os.path.exists(path) else None
+
+
+def _thumb_format() -> tuple[str, str]:
+    if features is not None and features.check("webp"):
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def _render_thumbnail(src_path: str, height: int) -> bytes:
+    fmt, _ = _thumb_format()
+    with Image.open(src_path) as im:
+        im.seek(0)
+        im = im.convert("RGBA" if fmt == "WEBP" and im.mode in ("RGBA", "LA", "P") else "RGB")
+        if im.height > height:
+            width = max(1, round(im.width * height / im.height))
+            im = im.resize((width, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        if fmt == "WEBP":
+            im.save(buf, format=fmt, quality=82, method=4)
+        else:
+            im.save(buf, format=fmt, quality=82, optimize=True)
+    return buf.getvalue()
+
+
+def _content_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def thumbnail_path(src_path: str, height: int) -> str:
+    # Named after the source content hash, so a re-upload gets new files and old ones are never stale
+    _, ext = _thumb_format()
+    path = os.path.join(THUMB_DIR, f"{_content_hash(src_path)}_{height}{ext}")
+    if not os.path.exists(path):
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_render_thumbnail(src_path, height))
+        os.replace(tmp, path)
+    return path
+
+
+def make_thumbnails(src_path: str) -> dict[int, str]:
+    if Image is None:
+        return {}
+    return {h: thumbnail_path(src_path, h) for h in THUMB_HEIGHTS}
+
+
+_MIME_FALLBACK = {".webp": "image/webp", ".gif": "image/gif", ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+
+def _mime(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return mimetypes.guess_type(path)[0] or _MIME_FALLBACK.get(ext, "application/octet-stream")
+
+
+def _data_uri(path: str) -> str:
+    mime = _mime(path)
+    with open(path, "rb") as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode('utf-8')}"
+
+
+def _static_serving_enabled() -> bool:
+    try:
+        import streamlit as st
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def _static_url(thumb: str) -> str:
+    # Relative so it also works under server.baseUrlPath. The ?v= argument makes Tornado's
+    # static handler send a 10-year Cache-Control, and the hashed name changes with the content.
+    name = os.path.basename(thumb)
+    return f"{STATIC_URL_PREFIX}{name}?v={name.split('_')[0]}"
+
+
+def icon_src(icon: str | None, height: int) -> str:
+    # <img src> value for a tournament icon at the given card height; "" when there is nothing to show.
+    # A cacheable static URL when static serving is enabled, otherwise an inline data URI.
+    if not icon:
+        return ""
+    if icon.startswith("http://") or icon.startswith("https://"):
+        return icon
+    path = resolve_icon_path(icon)
+    if path is None:
+        return ""
+    info = os.stat(path)
+    key = (path, info.st_mtime_ns, info.st_size, height)
+    hit = _encoded.get(key)
+    if hit is not None:
+        return hit
+    try:
+        if Image is None:
+            src = _data_uri(path)
+        elif _static_serving_enabled():
+            src = _static_url(thumbnail_path(path, height))
+        else:
+            src = _data_uri(thumbnail_path(path, height))
+    except Exception:
+        src = _data_uri(path)
+    _encoded.put(key, src)
+    return src
@@ -0,0 +1,469 @@
+import argparse
+import math
+import unicodedata
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from services.standings import team_long_format, summarize_matches
+
+# Players across tournaments. Teams only carry player names, so every name is normalized into
+# players.name_key (unique index) and a player is whoever shares that key. player_stats keeps
+# career totals and an Elo rating per player; both are updated from the same old/new match
+# rows as team_standings, so a profile is one primary-key read. player_rating_events records
+# what each rated match gave each player, so corrected or cleared results can be undone.
+
+PLAYER_STAT_COLUMNS = ["matches", "wins", "losses", "sets_won", "sets_lost", "games_won", "games_lost"]
+INITIAL_RATING = 1500.0
+# Ratings move faster while they are still uncertain (Glicko-style), then settle
+K_PROVISIONAL = 40.0
+K_ESTABLISHED = 20.0
+PROVISIONAL_MATCHES = 15
+_IN_CHUNK = 500
+
+_UPSERT_STATS = text(
+    "INSERT INTO player_stats(player_id, " + ", ".join(PLAYER_STAT_COLUMNS) + ", rating, rated_matches) "
+    "VALUES(:player_id, " + ", ".join(":" + c for c in PLAYER_STAT_COLUMNS) + f", {INITIAL_RATING}, 0) "
+    "ON CONFLICT(player_id) DO UPDATE SET "
+    + ", ".join(f"{c} = player_stats.{c} + excluded.{c}" for c in PLAYER_STAT_COLUMNS)
+)
+_MATCH_SELECT = (
+    "SELECT tournament_id, match_id, team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches"
+)
+
+
+def player_key(name) -> str | None:
+    # Case, accents and spacing don't distinguish players: "José  Pérez" == "jose perez"
+    if name is None or name is pd.NA or (isinstance(name, float) and math.isnan(name)):
+        return None
+    s = unicodedata.normalize("NFKD", str(name))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    key = " ".join(s.casefold().split())
+    return key or None
+
+
+def team_players(teams_df: pd.DataFrame, by: tuple[str, ...] = ("team_id",)) -> pd.DataFrame:
+    # One row per (team, named player): the `by` id columns, key, name
+    by = list(by)
+    cols = by + ["key", "name"]
+    names = [c for c in ("player1", "player2") if teams_df is not None and c in teams_df.columns]
+    if teams_df is None or teams_df.empty or not names:
+        return pd.DataFrame(columns=cols)
+    long = teams_df[by + names].melt(id_vars=by, value_vars=names, value_name="name")
+    for c in by:
+        long[c] = pd.to_numeric(long[c], errors="coerce")
+    long = long.dropna(subset=by + ["name"])
+    # Each distinct spelling is normalized once, however many teams use it
+    keys = {n: player_key(n) for n in pd.unique(long["name"])}
+    long = long.assign(key=long["name"].map(keys), name=long["name"].map(lambda n: " ".join(str(n).split())))
+    long = long[long["key"].notna()].astype({c: "int64" for c in by})
+    return long[cols].drop_duplicates(by + ["key"]).reset_index(drop=True)
+
+
+def ensure_players(conn: Connection, names: dict[str, str]) -> dict[str, int]:
+    # {key: display name} -> {key: player_id}, creating players that don't exist yet
+    keys = list(names)
+    found: dict[str, int] = {}
+
+    def lookup(batch):
+        stmt = text("SELECT name_key, player_id FROM players WHERE name_key IN :keys").bindparams(bindparam("keys", expanding=True))
+        for i in range(0, len(batch), _IN_CHUNK):
+            for k, pid in conn.execute(stmt, {"keys": batch[i:i + _IN_CHUNK]}).all():
+                found[str(k)] = int(pid)
+
+    if keys:
+        lookup(keys)
+    missing = [k for k in keys if k not in found]
+    if missing:
+        conn.execute(
+            text("INSERT INTO players(name, name_key) VALUES(:name, :key) ON CONFLICT(name_key) DO NOTHING"),
+            [{"name": names[k], "key": k} for k in missing],
+        )
+        lookup(missing)
+    return found
+
+
+def player_match_stats(matches_df: pd.DataFrame | None, teams_df: pd.DataFrame) -> pd.DataFrame:
+    # Career stat contributions of these matches, per player key (every stage counts)
+    if matches_df is None or matches_df.empty:
+        return pd.DataFrame(columns=PLAYER_STAT_COLUMNS, dtype="int64").rename_axis("key")
+    long = team_long_format(matches_df).rename(columns={"played": "matches"})
+    long = long.merge(team_players(teams_df)[["team_id", "key"]], on="team_id")
+    return long.groupby("key", sort=False)[PLAYER_STAT_COLUMNS].sum()
+
+
+def player_stats_delta(old_df: pd.DataFrame | None, new_df: pd.DataFrame | None, teams_df: pd.DataFrame) -> pd.DataFrame:
+    delta = player_match_stats(new_df, teams_df).sub(player_match_stats(old_df, teams_df), fill_value=0).fillna(0).astype("int64")
+    return delta[(delta != 0).any(axis=1)]
+
+
+def _apply_stats(conn: Connection, delta: pd.DataFrame, ids: dict[str, int]) -> int:
+    rows = [
+        {"player_id": ids[key], **{c: int(v) for c, v in zip(PLAYER_STAT_COLUMNS, vals)}}
+        for key, vals in zip(delta.index, delta[PLAYER_STAT_COLUMNS].itertuples(index=False, name=None))
+        if key in ids
+    ]
+    if rows:
+        conn.execute(_UPSERT_STATS, rows)
+    return len(rows)
+
+
+def k_factor(rated_matches: int) -> float:
+    return K_PROVISIONAL if rated_matches < PROVISIONAL_MATCHES else K_ESTABLISHED
+
+
+def expected_score(rating_a: float, rating_b: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** ((rating_b - rating_a) / 400.0))
+
+
+def rate_match(ratings: dict[int, float], counts: dict[int, int], side1: list[int], side2: list[int], side1_won: bool) -> dict[int, float]:
+    # Elo for pairs: a team plays at its players' mean rating and each player moves by their own K.
+    # Updates ratings/counts in place and returns each player's change.
+    for p in side1 + side2:
+        ratings.setdefault(p, INITIAL_RATING)
+        counts.setdefault(p, 0)
+    e1 = expected_score(sum(ratings[p] for p in side1) / len(side1), sum(ratings[p] for p in side2) / len(side2))
+    s1 = 1.0 if side1_won else 0.0
+    deltas = {}
+    for players, score, exp in ((side1, s1, e1), (side2, 1.0 - s1, 1.0 - e1)):
+        for p in players:
+            deltas[p] = k_factor(counts[p]) * (score - exp)
+    for p, d in deltas.items():
+        ratings[p] += d
+        counts[p] += 1
+    return deltas
+
+
+def rated_results(matches_df: pd.DataFrame | None) -> dict[int, tuple]:
+    # match_id -> (team1_id, team2_id, team1 won, sets and games) for completed, decided matches
+    if matches_df is None or matches_df.empty or "match_id" not in matches_df.columns:
+        return {}
+    res = summarize_matches(matches_df)
+    ok = (res["team1_id"].notna() & res["team2_id"].notna() & res["winner_id"].notna()).to_numpy()
+    if "status" in matches_df.columns:
+        ok &= (matches_df["status"] == "Completed").to_numpy()
+    mids = pd.to_numeric(matches_df["match_id"], errors="coerce").to_numpy()
+    out = {}
+    for i in ok.nonzero()[0]:
+        if pd.isna(mids[i]):
+            continue
+        t1, t2 = int(res["team1_id"].iat[i]), int(res["team2_id"].iat[i])
+        out[int(mids[i])] = (
+            t1, t2, int(res["winner_id"].iat[i]) == t1,
+            int(res["t1_sets"].iat[i]), int(res["t2_sets"].iat[i]), int(res["t1_games"].iat[i]), int(res["t2_games"].iat[i]),
+        )
+    return out
+
+
+def _match_ids(df: pd.DataFrame | None) -> set[int]:
+    if df is None or df.empty or "match_id" not in df.columns:
+        return set()
+    return {int(m) for m in pd.to_numeric(df["match_id"], errors="coerce").dropna()}
+
+
+def _read_ratings(conn: Connection, player_ids: list[int]) -> tuple[dict[int, float], dict[int, int]]:
+    ratings, counts = {}, {}
+    stmt = text("SELECT player_id, rating, rated_matches FROM player_stats WHERE player_id IN :ids").bindparams(bindparam("ids", expanding=True))
+    for i in range(0, len(player_ids), _IN_CHUNK):
+        for pid, rating, n in conn.execute(stmt, {"ids": player_ids[i:i + _IN_CHUNK]}).all():
+            ratings[int(pid)] = INITIAL_RATING if rating is None else float(rating)
+            counts[int(pid)] = int(n or 0)
+    return ratings, counts
+
+
+def _undo_ratings(conn: Connection, tournament_id: int, match_ids: list[int]) -> int:
+    stmt = text(
+        "SELECT player_id, SUM(delta) AS delta, COUNT(*) AS n FROM player_rating_events "
+        "WHERE tournament_id = :tid AND match_id IN :ids GROUP BY player_id"
+    ).bindparams(bindparam("ids", expanding=True))
+    undone = 0
+    for i in range(0, len(match_ids), _IN_CHUNK):
+        params = {"tid": tournament_id, "ids": match_ids[i:i + _IN_CHUNK]}
+        rows = conn.execute(stmt, params).all()
+        if rows:
+            conn.execute(
+                text("UPDATE player_stats SET rating = rating - :d, rated_matches = rated_matches - :n WHERE player_id = :pid"),
+                [{"pid": int(pid), "d": float(d or 0.0), "n": int(n)} for pid, d, n in rows],
+            )
+            conn.execute(
+                text("DELETE FROM player_rating_events WHERE tournament_id = :tid AND match_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                params,
+            )
+            undone += len(rows)
+    return undone
+
+
+def mark_ratings_dirty(conn: Connection, tournament_id: int) -> None:
+    # The next batch run (services.rating_job) replays from this tournament on
+    conn.execute(
+        text("INSERT INTO ratings_dirty(tournament_id) VALUES(:tid) ON CONFLICT(tournament_id) DO NOTHING"),
+        {"tid": int(tournament_id)},
+    )
+
+
+def apply_rating_changes(conn: Connection, tournament_id: int, old_df: pd.DataFrame | None, new_df: pd.DataFrame | None, ids_by_team: dict[int, list[int]]) -> int:
+    # Matches whose rated result differs between old_df and new_df are undone, then re-rated
+    # online from current ratings in match_id order
+    old, new = rated_results(old_df), rated_results(new_df)
+    new_ids = _match_ids(new_df)
+    changed = sorted(m for m in (set(old) | set(new)) if old.get(m) != (new.get(m) if m in new_ids else None))
+    if not changed:
+        return 0
+    mark_ratings_dirty(conn, tournament_id)
+    _undo_ratings(conn, tournament_id, changed)
+    return _rate_online(conn, tournament_id, [(m, new[m]) for m in changed if m in new], ids_by_team)
+
+
+def _rate_online(conn: Connection, tournament_id: int, results: list[tuple[int, tuple]], ids_by_team: dict[int, list[int]]) -> int:
+    # Rates (match_id, rated result) pairs in order from the players' current ratings
+    todo = [(m, ids_by_team.get(r[0], []), ids_by_team.get(r[1], []), r[2]) for m, r in results]
+    todo = [t for t in todo if t[1] and t[2] and not set(t[1]) & set(t[2])]
+    if not todo:
+        return 0
+    players = sorted({p for t in todo for p in t[1] + t[2]})
+    conn.execute(
+        text(f"INSERT INTO player_stats(player_id, rating, rated_matches) VALUES(:pid, {INITIAL_RATING}, 0) ON CONFLICT(player_id) DO NOTHING"),
+        [{"pid": p} for p in players],
+    )
+    ratings, counts = _read_ratings(conn, players)
+    events = []
+    for mid, side1, side2, won in todo:
+        for pid, d in rate_match(ratings, counts, side1, side2, won).items():
+            events.append({"tid": tournament_id, "mid": mid, "pid": pid, "delta": d})
+    touched = sorted({e["pid"] for e in events})
+    conn.execute(
+        text("UPDATE player_stats SET rating = :r, rated_matches = :n WHERE player_id = :pid"),
+        [{"pid": p, "r": ratings[p], "n": counts[p]} for p in touched],
+    )
+    conn.execute(
+        text("INSERT INTO player_rating_events(tournament_id, match_id, player_id, delta) VALUES(:tid, :mid, :pid, :delta)"),
+        events,
+    )
+    return len(todo)
+
+
+def read_team_rosters(conn: Connection, tournament_id: int) -> pd.DataFrame:
+    return pd.read_sql(
+        text("SELECT team_id, player1, player2 FROM teams WHERE tournament_id = :tid"), conn, params={"tid": tournament_id}
+    )
+
+
+def apply_roster_changes(conn: Connection, tournament_id: int, old_teams: pd.DataFrame | None, new_teams: pd.DataFrame | None = None) -> int:
+    # Career stats and ratings follow the roster a match was played with. When teams change
+    # players (or are removed), their matches move from the old players to the new ones: the
+    # stats are re-attributed and the matches' ratings undone and rated again. Call after the
+    # teams were written and before the matches change; returns the matches re-attributed.
+    if tournament_id is None:
+        return 0
+    if new_teams is None:
+        new_teams = read_team_rosters(conn, tournament_id)
+    old_roster, new_roster = team_players(old_teams), team_players(new_teams)
+    old_sets = old_roster.groupby("team_id")["key"].agg(frozenset).to_dict()
+    new_sets = new_roster.groupby("team_id")["key"].agg(frozenset).to_dict()
+    changed = sorted(int(t) for t in set(old_sets) | set(new_sets) if old_sets.get(t, frozenset()) != new_sets.get(t, frozenset()))
+    if not changed:
+        return 0
+    # The batch ratings replay attributes matches by the current rosters too
+    mark_ratings_dirty(conn, tournament_id)
+    matches = pd.read_sql(
+        text(_MATCH_SELECT + " WHERE tournament_id = :tid AND (team1_id IN :teams OR team2_id IN :teams) ORDER BY match_id").bindparams(
+            bindparam("teams", expanding=True)
+        ),
+        conn,
+        params={"tid": tournament_id, "teams": changed},
+    )
+    if matches.empty:
+        return 0
+    names = dict(zip(old_roster["key"], old_roster["name"]))
+    names.update(zip(new_roster["key"], new_roster["name"]))
+    ids = ensure_players(conn, names)
+    delta = player_match_stats(matches, new_teams).sub(player_match_stats(matches, old_teams), fill_value=0).fillna(0).astype("int64")
+    _apply_stats(conn, delta[(delta != 0).any(axis=1)], ids)
+    results = rated_results(matches)
+    _undo_ratings(conn, tournament_id, sorted(_match_ids(matches)))
+    ids_by_team: dict[int, list[int]] = {}
+    for team_id, key in zip(new_roster["team_id"], new_roster["key"]):
+        ids_by_team.setdefault(int(team_id), []).append(ids[key])
+    _rate_online(conn, tournament_id, sorted(results.items()), ids_by_team)
+    return len(matches)
+
+
+def apply_player_changes(conn: Connection, tournament_id: int, old_df: pd.DataFrame | None, new_df: pd.DataFrame | None, teams_df: pd.DataFrame | None = None) -> int:
+    # Career stats and ratings after old_df rows of one tournament were replaced by new_df rows
+    if tournament_id is None:
+        return 0
+    if teams_df is None:
+        teams_df = read_team_rosters(conn, tournament_id)
+    roster = team_players(teams_df)
+    if roster.empty:
+        return 0
+    team_ids = set()
+    for df in (old_df, new_df):
+        if df is not None and not df.empty:
+            for c in ("team1_id", "team2_id"):
+                if c in df.columns:
+                    team_ids.update(int(t) for t in pd.to_numeric(df[c], errors="coerce").dropna())
+    involved = roster[roster["team_id"].isin(team_ids)]
+    if involved.empty:
+        return 0
+    ids = ensure_players(conn, dict(zip(involved["key"], involved["name"])))
+    n = _apply_stats(conn, player_stats_delta(old_df, new_df, teams_df), ids)
+    ids_by_team: dict[int, list[int]] = {}
+    for team_id, key in zip(involved["team_id"], involved["key"]):
+        if key in ids:
+            ids_by_team.setdefault(int(team_id), []).append(ids[key])
+    apply_rating_changes(conn, tournament_id, old_df, new_df, ids_by_team)
+    return n
+
+
+def chronological_tournaments(conn: Connection) -> list[int]:
+    rows = conn.execute(text(
+        "SELECT t.tournament_id FROM tournaments t "
+        "WHERE EXISTS (SELECT 1 FROM matches m WHERE m.tournament_id = t.tournament_id) "
+        "ORDER BY CASE WHEN t.start_date IS NULL THEN 1 ELSE 0 END, t.start_date, t.tournament_id"
+    )).all()
+    return [int(r[0]) for r in rows]
+
+
+def read_chronological_matches(conn: Connection, tournament_id: int) -> pd.DataFrame:
+    # Play order within a tournament: scheduled time, then round and slot, then match_id
+    return pd.read_sql(
+        text(
+            _MATCH_SELECT + " WHERE tournament_id = :tid ORDER BY "
+            "CASE WHEN scheduled_at IS NULL THEN 1 ELSE 0 END, scheduled_at, "
+            "CASE WHEN round_no IS NULL THEN 1 ELSE 0 END, round_no, "
+            "CASE WHEN slot IS NULL THEN 1 ELSE 0 END, slot, match_id"
+        ),
+        conn,
+        params={"tid": tournament_id},
+    )
+
+
+def rebuild_players(conn: Connection) -> dict[str, int]:
+    # Career stats and ratings from scratch, replaying every tournament in date order
+    conn.execute(text("DELETE FROM player_rating_events"))
+    conn.execute(text("DELETE FROM player_stats"))
+    # Batch checkpoints no longer describe these ratings; the next batch run starts from scratch
+    conn.execute(text("DELETE FROM rating_checkpoints"))
+    rosters = pd.read_sql(text("SELECT tournament_id, team_id, player1, player2 FROM teams WHERE tournament_id IS NOT NULL"), conn)
+    everyone = team_players(rosters.drop(columns="tournament_id"))
+    ids = ensure_players(conn, dict(zip(everyone["key"], everyone["name"])))
+    totals = pd.DataFrame(0, index=pd.Index(list(ids), name="key"), columns=PLAYER_STAT_COLUMNS)
+    ratings: dict[int, float] = {}
+    counts: dict[int, int] = {}
+    events = []
+    rated = 0
+    for tid in chronological_tournaments(conn):
+        teams_df = rosters[rosters["tournament_id"] == tid]
+        matches_df = read_chronological_matches(conn, tid)
+        totals = totals.add(player_match_stats(matches_df, teams_df), fill_value=0)
+        ids_by_team: dict[int, list[int]] = {}
+        roster = team_players(teams_df)
+        for team_id, key in zip(roster["team_id"], roster["key"]):
+            ids_by_team.setdefault(int(team_id), []).append(ids[key])
+        for mid, (t1, t2, won, *_) in rated_results(matches_df).items():
+            side1, side2 = ids_by_team.get(t1, []), ids_by_team.get(t2, [])
+            if not side1 or not side2 or set(side1) & set(side2):
+                continue
+            for pid, d in rate_match(ratings, counts, side1, side2, won).items():
+                events.append({"tid": tid, "mid": mid, "pid": pid, "delta": d})
+            rated += 1
+    rows = [
+        {"player_id": ids[key], **{c: int(v) for c, v in zip(PLAYER_STAT_COLUMNS, vals)},
+         "rating": ratings.get(ids[key], INITIAL_RATING), "rated_matches": counts.get(ids[key], 0)}
+        for key, vals in zip(totals.index, totals[PLAYER_STAT_COLUMNS].fillna(0).itertuples(index=False, name=None))
+    ]
+    if rows:
+        conn.execute(
+            text(
+                "INSERT INTO player_stats(player_id, " + ", ".join(PLAYER_STAT_COLUMNS) + ", rating, rated_matches) "
+                "VALUES(:player_id, " + ", ".join(":" + c for c in PLAYER_STAT_COLUMNS) + ", :rating, :rated_matches)"
+            ),
+            rows,
+        )
+    if events:
+        conn.execute(
+            text("INSERT INTO player_rating_events(tournament_id, match_id, player_id, delta) VALUES(:tid, :mid, :pid, :delta)"),
+            events,
+        )
+    return {"players": len(rows), "rated_matches": rated}
+
+
+def verify_players(conn: Connection) -> pd.DataFrame:
+    # Players whose stored career totals disagree with a full recompute; empty means consistent
+    rosters = pd.read_sql(text("SELECT tournament_id, team_id, player1, player2 FROM teams WHERE tournament_id IS NOT NULL"), conn)
+    expected = pd.DataFrame(columns=PLAYER_STAT_COLUMNS, dtype="int64")
+    for tid in chronological_tournaments(conn):
+        part = player_match_stats(read_chronological_matches(conn, tid), rosters[rosters["tournament_id"] == tid])
+        expected = expected.add(part, fill_value=0)
+    stored = pd.read_sql(
+        text("SELECT p.name_key AS key, " + ", ".join(f"s.{c}" for c in PLAYER_STAT_COLUMNS) + " FROM player_stats s JOIN players p ON p.player_id = s.player_id"),
+        conn,
+    ).set_index("key")
+    keys = expected.index.union(stored.index)
+    expected = expected.reindex(keys).fillna(0).astype("int64")
+    stored = stored.reindex(keys).fillna(0).astype("int64")
+    bad = (expected != stored).any(axis=1)
+    return expected[bad].join(stored[bad], rsuffix="_stored")
+
+
+def get_player_profile(conn: Connection, name: str) -> dict | None:
+    # One indexed lookup by normalized name
+    key = player_key(name)
+    if key is None:
+        return None
+    row = conn.execute(
+        text(
+            "SELECT p.player_id, p.name, " + ", ".join(f"s.{c}" for c in PLAYER_STAT_COLUMNS) + ", s.rating, s.rated_matches "
+            "FROM players p LEFT JOIN player_stats s ON s.player_id = p.player_id WHERE p.name_key = :k"
+        ),
+        {"k": key},
+    ).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def search_players(conn: Connection, text_query: str, limit: int = 20) -> list[str]:
+    # Names starting with the query, by normalized name
+    key = player_key(text_query)
+    if key is None:
+        return []
+    rows = conn.execute(
+        text("SELECT name FROM players WHERE name_key >= :lo AND name_key < :hi ORDER BY name_key LIMIT :n"),
+        {"lo": key, "hi": key + "\uffff", "n": int(limit)},
+    ).all()
+    return [str(r[0]) for r in rows]
+
+
+def top_players(conn: Connection, limit: int = 50) -> pd.DataFrame:
+    return pd.read_sql(
+        text(
+            "SELECT p.name, s.rating, s.rated_matches, s.matches, s.wins, s.losses FROM player_stats s "
+            "JOIN players p ON p.player_id = s.player_id WHERE s.rated_matches > 0 ORDER BY s.rating DESC LIMIT :n"
+        ),
+        conn,
+        params={"n": int(limit)},
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    from data.db import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify player career stats and ratings.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+    init_db()
+    with engine.begin() as conn:
+        if args.command == "rebuild":
+            summary = rebuild_players(conn)
+            print(f"Rebuilt {summary['players']} players from {summary['rated_matches']} rated matches")
+            return 0
+        diff = verify_players(conn)
+        if diff.empty:
+            print("Player stats: OK")
+            return 0
+        print(f"Player stats: {len(diff)} players differ")
+        print(diff.to_string())
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
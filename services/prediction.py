@@ -0,0 +1,220 @@
+import math
+import numpy as np
+import pandas as pd
+from services.players import team_players
+from services.standings import summarize_matches
+
+# Pre-match predictions from past results. Every player gets a Bradley-Terry strength fitted
+# to the games won and lost in completed matches across all tournaments (a game is one
+# comparison, so set and game margins both count), and a team is the mean of its players.
+# Game odds turn into set and best-of-three match odds with the usual tennis scoring. Seeds
+# follow strength; a draw snakes the seeds over the groups and then swaps teams of the same
+# pot between groups while that makes the group averages closer.
+
+# Older results count half as much every HALF_LIFE_DAYS
+HALF_LIFE_DAYS = 730
+# Pulls players with little history towards the average (strength 0)
+RIDGE = 1.0
+MAX_ITER = 500
+TOLERANCE = 1e-5
+
+
+def _match_weights(tids: np.ndarray, dates: pd.Series | None) -> np.ndarray:
+    if dates is None or dates.empty:
+        return np.ones(len(tids))
+    when = pd.to_datetime(dates, errors="coerce")
+    when = when[~when.index.duplicated()]
+    latest = when.max()
+    if pd.isna(latest):
+        return np.ones(len(tids))
+    age = (latest - when.reindex(tids)).dt.days.to_numpy(dtype="float64", na_value=np.nan)
+    # Undated tournaments count as recent
+    return np.where(np.isnan(age), 1.0, 0.5 ** (np.clip(age, 0, None) / HALF_LIFE_DAYS))
+
+
+def fit_strengths(teams_df: pd.DataFrame, matches_df: pd.DataFrame, dates: pd.Series | None = None) -> pd.Series:
+    # Player key -> strength on the log-odds-per-game scale. teams_df and matches_df span any
+    # number of tournaments (tournament_id column); dates maps tournament_id -> start_date
+    rosters = team_players(teams_df, ("tournament_id", "team_id"))
+    if rosters.empty or matches_df is None or matches_df.empty:
+        return pd.Series(dtype="float64")
+    res = summarize_matches(matches_df)
+    g1 = res["t1_games"].to_numpy(dtype="float64"); g2 = res["t2_games"].to_numpy(dtype="float64")
+    ok = (res["team1_id"].notna() & res["team2_id"].notna()).to_numpy() & (g1 + g2 > 0)
+    if "status" in matches_df.columns:
+        ok &= (matches_df["status"] == "Completed").to_numpy()
+    tids = pd.to_numeric(matches_df["tournament_id"], errors="coerce").to_numpy(dtype="float64")
+    ok &= ~np.isnan(tids)
+    rows = np.flatnonzero(ok)
+    codes, keys = pd.factorize(rosters["key"])
+    roster = pd.DataFrame({"tournament_id": rosters["tournament_id"].astype("float64"), "team_id": rosters["team_id"].astype("float64"), "player": codes})
+    roster["size"] = roster.groupby(["tournament_id", "team_id"])["player"].transform("size")
+
+    # One entry per (match, player): coef is +1/size for side 1 and -1/size for side 2, so a
+    # match's strength difference is a weighted sum over its entries
+    parts = []
+    for col, sign in (("team1_id", 1.0), ("team2_id", -1.0)):
+        side = pd.DataFrame({"m": np.arange(len(rows)), "tournament_id": tids[rows], "team_id": res[col].to_numpy(dtype="float64", na_value=np.nan)[rows]})
+        side = side.merge(roster, on=["tournament_id", "team_id"])
+        parts.append((side["m"].to_numpy(), side["player"].to_numpy(), sign / side["size"].to_numpy(dtype="float64")))
+    e_m = np.concatenate([p[0] for p in parts])
+    e_p = np.concatenate([p[1] for p in parts])
+    e_c = np.concatenate([p[2] for p in parts])
+    # Matches missing a side's players carry no information about the other side
+    has = np.zeros((2, len(rows)), dtype=bool)
+    has[0, parts[0][0]] = True; has[1, parts[1][0]] = True
+    valid = has.all(axis=0)
+    keep = valid[e_m]
+    e_m, e_p, e_c = e_m[keep], e_p[keep], e_c[keep]
+    w = _match_weights(tids[rows], dates)
+    won, total = w * g1[rows], w * (g1[rows] + g2[rows])
+
+    # Diagonal Newton steps. A match's players move together, so each player's curvature is
+    # doubled (the coefficients of a match sum to 2 in absolute value), which keeps the
+    # separable steps from overshooting
+    theta = np.zeros(len(keys))
+    m = len(rows)
+    for _ in range(MAX_ITER):
+        diff = np.bincount(e_m, weights=e_c * theta[e_p], minlength=m)
+        p = 1.0 / (1.0 + np.exp(-diff))
+        grad = np.bincount(e_p, weights=e_c * (won - total * p)[e_m], minlength=len(keys)) - RIDGE * theta
+        hess = np.bincount(e_p, weights=2.0 * np.abs(e_c) * (total * p * (1.0 - p))[e_m], minlength=len(keys)) + RIDGE
+        step = grad / hess
+        theta += step
+        if np.abs(step).max() < TOLERANCE:
+            break
+    return pd.Series(theta, index=pd.Index(keys, name="key"), name="strength")
+
+
+def team_strengths(strengths: pd.Series, teams_df: pd.DataFrame) -> pd.Series:
+    # team_id -> mean strength of its players; players without history count as average
+    if teams_df is None or teams_df.empty:
+        return pd.Series(dtype="float64", name="strength")
+    roster = team_players(teams_df)
+    roster["strength"] = roster["key"].map(strengths).fillna(0.0).to_numpy(dtype="float64") if len(strengths) else 0.0
+    out = roster.groupby("team_id")["strength"].mean()
+    ids = pd.to_numeric(teams_df["team_id"], errors="coerce").dropna().astype("int64").drop_duplicates()
+    return out.reindex(ids.to_numpy()).fillna(0.0).rename("strength")
+
+
+def _first_to(p: np.ndarray, n: int, tied: np.ndarray) -> np.ndarray:
+    # P(reaching n first) when each point goes one way with probability p; `tied` is the
+    # probability of winning from (n-1)-(n-1)
+    q = 1.0 - p
+    won = sum(math.comb(n - 1 + j, j) * p ** n * q ** j for j in range(n - 1))
+    return won + math.comb(2 * n - 2, n - 1) * (p * q) ** (n - 1) * tied
+
+
+def game_win_probability(diff) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.asarray(diff, dtype="float64")))
+
+
+def set_win_probability(p) -> np.ndarray:
+    # Six games, two clear, tiebreak (first to seven points, two clear) at 6-6
+    p = np.asarray(p, dtype="float64")
+    q = 1.0 - p
+    deuce = p * p / np.maximum(p * p + q * q, 1e-300)
+    tiebreak = _first_to(p, 7, deuce)
+    return _first_to(p, 6, p * p + 2 * p * q * tiebreak)
+
+
+def match_win_probability(strength_a, strength_b) -> np.ndarray:
+    # Best of three sets
+    s = set_win_probability(game_win_probability(np.asarray(strength_a, dtype="float64") - np.asarray(strength_b, dtype="float64")))
+    return s * s * (3.0 - 2.0 * s)
+
+
+def suggest_seeds(strength: pd.Series) -> pd.Series:
+    # team_id -> seed, 1 for the strongest; ties keep team order
+    order = np.argsort(-strength.to_numpy(dtype="float64"), kind="stable")
+    seeds = np.empty(len(strength), dtype="int64")
+    seeds[order] = np.arange(1, len(strength) + 1)
+    return pd.Series(seeds, index=strength.index, name="seed")
+
+
+def group_labels(n: int) -> list[str]:
+    # A..Z, then AA, AB, ...
+    out = []
+    for i in range(n):
+        label = ""
+        i += 1
+        while i:
+            i, r = divmod(i - 1, 26)
+            label = chr(ord("A") + r) + label
+        out.append(label)
+    return out
+
+
+def _balance(strength: np.ndarray, groups: np.ndarray, pots: np.ndarray, n_groups: int) -> np.ndarray:
+    # Best improving swap within a pot, repeated until none reduces the spread of group means
+    groups = groups.copy()
+    sizes = np.bincount(groups, minlength=n_groups).astype("float64")
+    sums = np.bincount(groups, weights=strength, minlength=n_groups)
+    mu = strength.mean()
+    members = [np.flatnonzero(pots == k) for k in range(int(pots.max()) + 1)]
+    improved = True
+    while improved:
+        improved = False
+        for idx in members:
+            if len(idx) < 2:
+                continue
+            while True:
+                g = groups[idx]
+                x = strength[idx]
+                dev = sums[g] / sizes[g] - mu
+                delta = x[None, :] - x[:, None]  # [a, b]: what group of a gains by swapping a and b
+                new_a = dev[:, None] + delta / sizes[g][:, None]
+                new_b = dev[None, :] - delta / sizes[g][None, :]
+                gain = new_a ** 2 + new_b ** 2 - dev[:, None] ** 2 - dev[None, :] ** 2
+                a, b = np.unravel_index(np.argmin(gain), gain.shape)
+                if gain[a, b] > -1e-12:
+                    break
+                ga, gb = g[a], g[b]
+                sums[ga] += delta[a, b]; sums[gb] -= delta[a, b]
+                groups[idx[a]], groups[idx[b]] = gb, ga
+                improved = True
+    return groups
+
+
+def snake_draw(strength: np.ndarray, n_groups: int) -> np.ndarray:
+    # Group index per team: pots of n_groups teams by strength, snaked over the groups, then
+    # balanced by swaps inside each pot so every group still gets one team per pot
+    strength = np.asarray(strength, dtype="float64")
+    n = len(strength)
+    n_groups = max(1, min(int(n_groups), n)) if n else 1
+    order = np.argsort(-strength, kind="stable")
+    pot = np.arange(n) // n_groups
+    pos = np.arange(n) % n_groups
+    groups = np.empty(n, dtype="int64")
+    groups[order] = np.where(pot % 2 == 0, pos, n_groups - 1 - pos)
+    pots = np.empty(n, dtype="int64")
+    pots[order] = pot
+    return _balance(strength, groups, pots, n_groups) if n > n_groups else groups
+
+
+def suggest_draw(teams_df: pd.DataFrame, strengths: pd.Series, n_groups: int) -> pd.DataFrame:
+    # team_id, team_name, strength, seed and suggested group for every team
+    ts = team_strengths(strengths, teams_df)
+    if ts.empty:
+        return pd.DataFrame(columns=["team_id", "team_name", "strength", "seed", "group"])
+    labels = group_labels(max(1, min(int(n_groups), len(ts))))
+    groups = snake_draw(ts.to_numpy(), len(labels))
+    names = teams_df.assign(team_id=pd.to_numeric(teams_df["team_id"], errors="coerce")).drop_duplicates("team_id").set_index("team_id")["team_name"]
+    out = pd.DataFrame({
+        "team_id": ts.index.to_numpy(),
+        "team_name": names.reindex(ts.index.astype("float64")).to_numpy(),
+        "strength": np.round(ts.to_numpy(), 3),
+        "seed": suggest_seeds(ts).to_numpy(),
+        "group": [labels[g] for g in groups],
+    })
+    return out.sort_values(["group", "seed"], kind="stable").reset_index(drop=True)
+
+
+def group_spread(strength: np.ndarray, groups: np.ndarray) -> float:
+    # Standard deviation of the group mean strengths
+    strength = np.asarray(strength, dtype="float64")
+    codes, _ = pd.factorize(pd.Series(groups))
+    if len(codes) == 0:
+        return 0.0
+    means = np.bincount(codes, weights=strength) / np.bincount(codes)
+    return float(means.std())
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from services.standings import compute_match_results, group_stage_matches
+
+# Leaderboard ranks. Standings arrive already ordered within each group (rank_standings plus
+# the tournament's tiebreaks), so a team's group rank is just its position in the group. The
+# overall rank comes from a single lexsort over a normalized score, so groups of different
+# sizes compare fairly, with the group rank breaking ties before the raw record.
+
+NORMALIZATIONS = {
+    "points": "Total points",
+    "points_per_match": "Points per match",
+    "win_pct": "Win percentage",
+    "group_position": "Group position, then points per match",
+}
+DEFAULT_NORMALIZATION = "points"
+# Overview Winner Board columns: shown by default, and the extra ones the Display tab can enable
+STANDINGS_DEFAULT_COLS = ["Rank", "Team", "MatchesPlayed", "MatchesWon", "MatchesLost", "Points", "Status"]
+STANDINGS_EXTRA_COLS = ["Group", "GroupRank", "Score", "Change", "GroupChange", "Qualify"]
+
+
+def _col(df: pd.DataFrame, c: str) -> np.ndarray:
+    return pd.to_numeric(df[c], errors="coerce").fillna(0).to_numpy(dtype="float64")
+
+
+def rank_table(standings: pd.DataFrame, normalization: str = DEFAULT_NORMALIZATION) -> pd.DataFrame:
+    # standings rows in overall order with group_rank, overall_rank and the normalized score
+    if standings is None or standings.empty:
+        return pd.DataFrame(columns=list(standings.columns if standings is not None else []) + ["group_rank", "overall_rank", "score"])
+    st = standings.reset_index(drop=True)
+    codes, _ = pd.factorize(st["group"].astype(str))
+    group_rank = pd.Series(codes).groupby(codes).cumcount().to_numpy() + 1
+    played = _col(st, "played")
+    points, wins = _col(st, "points"), _col(st, "wins")
+    per_match = np.divide(points, played, out=np.zeros(len(st)), where=played > 0)
+    if normalization == "points_per_match":
+        score, keys = per_match, [-per_match]
+    elif normalization == "win_pct":
+        score = np.divide(wins, played, out=np.zeros(len(st)), where=played > 0)
+        keys = [-score]
+    elif normalization == "group_position":
+        score, keys = per_match, [group_rank, -per_match]
+    else:
+        score, keys = points, [-points]
+    keys += [group_rank, -wins, -_col(st, "sets_diff"), -_col(st, "games_diff"), codes]
+    # lexsort takes its primary key last
+    order = np.lexsort(keys[::-1])
+    out = st.iloc[order].reset_index(drop=True)
+    out["group_rank"] = group_rank[order]
+    out["overall_rank"] = np.arange(1, len(out) + 1)
+    out["score"] = np.round(score[order], 3)
+    return out
+
+
+def before_latest_round(matches_df: pd.DataFrame) -> pd.DataFrame | None:
+    # Matches as they stood before the latest played group round, or None when rounds aren't
+    # known or only one has been played
+    if matches_df is None or matches_df.empty or "round_no" not in matches_df.columns:
+        return None
+    group = group_stage_matches(matches_df)
+    rounds = pd.to_numeric(group["round_no"], errors="coerce")
+    res = compute_match_results(group)
+    played = ((res["t1_sets"] > 0) | (res["t2_sets"] > 0)) & rounds.notna()
+    if not played.any():
+        return None
+    latest = rounds[played].max()
+    if not (played & (rounds < latest)).any():
+        return None
+    return group[(rounds != latest).to_numpy()]
+
+
+def build_leaderboard(standings: pd.DataFrame, previous: pd.DataFrame | None = None, normalization: str = DEFAULT_NORMALIZATION) -> pd.DataFrame:
+    # rank_table plus how many places each team moved since `previous` standings (positive = up)
+    board = rank_table(standings, normalization)
+    board["group_rank_delta"] = pd.array([pd.NA] * len(board), dtype="Int64")
+    board["overall_rank_delta"] = pd.array([pd.NA] * len(board), dtype="Int64")
+    if previous is None or previous.empty or board.empty:
+        return board
+    prev = rank_table(previous, normalization)
+    prev_ids = pd.to_numeric(prev["team_id"], errors="coerce").astype("float64")
+    ids = pd.to_numeric(board["team_id"], errors="coerce").astype("float64").to_numpy()
+    for c in ("group_rank", "overall_rank"):
+        before = pd.Series(prev[c].to_numpy(dtype="float64"), index=prev_ids)
+        before = before[~before.index.duplicated()].reindex(ids).to_numpy()
+        delta = before - board[c].to_numpy(dtype="float64")
+        board[f"{c}_delta"] = pd.array(delta, dtype="Float64").astype("Int64")
+    return board
+
+
+def format_delta(v) -> str:
+    if v is None or pd.isna(v):
+        return ""
+    v = int(v)
+    return f"▲{v}" if v > 0 else f"▼{-v}" if v < 0 else "–"
@@ -0,0 +1,363 @@
+import argparse
+import datetime as dt
+import hashlib
+import io
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from services.players import (
+    INITIAL_RATING, K_ESTABLISHED, K_PROVISIONAL, PROVISIONAL_MATCHES,
+    chronological_tournaments, ensure_players, team_players,
+)
+from services.standings import summarize_matches
+
+# Batch player and team (pair) ratings over the whole history. Matches are streamed in play
+# order, the same order services.players uses, with the Elo updates of
+# services.players.rate_match. Within each tournament, matches are layered into waves: a match
+# goes one wave after the latest earlier match that shares a player with it. No player appears
+# twice in a wave, so a whole wave is one vectorized update and the result matches a
+# match-by-match replay. Before every tournament a checkpoint stores what changed since the
+# previous one, so after a correction only the affected tournament onwards is replayed.
+
+JOB_CHUNK_ROWS = 20000
+_IN_CHUNK = 500
+
+_STREAM_SELECT = (
+    "SELECT m.tournament_id, m.match_id, m.team1_id, m.team2_id, m.status, "
+    "m.set1_t1, m.set1_t2, m.set2_t1, m.set2_t2, m.set3_t1, m.set3_t2 "
+    "FROM matches m JOIN tournaments t ON t.tournament_id = m.tournament_id"
+)
+_STREAM_ORDER = (
+    " ORDER BY CASE WHEN t.start_date IS NULL THEN 1 ELSE 0 END, t.start_date, m.tournament_id, "
+    "CASE WHEN m.scheduled_at IS NULL THEN 1 ELSE 0 END, m.scheduled_at, "
+    "CASE WHEN m.round_no IS NULL THEN 1 ELSE 0 END, m.round_no, "
+    "CASE WHEN m.slot IS NULL THEN 1 ELSE 0 END, m.slot, m.match_id"
+)
+
+
+def order_hash(tournament_ids: list[int]) -> str:
+    return hashlib.sha1(",".join(str(int(t)) for t in tournament_ids).encode()).hexdigest()
+
+
+class RatingState:
+    # Dense arrays of player and pair ratings; index -1 means "no second player"
+    def __init__(self, player_ids, pair_keys):
+        self.player_ids = np.array(sorted({int(p) for p in player_ids}), dtype="int64")
+        self.player_index = {int(p): i for i, p in enumerate(self.player_ids)}
+        self.rating = np.full(len(self.player_ids), INITIAL_RATING)
+        self.count = np.zeros(len(self.player_ids), dtype="int64")
+        self.pairs = sorted({(int(a), int(b)) for a, b in pair_keys})
+        self.pair_index = {k: i for i, k in enumerate(self.pairs)}
+        self.pair_keys = np.array(self.pairs, dtype="int64").reshape(-1, 2)
+        self.pair_rating = np.full(len(self.pairs), INITIAL_RATING)
+        self.pair_count = np.zeros(len(self.pairs), dtype="int64")
+        # What changed since the last dump; a checkpoint only stores those entries
+        self.touched = np.zeros(len(self.player_ids), dtype=bool)
+        self.pair_touched = np.zeros(len(self.pairs), dtype=bool)
+
+    def dump(self) -> bytes:
+        buf = io.BytesIO()
+        t, pt = self.touched, self.pair_touched
+        np.savez(
+            buf, player_ids=self.player_ids[t], rating=self.rating[t], count=self.count[t],
+            pairs=self.pair_keys[pt], pair_rating=self.pair_rating[pt], pair_count=self.pair_count[pt],
+        )
+        self.touched[:] = False
+        self.pair_touched[:] = False
+        return buf.getvalue()
+
+    def load(self, blob: bytes) -> None:
+        # Applies one checkpoint on top of the current state; players and pairs unknown to
+        # this run are skipped
+        data = np.load(io.BytesIO(blob))
+        for pid, r, c in zip(data["player_ids"].tolist(), data["rating"].tolist(), data["count"].tolist()):
+            i = self.player_index.get(pid)
+            if i is not None:
+                self.rating[i], self.count[i] = r, c
+        for (a, b), r, c in zip(data["pairs"].tolist(), data["pair_rating"].tolist(), data["pair_count"].tolist()):
+            i = self.pair_index.get((a, b))
+            if i is not None:
+                self.pair_rating[i], self.pair_count[i] = r, c
+
+
+def read_rosters(conn: Connection) -> pd.DataFrame:
+    # tournament_id, team_id -> the team's player ids (pb = -1 for a solo entry) and pair key
+    # (pair_a < pair_b, or pair_b = 0), creating missing players
+    teams = pd.read_sql(text("SELECT tournament_id, team_id, player1, player2 FROM teams WHERE tournament_id IS NOT NULL"), conn)
+    cols = ["tournament_id", "team_id", "pa", "pb", "pair_a", "pair_b"]
+    long = team_players(teams, ("tournament_id", "team_id"))
+    if long.empty:
+        return pd.DataFrame(columns=cols)
+    ids = ensure_players(conn, dict(zip(long["key"], long["name"])))
+    long = long.assign(player_id=long["key"].map(ids).astype("int64"))
+    agg = long.groupby(["tournament_id", "team_id"], sort=False)["player_id"].agg(["min", "max"]).reset_index()
+    two = (agg["max"] != agg["min"]).to_numpy()
+    lo, hi = agg["min"].to_numpy(dtype="int64"), agg["max"].to_numpy(dtype="int64")
+    return pd.DataFrame({
+        "tournament_id": agg["tournament_id"].astype("int64"), "team_id": agg["team_id"],
+        "pa": lo, "pb": np.where(two, hi, -1), "pair_a": lo, "pair_b": np.where(two, hi, 0),
+    })[cols]
+
+
+def _waves(players: list[list[int]], n_players: int) -> np.ndarray:
+    # Earliest wave after every earlier match sharing a player (-1 entries are ignored)
+    last = [-1] * (n_players + 1)
+    out = []
+    for ps in players:
+        w = max(last[p] for p in ps) + 1
+        for p in ps:
+            last[p] = w
+        out.append(w)
+    return np.array(out, dtype="int64")
+
+
+def _k(count: np.ndarray) -> np.ndarray:
+    return np.where(count < PROVISIONAL_MATCHES, K_PROVISIONAL, K_ESTABLISHED)
+
+
+def _expected(ra: np.ndarray, rb: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + 10.0 ** ((rb - ra) / 400.0))
+
+
+def _team_rating(rating: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    two = b >= 0
+    return np.where(two, (rating[a] + rating[np.where(two, b, a)]) / 2, rating[a])
+
+
+def index_rosters(state: RatingState, rosters: pd.DataFrame) -> pd.DataFrame:
+    # rosters with the state's dense player (ia, ib) and pair (iq) indices
+    ia = np.searchsorted(state.player_ids, rosters["pa"].to_numpy(dtype="int64"))
+    pb = rosters["pb"].to_numpy(dtype="int64")
+    ib = np.where(pb >= 0, np.searchsorted(state.player_ids, pb), -1)
+    iq = [state.pair_index[(a, b)] for a, b in zip(rosters["pair_a"].tolist(), rosters["pair_b"].tolist())]
+    return pd.DataFrame({
+        "tournament_id": rosters["tournament_id"].to_numpy(dtype="int64"),
+        "team_id": rosters["team_id"].to_numpy(dtype="float64"),
+        "ia": ia, "ib": ib, "iq": np.array(iq, dtype="int64"),
+    })
+
+
+def prepare_batch(batch: pd.DataFrame, indexed: pd.DataFrame) -> dict[str, np.ndarray]:
+    # Ratable matches of a chronological batch (any number of tournaments) as index arrays
+    res = summarize_matches(batch)
+    ok = (res["team1_id"].notna() & res["team2_id"].notna() & res["winner_id"].notna()).to_numpy()
+    ok &= (batch["status"] == "Completed").to_numpy()
+    batch, res = batch[ok], res[ok]
+    tids = batch["tournament_id"].to_numpy(dtype="int64")
+    sides = []
+    for col in ("team1_id", "team2_id"):
+        key = pd.DataFrame({"tournament_id": tids, "team_id": pd.to_numeric(batch[col], errors="coerce").to_numpy(dtype="float64")})
+        side = key.merge(indexed, on=["tournament_id", "team_id"], how="left")
+        sides.append([side[c].fillna(-1).to_numpy(dtype="int64") for c in ("ia", "ib", "iq")])
+    (a1, b1, q1), (a2, b2, q2) = sides
+    # A player on both sides makes the match unratable
+    clash = (a1 == a2) | ((b2 >= 0) & (a1 == b2)) | ((b1 >= 0) & ((b1 == a2) | (b1 == b2)))
+    keep = ~clash & (a1 >= 0) & (a2 >= 0)
+    won = res["winner_id"].to_numpy(dtype="float64") == res["team1_id"].to_numpy(dtype="float64")
+    mids = pd.to_numeric(batch["match_id"], errors="coerce").to_numpy(dtype="float64")
+    return {
+        "tid": tids[keep], "mid": mids[keep].astype("int64"), "won": won[keep],
+        "a1": a1[keep], "b1": b1[keep], "q1": q1[keep], "a2": a2[keep], "b2": b2[keep], "q2": q2[keep],
+    }
+
+
+def process_batch(state: RatingState, m: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    # Rates prepared matches in order, one wave at a time; returns the rating events
+    empty = {"match_id": np.empty(0, "int64"), "player": np.empty(0, "int64"), "delta": np.empty(0)}
+    if len(m["mid"]) == 0:
+        return empty
+    a1, b1, a2, b2, q1, q2 = m["a1"], m["b1"], m["a2"], m["b2"], m["q1"], m["q2"]
+    n = len(state.player_ids)
+    waves = _waves([[x for x in (p, q, r, s) if x >= 0] for p, q, r, s in zip(a1.tolist(), b1.tolist(), a2.tolist(), b2.tolist())], n)
+    order = np.argsort(waves, kind="stable")
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+    ev_mid, ev_player, ev_delta = [], [], []
+    r, c = state.rating, state.count
+    pr, pc = state.pair_rating, state.pair_count
+    for w in np.split(order, bounds):
+        wa1, wb1, wa2, wb2 = a1[w], b1[w], a2[w], b2[w]
+        e1 = _expected(_team_rating(r, wa1, wb1), _team_rating(r, wa2, wb2))
+        sc1 = m["won"][w].astype("float64")
+        wm = m["mid"][w]
+        updates = []
+        # Same arithmetic as rate_match, so batch and online ratings agree to rounding
+        for pl, score, exp in ((wa1, sc1, e1), (wb1, sc1, e1), (wa2, 1.0 - sc1, 1.0 - e1), (wb2, 1.0 - sc1, 1.0 - e1)):
+            keep = pl >= 0
+            p = pl[keep]
+            d = _k(c[p]) * (score[keep] - exp[keep])
+            updates.append((p, d))
+            ev_mid.append(wm[keep]); ev_player.append(p); ev_delta.append(d)
+        # Applied once every delta of the wave is known: K uses the count before the match
+        for p, d in updates:
+            r[p] += d
+            c[p] += 1
+            state.touched[p] = True
+        qa, qb = q1[w], q2[w]
+        pe = _expected(pr[qa], pr[qb])
+        da = _k(pc[qa]) * (sc1 - pe)
+        db = _k(pc[qb]) * ((1.0 - sc1) - (1.0 - pe))
+        pr[qa] += da; pc[qa] += 1
+        pr[qb] += db; pc[qb] += 1
+        state.pair_touched[qa] = True
+        state.pair_touched[qb] = True
+    return {
+        "match_id": np.concatenate(ev_mid),
+        "player": state.player_ids[np.concatenate(ev_player)],
+        "delta": np.concatenate(ev_delta),
+    }
+
+
+def _dirty_tournaments(conn: Connection) -> list[int]:
+    return [int(t) for t in conn.execute(text("SELECT tournament_id FROM ratings_dirty")).scalars().all()]
+
+
+def _resume_point(conn: Connection, order: list[int], start: int) -> tuple[int, list[bytes]]:
+    # Latest checkpoint at or before `start` that was written for the same tournament order,
+    # with every checkpoint up to it: each one only holds what changed since the one before
+    rows = conn.execute(
+        text("SELECT position, order_hash FROM rating_checkpoints WHERE position <= :p ORDER BY position DESC"),
+        {"p": start},
+    ).all()
+    for position, h in rows:
+        if position <= len(order) and h == order_hash(order[:position]):
+            blobs = conn.execute(
+                text("SELECT state FROM rating_checkpoints WHERE position <= :p ORDER BY position"), {"p": position},
+            ).scalars().all()
+            return int(position), [bytes(b) for b in blobs]
+    return 0, []
+
+
+def _delete_in(conn: Connection, sql: str, ids: list[int]) -> None:
+    stmt = text(sql).bindparams(bindparam("ids", expanding=True))
+    for i in range(0, len(ids), _IN_CHUNK):
+        conn.execute(stmt, {"ids": ids[i:i + _IN_CHUNK]})
+
+
+def run_ratings(conn: Connection, full: bool = False, from_tournament: int | None = None, chunk_size: int = JOB_CHUNK_ROWS) -> dict:
+    # Recomputes ratings from the first dirty (or given) tournament onwards; full replays everything
+    started = time.monotonic()
+    order = chronological_tournaments(conn)
+    position = {t: i for i, t in enumerate(order)}
+    dirty = _dirty_tournaments(conn)
+    if full:
+        start = 0
+    elif from_tournament is not None:
+        start = position.get(int(from_tournament), 0)
+    elif dirty:
+        known = [position[t] for t in dirty if t in position]
+        start = min(known) if known else len(order)
+    else:
+        return {"status": "up to date", "tournaments": 0, "matches": 0, "seconds": 0.0}
+    start, blobs = (0, []) if full else _resume_point(conn, order, start)
+
+    rosters = read_rosters(conn)
+    state = RatingState(
+        set(rosters["pa"]) | set(rosters.loc[rosters["pb"] >= 0, "pb"]),
+        set(zip(rosters["pair_a"], rosters["pair_b"])),
+    )
+    for blob in blobs:
+        state.load(blob)
+    state.touched[:] = False
+    state.pair_touched[:] = False
+    indexed = index_rosters(state, rosters)
+    replay = order[start:]
+
+    checkpoints = []
+    events = []
+    matches = 0
+    # The checkpoint we resumed from is kept as it is
+    current = order[start] if blobs and replay else None
+    if replay:
+        sql = _STREAM_SELECT
+        params = {}
+        if start > 0:
+            sql += " WHERE m.tournament_id IN :tids"
+            params["tids"] = replay
+        stmt = text(sql + _STREAM_ORDER)
+        if params:
+            stmt = stmt.bindparams(bindparam("tids", expanding=True))
+        # stream_results uses a server-side cursor on Postgres, so history is read chunk by chunk
+        streaming = conn.execution_options(stream_results=True)
+        for chunk in pd.read_sql(stmt, streaming, params=params, chunksize=chunk_size):
+            matches += len(chunk)
+            prepared = prepare_batch(chunk, indexed)
+            tids = prepared["tid"]
+            cuts = np.flatnonzero(np.diff(tids)) + 1
+            for lo, hi in zip(np.concatenate([[0], cuts]), np.concatenate([cuts, [len(tids)]])):
+                if lo == hi:
+                    continue
+                tid = int(tids[lo])
+                if tid != current:
+                    current = tid
+                    checkpoints.append({"position": position[tid], "tid": tid, "hash": order_hash(order[:position[tid]]), "state": state.dump()})
+                ev = process_batch(state, {k: v[lo:hi] for k, v in prepared.items()})
+                if len(ev["match_id"]):
+                    events.append(pd.DataFrame({"tid": tid, "mid": ev["match_id"], "pid": ev["player"], "delta": ev["delta"]}))
+
+    # Everything is computed; write it in the same transaction
+    if full or start == 0:
+        conn.execute(text("DELETE FROM player_rating_events"))
+        conn.execute(text(f"UPDATE player_stats SET rating = {INITIAL_RATING}, rated_matches = 0"))
+    else:
+        _delete_in(conn, "DELETE FROM player_rating_events WHERE tournament_id IN :ids", replay)
+    if events:
+        ev = pd.concat(events, ignore_index=True)
+        conn.execute(
+            text("INSERT INTO player_rating_events(tournament_id, match_id, player_id, delta) VALUES(:tid, :mid, :pid, :delta)"),
+            ev.astype({"tid": "int64", "mid": "int64", "pid": "int64"}).to_dict("records"),
+        )
+    player_rows = [
+        {"pid": int(p), "r": float(r), "n": int(n)}
+        for p, r, n in zip(state.player_ids, state.rating, state.count)
+    ]
+    if player_rows:
+        conn.execute(
+            text(f"INSERT INTO player_stats(player_id, rating, rated_matches) VALUES(:pid, {INITIAL_RATING}, 0) ON CONFLICT(player_id) DO NOTHING"),
+            player_rows,
+        )
+        conn.execute(text("UPDATE player_stats SET rating = :r, rated_matches = :n WHERE player_id = :pid"), player_rows)
+    conn.execute(text("DELETE FROM team_ratings"))
+    pair_rows = [
+        {"a": a, "b": b, "r": float(r), "n": int(n)}
+        for (a, b), r, n in zip(state.pairs, state.pair_rating, state.pair_count) if n > 0
+    ]
+    if pair_rows:
+        conn.execute(text("INSERT INTO team_ratings(player_a_id, player_b_id, rating, rated_matches) VALUES(:a, :b, :r, :n)"), pair_rows)
+    conn.execute(text("DELETE FROM rating_checkpoints WHERE position >= :p"), {"p": start + 1 if blobs else 0})
+    if checkpoints:
+        now = dt.datetime.now()
+        conn.execute(
+            text("INSERT INTO rating_checkpoints(position, tournament_id, order_hash, created_at, state) VALUES(:position, :tid, :hash, :created, :state)"),
+            [{**c, "created": now} for c in checkpoints],
+        )
+    if dirty:
+        _delete_in(conn, "DELETE FROM ratings_dirty WHERE tournament_id IN :ids", dirty)
+    return {
+        "status": "recomputed",
+        "from_position": start,
+        "tournaments": len(replay),
+        "matches": matches,
+        "rated_events": int(sum(len(e) for e in events)),
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    from data.db import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Recompute player and team ratings from match history.")
+    parser.add_argument("command", choices=["update", "full"], help="update: replay from the first changed tournament; full: replay everything")
+    parser.add_argument("--from-tournament", type=int, default=None, help="Replay from this tournament onwards")
+    parser.add_argument("--chunk-size", type=int, default=JOB_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    init_db()
+    with engine.begin() as conn:
+        summary = run_ratings(conn, full=args.command == "full", from_tournament=args.from_tournament, chunk_size=args.chunk_size)
+    print(", ".join(f"{k}: {v}" for k, v in summary.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,367 @@
+import datetime as dt
+import math
+import random
+import time
+from bisect import insort
+import pandas as pd
+
+# Multi-day schedule optimizer. Every match gets a time slot; a slot's capacity is the number
+# of courts open at that time. Matches that already started keep their slot and court and
+# only constrain the others. Hard constraints (weighted so any violation dominates): court
+# capacity, nobody in two matches at once, player unavailability and minimum rest. Soft goals:
+# the number of slots the event spans and players' idle gaps within a day. Simulated annealing
+# searches from a greedy start, updating the cost incrementally for each move.
+
+HARD_WEIGHT = 1000.0
+SPAN_WEIGHT = 1.0
+GAP_WEIGHT = 0.25
+
+
+def _parse_time(v) -> dt.time:
+    if isinstance(v, dt.time):
+        return v
+    if isinstance(v, dt.datetime):
+        return v.time()
+    return dt.datetime.strptime(str(v).strip()[:5], "%H:%M").time()
+
+
+def build_slots(days: list[dict], slot_minutes: int) -> pd.DataFrame:
+    # days: [{"date", "start", "end", "courts"}, ...]; a date may appear more than once, e.g.
+    # 4 courts in the morning and 2 in the afternoon. Courts open at the same time add up.
+    capacity: dict[dt.datetime, int] = {}
+    step = dt.timedelta(minutes=int(slot_minutes))
+    for d in days:
+        if not d.get("date") or not d.get("courts"):
+            continue
+        day = pd.to_datetime(d["date"]).date()
+        t = dt.datetime.combine(day, _parse_time(d.get("start") or "09:00"))
+        end = dt.datetime.combine(day, _parse_time(d.get("end") or "18:00"))
+        while t + step <= end:
+            capacity[t] = capacity.get(t, 0) + int(d["courts"])
+            t += step
+    starts = sorted(capacity)
+    dates = sorted({s.date() for s in starts})
+    return pd.DataFrame({
+        "slot": range(len(starts)),
+        "day": [dates.index(s.date()) for s in starts],
+        "start": starts,
+        "capacity": [capacity[s] for s in starts],
+    })
+
+
+def _player_key(name) -> str | None:
+    if name is None or (isinstance(name, float) and math.isnan(name)):
+        return None
+    key = str(name).strip().casefold()
+    return key or None
+
+
+def match_participants(fixtures: pd.DataFrame, teams_df: pd.DataFrame) -> list[tuple]:
+    # Everyone who has to be on court for each match: both teams plus their players by name,
+    # so a player entered in two teams can't be scheduled twice at once
+    players: dict = {}
+    for r in teams_df.itertuples(index=False):
+        tid = pd.to_numeric(getattr(r, "team_id"), errors="coerce")
+        if pd.isna(tid):
+            continue
+        keys = [_player_key(getattr(r, "player1", None)), _player_key(getattr(r, "player2", None))]
+        players[int(tid)] = tuple(k for k in keys if k)
+    out = []
+    for a, b in zip(fixtures["team1_id"], fixtures["team2_id"]):
+        keys = set()
+        for t in (a, b):
+            if pd.notna(t):
+                keys.add(("team", int(t)))
+                keys.update(players.get(int(t), ()))
+        out.append(tuple(keys))
+    return out
+
+
+def unavailable_slots(slots: pd.DataFrame, windows: list[dict], slot_minutes: int) -> set:
+    # windows: [{"player", "from", "to"}, ...] -> {(player key, slot)} for overlapping slots
+    out = set()
+    step = pd.Timedelta(minutes=int(slot_minutes))
+    starts = pd.to_datetime(slots["start"])
+    for w in windows:
+        key = _player_key(w.get("player"))
+        lo, hi = pd.to_datetime(w.get("from"), errors="coerce"), pd.to_datetime(w.get("to"), errors="coerce")
+        if key is None or pd.isna(lo) or pd.isna(hi):
+            continue
+        hit = (starts < hi) & (starts + step > lo)
+        out.update((key, int(s)) for s in slots["slot"][hit])
+    return out
+
+
+def _fixed_slots(fixed: pd.DataFrame | None, slots: pd.DataFrame) -> pd.DataFrame:
+    # Matches that keep their place, mapped onto the slot grid by start time, else by the
+    # 1-based slot a previous plan wrote; matches outside the grid occupy nothing
+    cols = ["team1_id", "team2_id", "court", "slot"]
+    if fixed is None or fixed.empty or slots.empty:
+        return pd.DataFrame(columns=cols)
+    grid = {pd.Timestamp(t): i for i, t in enumerate(pd.to_datetime(slots["start"]))}
+    at = pd.to_datetime(fixed["scheduled_at"], errors="coerce") if "scheduled_at" in fixed.columns else pd.Series(pd.NaT, index=fixed.index)
+    stored = pd.to_numeric(fixed["slot"], errors="coerce") - 1 if "slot" in fixed.columns else pd.Series(float("nan"), index=fixed.index)
+    stored = stored.where((stored >= 0) & (stored < len(slots)))
+    out = pd.DataFrame({
+        "team1_id": fixed["team1_id"],
+        "team2_id": fixed["team2_id"],
+        "court": pd.to_numeric(fixed["court"], errors="coerce") if "court" in fixed.columns else float("nan"),
+        "slot": at.map(grid).where(at.notna(), stored),
+    })
+    out = out[out["slot"].notna()]
+    return out.assign(slot=out["slot"].astype(int)).reset_index(drop=True)
+
+
+def _courts(plan_slots, taken: dict) -> list[int]:
+    # Lowest free court numbers per slot, skipping courts that fixed matches are on
+    out, nxt = [], {}
+    for s in plan_slots:
+        c = nxt.get(s, 1)
+        while c in taken.get(s, ()):
+            c += 1
+        out.append(c)
+        nxt[s] = c + 1
+    return out
+
+
+class _State:
+    def __init__(self, members, cap, day, unavail, min_rest, weights):
+        self.members = members
+        self.cap = cap
+        self.day = day
+        self.unavail = unavail
+        self.min_rest = min_rest
+        self.w_hard, self.w_span, self.w_gap = weights
+        self.count = [0] * len(cap)
+        self.occ: dict = {}
+        self.key_slots: dict = {}
+        self.key_cost: dict = {}
+        self.slot_of = [-1] * len(members)
+        self.overcap = self.conflicts = self.unavail_hits = self.rest = self.gaps = 0
+        self.span = 0
+
+    def _pair_cost(self, slots: list[int]) -> tuple[int, int]:
+        rest = gaps = 0
+        for a, b in zip(slots, slots[1:]):
+            if self.day[a] != self.day[b]:
+                continue
+            d = b - a
+            if d <= self.min_rest:
+                rest += self.min_rest + 1 - d
+            elif d > self.min_rest + 1:
+                gaps += d - 1 - self.min_rest
+        return rest, gaps
+
+    def _touch_key(self, key) -> None:
+        old = self.key_cost.get(key, (0, 0))
+        new = self._pair_cost(self.key_slots[key])
+        self.key_cost[key] = new
+        self.rest += new[0] - old[0]
+        self.gaps += new[1] - old[1]
+
+    def _add(self, m: int, s: int) -> None:
+        c = self.count[s]
+        if c >= self.cap[s]:
+            self.overcap += 1
+        self.count[s] = c + 1
+        if s >= self.span:
+            self.span = s + 1
+        for key in self.members[m]:
+            k = (key, s)
+            n = self.occ.get(k, 0)
+            if n >= 1:
+                self.conflicts += 1
+            self.occ[k] = n + 1
+            if k in self.unavail:
+                self.unavail_hits += 1
+            insort(self.key_slots.setdefault(key, []), s)
+            self._touch_key(key)
+
+    def _remove(self, m: int, s: int) -> None:
+        c = self.count[s]
+        if c > self.cap[s]:
+            self.overcap -= 1
+        self.count[s] = c - 1
+        for key in self.members[m]:
+            k = (key, s)
+            n = self.occ[k]
+            if n >= 2:
+                self.conflicts -= 1
+            if n == 1:
+                del self.occ[k]
+            else:
+                self.occ[k] = n - 1
+            if k in self.unavail:
+                self.unavail_hits -= 1
+            self.key_slots[key].remove(s)
+            self._touch_key(key)
+        while self.span and self.count[self.span - 1] == 0:
+            self.span -= 1
+
+    def place(self, m: int, s: int) -> None:
+        if self.slot_of[m] >= 0:
+            self._remove(m, self.slot_of[m])
+        self.slot_of[m] = s
+        self._add(m, s)
+
+    def hard(self) -> int:
+        return self.overcap + self.conflicts + self.unavail_hits + self.rest
+
+    def cost(self) -> float:
+        return self.w_hard * self.hard() + self.w_span * self.span + self.w_gap * self.gaps
+
+    def fits(self, m: int, s: int) -> bool:
+        # Whether m can go into s without adding a hard violation (used by the greedy start)
+        if self.count[s] >= self.cap[s]:
+            return False
+        for key in self.members[m]:
+            if (key, s) in self.occ or (key, s) in self.unavail:
+                return False
+            for t in self.key_slots.get(key, ()):
+                if self.day[t] == self.day[s] and abs(t - s) <= self.min_rest:
+                    return False
+        return True
+
+
+def _greedy(state: _State, order: list[int]) -> None:
+    first_open = 0
+    n_slots = len(state.cap)
+    for m in order:
+        while first_open < n_slots and state.count[first_open] >= state.cap[first_open]:
+            first_open += 1
+        s = next((s for s in range(first_open, n_slots) if state.fits(m, s)), None)
+        if s is None:
+            # No clean slot left: take the least loaded one and let the search repair it
+            s = min(range(n_slots), key=lambda x: (state.count[x] - state.cap[x], x))
+        state.place(m, s)
+
+
+def _span_lower_bound(cap: list[int], n_matches: int) -> int:
+    total = 0
+    for i, c in enumerate(cap):
+        total += c
+        if total >= n_matches:
+            return i + 1
+    return len(cap)
+
+
+def optimize_schedule(
+    fixtures: pd.DataFrame,
+    teams_df: pd.DataFrame,
+    slots: pd.DataFrame,
+    unavailable: set | None = None,
+    min_rest: int = 1,
+    time_budget: float = 5.0,
+    seed: int | None = None,
+    weights: tuple[float, float, float] = (HARD_WEIGHT, SPAN_WEIGHT, GAP_WEIGHT),
+    fixed: pd.DataFrame | None = None,
+) -> tuple[pd.DataFrame, dict]:
+    # Returns (plan, report). plan has match_id, slot (1-based, like the scheduler), court, day
+    # and scheduled_at for every fixture; report says how good the best plan found within
+    # time_budget seconds is. `fixed` are matches already under way or done (team1_id,
+    # team2_id, court, slot, scheduled_at): they keep their place and are never moved.
+    started = time.monotonic()
+    rng = random.Random(seed)
+    fixtures = fixtures.reset_index(drop=True)
+    n = len(fixtures)
+    cap = [int(c) for c in slots["capacity"]]
+    day = [int(d) for d in slots["day"]]
+    if n == 0 or not cap:
+        empty = pd.DataFrame(columns=["match_id", "slot", "court", "day", "scheduled_at"])
+        return empty, {"matches": n, "slots": len(cap), "feasible": n == 0}
+    pinned = _fixed_slots(fixed, slots)
+    members = match_participants(pd.concat([fixtures[["team1_id", "team2_id"]], pinned[["team1_id", "team2_id"]]], ignore_index=True), teams_df)
+    state = _State(members, cap, day, unavailable or set(), max(0, int(min_rest)), weights)
+    # Fixed matches sit after the fixtures (index n and up); moves only ever pick m < n
+    for j, s in enumerate(pinned["slot"]):
+        state.place(n + j, int(s))
+    rounds = pd.to_numeric(fixtures["round_no"], errors="coerce").fillna(0).tolist() if "round_no" in fixtures.columns else [0] * n
+    order = sorted(range(n), key=lambda i: (rounds[i], i))
+    _greedy(state, order)
+    initial_cost = cost = best_cost = state.cost()
+    best = list(state.slot_of)
+
+    # Temperatures are in units of the span weight: early on, losing a slot or two is accepted
+    t_start, t_end = 2.0 * weights[1], 0.02 * weights[1]
+    iterations = accepted = 0
+    n_slots = len(cap)
+    deadline = started + max(0.0, float(time_budget))
+    temp = t_start
+    while True:
+        if iterations % 256 == 0:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            frac = (now - started) / max(1e-9, deadline - started)
+            temp = t_start * (t_end / t_start) ** min(1.0, frac)
+        iterations += 1
+        if rng.random() < 0.5:
+            m = rng.randrange(n)
+            old = state.slot_of[m]
+            s = rng.randrange(min(n_slots, state.span + 1))
+            if s == old:
+                continue
+            state.place(m, s)
+            new_cost = state.cost()
+            if new_cost <= cost or rng.random() < math.exp((cost - new_cost) / temp):
+                cost = new_cost
+                accepted += 1
+            else:
+                state.place(m, old)
+        else:
+            a, b = rng.randrange(n), rng.randrange(n)
+            sa, sb = state.slot_of[a], state.slot_of[b]
+            if sa == sb:
+                continue
+            state.place(a, sb)
+            state.place(b, sa)
+            new_cost = state.cost()
+            if new_cost <= cost or rng.random() < math.exp((cost - new_cost) / temp):
+                cost = new_cost
+                accepted += 1
+            else:
+                state.place(b, sb)
+                state.place(a, sa)
+        if cost < best_cost:
+            best_cost = cost
+            best = list(state.slot_of)
+
+    # Rebuild the best plan to report its exact components
+    final = _State(state.members, cap, day, state.unavail, state.min_rest, weights)
+    for m, s in enumerate(best):
+        final.place(m, s)
+    plan = pd.DataFrame({"match_id": fixtures["match_id"].to_numpy(), "slot": best[:n]})
+    plan = plan.sort_values(["slot", "match_id"], kind="stable")
+    taken: dict = {}
+    for s, c in zip(pinned["slot"], pinned["court"]):
+        if pd.notna(c):
+            taken.setdefault(int(s), set()).add(int(c))
+    plan["court"] = _courts(plan["slot"].tolist(), taken)
+    plan["day"] = slots["day"].to_numpy()[plan["slot"].to_numpy()]
+    plan["scheduled_at"] = pd.to_datetime(slots["start"]).to_numpy()[plan["slot"].to_numpy()]
+    # Stored slots are 1-based, as written by the scheduler and replan_matches
+    plan["slot"] = plan["slot"] + 1
+    lower = max(_span_lower_bound(cap, n + len(pinned)), int(pinned["slot"].max()) + 1 if len(pinned) else 0)
+    report = {
+        "matches": n,
+        "fixed": len(pinned),
+        "slots": n_slots,
+        "feasible": final.hard() == 0,
+        # Matches that can't fit whatever the order: add courts, hours or days
+        "capacity_shortfall": max(0, n + len(pinned) - sum(cap)),
+        "over_capacity": final.overcap,
+        "double_booked": final.conflicts,
+        "unavailable": final.unavail_hits,
+        "rest_violations": final.rest,
+        "span_slots": final.span,
+        "span_lower_bound": lower,
+        "span_gap_pct": round(100.0 * (final.span - lower) / lower, 1) if lower else 0.0,
+        "idle_gap_slots": final.gaps,
+        "ends_at": str(plan["scheduled_at"].max()),
+        "cost": round(final.cost(), 2),
+        "initial_cost": round(initial_cost, 2),
+        "iterations": iterations,
+        "accepted": accepted,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+    return plan.reset_index(drop=True), report
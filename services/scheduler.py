@@ -0,0 +1,123 @@
+from collections import deque
+import pandas as pd
+from services.import_export import MATCHES_COLUMNS
+
+SCHEDULE_COLUMNS = ["round_no", "court", "slot"]
+# Matches in these states are already under way or done and keep their court and slot on a re-plan
+FIXED_STATUSES = ("In Progress", "Completed")
+
+
+def circle_rounds(team_ids: list) -> list[list[tuple]]:
+    # Circle method: the first team stays put, the others rotate one place per round.
+    # An odd group gets a bye (None) in the fixed spot, so every team sits out exactly once.
+    teams = list(team_ids)
+    if len(teams) < 2:
+        return []
+    if len(teams) % 2:
+        teams.insert(0, None)
+    n = len(teams)
+    fixed, rest = teams[0], deque(teams[1:])
+    rounds = []
+    for r in range(n - 1):
+        order = [fixed] + list(rest)
+        pairs = []
+        for i in range(n // 2):
+            a, b = order[i], order[n - 1 - i]
+            if a is None or b is None:
+                continue
+            # Alternate sides so every team is team1 in about half its matches
+            flip = r % 2 == 1 if i == 0 else i % 2 == 1
+            pairs.append((b, a) if flip else (a, b))
+        rounds.append(pairs)
+        rest.rotate(1)
+    return rounds
+
+
+def round_robin_fixtures(teams_df: pd.DataFrame) -> pd.DataFrame:
+    # One row per fixture with its group and round; groups are interleaved round by round
+    rows = []
+    for grp, gdf in teams_df.groupby("group", sort=True):
+        ids = [int(x) for x in pd.to_numeric(gdf["team_id"], errors="coerce").dropna()]
+        for r, pairs in enumerate(circle_rounds(ids), start=1):
+            for i, (a, b) in enumerate(pairs):
+                rows.append((r, i, grp, a, b))
+    fixtures = pd.DataFrame(rows, columns=["round_no", "_order", "group", "team1_id", "team2_id"])
+    return fixtures.sort_values(["round_no", "_order"], kind="stable").drop(columns="_order").reset_index(drop=True)
+
+
+def assign_slots(fixtures: pd.DataFrame, courts: int, min_rest: int = 0, start_slot: int = 1, last_slot: dict | None = None) -> pd.DataFrame:
+    # Greedy list scheduling in fixture order: each time slot takes the earliest pending
+    # fixtures whose teams have sat out at least `min_rest` slots, up to `courts` at once.
+    # last_slot seeds each team's previous slot, e.g. from matches that keep their place.
+    courts = max(1, int(courts))
+    min_rest = max(0, int(min_rest))
+    last = dict(last_slot or {})
+    t1 = fixtures["team1_id"].tolist()
+    t2 = fixtures["team2_id"].tolist()
+    court_of = [0] * len(fixtures)
+    slot_of = [0] * len(fixtures)
+    pending = deque(range(len(fixtures)))
+    slot = start_slot
+    while pending:
+        used = 0
+        waiting = []
+        busy = set()
+        while pending and used < courts:
+            i = pending.popleft()
+            a, b = t1[i], t2[i]
+            if a in busy or b in busy or last.get(a, -10**9) + min_rest >= slot or last.get(b, -10**9) + min_rest >= slot:
+                waiting.append(i)
+                continue
+            used += 1
+            court_of[i], slot_of[i] = used, slot
+            busy.update((a, b))
+            last[a] = last[b] = slot
+        # Skipped fixtures keep their priority for the next slot
+        pending.extendleft(reversed(waiting))
+        slot += 1
+    out = fixtures.copy()
+    out["court"] = court_of
+    out["slot"] = slot_of
+    return out
+
+
+def schedule_round_robin(teams_df: pd.DataFrame, courts: int, min_rest: int = 0, start_id: int = 1) -> pd.DataFrame:
+    # Full fixture list in the matches table layout, with round, court and slot filled in
+    fixtures = assign_slots(round_robin_fixtures(teams_df), courts, min_rest)
+    fixtures = fixtures.sort_values(["slot", "court"], kind="stable").reset_index(drop=True)
+    out = pd.DataFrame({
+        "match_id": range(int(start_id), int(start_id) + len(fixtures)),
+        "group": fixtures["group"].to_numpy(),
+        "team1_id": fixtures["team1_id"].to_numpy(),
+        "team2_id": fixtures["team2_id"].to_numpy(),
+        "status": "Scheduled",
+    })
+    for c in MATCHES_COLUMNS:
+        if c not in out.columns:
+            out[c] = pd.NA
+    for c in SCHEDULE_COLUMNS:
+        out[c] = fixtures[c].to_numpy()
+    return out[MATCHES_COLUMNS + SCHEDULE_COLUMNS]
+
+
+def replan_matches(matches_df: pd.DataFrame, courts: int, min_rest: int = 0) -> pd.DataFrame:
+    # Re-assign courts and slots for matches that haven't started, after the last slot in use
+    # by matches that have; returns only the re-planned rows (match_id, court, slot).
+    df = matches_df.copy()
+    for c in SCHEDULE_COLUMNS:
+        df[c] = pd.to_numeric(df[c], errors="coerce") if c in df.columns else float("nan")
+    fixed = df["status"].isin(FIXED_STATUSES)
+    todo = df[~fixed & df["team1_id"].notna() & df["team2_id"].notna()]
+    if todo.empty:
+        return pd.DataFrame(columns=["match_id", "court", "slot"])
+    done = df[fixed & df["slot"].notna()]
+    start = int(done["slot"].max()) + 1 if not done.empty else 1
+    last = {}
+    for side in ("team1_id", "team2_id"):
+        if not done.empty:
+            for team, s in done.groupby(side)["slot"].max().items():
+                last[team] = max(last.get(team, -10**9), int(s))
+    todo = todo.assign(_round=todo["round_no"].fillna(todo["slot"]).fillna(0))
+    todo = todo.sort_values(["_round", "slot", "match_id"], kind="stable", na_position="last")
+    planned = assign_slots(todo[["match_id", "team1_id", "team2_id"]].reset_index(drop=True), courts, min_rest, start, last)
+    return planned[["match_id", "court", "slot"]]
@@ -0,0 +1,88 @@
+import json
+from typing import Any
+from sqlalchemy import text
+from data.db import engine, read_engine
+from services import cache, versions
+
+# Every settings row is loaded with one query into the process-wide cache and served from
+# memory until set_setting (here or in another process, via the version watcher) bumps the
+# "settings" scope. JSON values are parsed once per version; callers must not mutate them.
+
+SETTINGS_SCOPE = "settings"
+ACTIVE_TOURNAMENT_KEY = "active_tournament_id"
+
+
+def _load_all() -> dict[str, str | None]:
+    try:
+        with versions.fresh_engine(engine, read_engine, SETTINGS_SCOPE).connect() as conn:
+            rows = conn.execute(text("SELECT key, value FROM settings")).all()
+        return {str(k): v for k, v in rows}
+    except Exception:
+        return {}
+
+
+def all_settings() -> dict[str, str | None]:
+    return cache.get_or_load(SETTINGS_SCOPE, "all", _load_all)
+
+
+def get_setting(key: str, default: str | None = None) -> str | None:
+    value = all_settings().get(key)
+    return default if value is None else value
+
+
+def get_json_setting(key: str, default: Any = None) -> Any:
+    def load():
+        raw = all_settings().get(key)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+    value = cache.get_or_load(SETTINGS_SCOPE, f"json:{key}", load)
+    return default if value is None else value
+
+
+def get_active_tournament_id() -> int | None:
+    v = get_setting(ACTIVE_TOURNAMENT_KEY)
+    try:
+        return int(v) if v not in (None, "", "null") else None
+    except Exception:
+        return None
+
+
+def invalidate_settings() -> None:
+    # Bump first, so a reload straight after the invalidation knows to wait for the replica
+    try:
+        with engine.begin() as conn:
+            versions.bump_version(conn, SETTINGS_SCOPE)
+    except Exception:
+        pass
+    cache.invalidate(SETTINGS_SCOPE)
+
+
+def set_settings(values: dict[str, str]) -> None:
+    # Writes and the version bump share one transaction, so other processes never see one without the other
+    with engine.begin() as conn:
+        for key, value in values.items():
+            conn.execute(
+                text("INSERT INTO settings(key, value) VALUES(:k, :v) ON CONFLICT(key) DO UPDATE SET value=:v"),
+                {"k": key, "v": value},
+            )
+        versions.bump_version(conn, SETTINGS_SCOPE)
+    cache.invalidate(SETTINGS_SCOPE)
+
+
+def set_setting(key: str, value: str) -> None:
+    set_settings({key: value})
+
+
+def set_json_setting(key: str, obj: Any) -> None:
+    try:
+        set_setting(key, json.dumps(obj))
+    except (TypeError, ValueError):
+        set_setting(key, str(obj))
+
+
+def set_active_tournament_id(tid) -> None:
+    set_setting(ACTIVE_TOURNAMENT_KEY, "" if tid in (None, "") else str(int(tid)))
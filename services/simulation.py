@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from services.prediction import game_win_probability, set_win_probability
+from services.standings import group_stage_matches, summarize_matches
+from services.tiebreaks import DEFAULT_TIEBREAK_CHAIN, WIN_POINTS, is_h2h, seed_values
+
+# Monte Carlo group-stage odds. Every simulation plays out the open group fixtures with
+# the fitted strengths (set by set, games drawn from the winner's game odds), adds them to the
+# current records and ranks each group with the tournament's tiebreak chain, all as (S, n)
+# arrays: one lexsort ranks every group of every simulation at once. Head-to-head rules need
+# each simulation's mini-leagues, so the simulation skips them and falls through to the next
+# rule; everything else ranks exactly as the standings do.
+
+N_SIMULATIONS = 5000
+SEED = 20240601
+
+
+def remaining_matches(matches_df: pd.DataFrame) -> pd.DataFrame:
+    # Group-stage matches without a counted result: not Completed and no set won yet
+    if matches_df is None or matches_df.empty:
+        return pd.DataFrame(columns=["team1_id", "team2_id"])
+    group = group_stage_matches(matches_df)
+    res = summarize_matches(group)
+    open_ = ((res["t1_sets"] == 0) & (res["t2_sets"] == 0) & res["team1_id"].notna() & res["team2_id"].notna()).to_numpy()
+    if "status" in group.columns:
+        open_ &= (group["status"] != "Completed").to_numpy()
+    return pd.DataFrame({
+        "team1_id": res["team1_id"][open_].astype("int64").to_numpy(),
+        "team2_id": res["team2_id"][open_].astype("int64").to_numpy(),
+    })
+
+
+def open_fixtures(standings: pd.DataFrame, matches_df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    # Group matches still to decide, as row positions into standings: the remaining matches
+    # plus every round-robin pair of a group that has no group match at all yet
+    if standings is None or standings.empty:
+        return np.empty(0, dtype="int64"), np.empty(0, dtype="int64")
+    table = standings.reset_index(drop=True)
+    n = len(table)
+    team_ids = pd.to_numeric(table["team_id"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    codes, _ = pd.factorize(table["group"].astype(str))
+    pos = pd.Series(np.arange(n), index=team_ids)
+    pos = pos[~pos.index.duplicated()]
+
+    def pairs(df):
+        if df is None or df.empty:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="int64")
+        i = pos.reindex(pd.to_numeric(df["team1_id"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)).to_numpy()
+        j = pos.reindex(pd.to_numeric(df["team2_id"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)).to_numpy()
+        ok = ~(np.isnan(i) | np.isnan(j))
+        i, j = i[ok].astype("int64"), j[ok].astype("int64")
+        # Only matches inside a standings group move that group's table
+        same = codes[i] == codes[j]
+        return i[same], j[same]
+
+    i, j = pairs(remaining_matches(matches_df))
+    seen_i, seen_j = pairs(group_stage_matches(matches_df))
+    a, b = np.triu_indices(n, 1)
+    in_group = codes[a] == codes[b]
+    a, b = a[in_group], b[in_group]
+    missing = ~np.isin(a * n + b, np.minimum(seen_i, seen_j) * n + np.maximum(seen_i, seen_j))
+    return np.concatenate([i, a[missing]]), np.concatenate([j, b[missing]])
+
+
+def _simulate_sets(rng: np.random.Generator, ps: np.ndarray, pg: np.ndarray, shape: tuple[int, int]):
+    # Sets and games of best-of-three matches; ps/pg are side 1's set and game odds per match
+    won = rng.random(shape + (3,)) < ps[None, :, None]
+    decider = won[..., 0] != won[..., 1]
+    played = np.ones(shape + (3,), dtype=bool)
+    played[..., 2] = decider
+    # Loser's games: failures before the winner's sixth game, with 5+ meaning 7-5 or 7-6
+    p_winner = np.where(won, pg[None, :, None], 1.0 - pg[None, :, None])
+    lost = rng.negative_binomial(6, np.clip(p_winner, 1e-9, 1.0))
+    close = lost >= 5
+    lost = np.where(close, 5 + (rng.random(lost.shape) < 0.5), lost)
+    win_games = np.where(close, 7, 6)
+    g1 = np.where(won, win_games, lost) * played
+    g2 = np.where(won, lost, win_games) * played
+    s1 = (won & played).sum(axis=-1)
+    s2 = (~won & played).sum(axis=-1)
+    return s1, s2, g1.sum(axis=-1), g2.sum(axis=-1)
+
+
+def simulate_positions(standings: pd.DataFrame, matches_df: pd.DataFrame, strength: pd.Series | None = None,
+                       chain: list[str] | None = None, teams_df: pd.DataFrame | None = None,
+                       n_sims: int = N_SIMULATIONS, seed: int = SEED) -> pd.DataFrame:
+    # team_id, group and pos_1..pos_K: the probability of finishing each group position.
+    # standings are the current ones (any order); strength maps team_id -> fitted strength
+    cols = ["team_id", "group"]
+    if standings is None or standings.empty:
+        return pd.DataFrame(columns=cols)
+    chain = chain or list(DEFAULT_TIEBREAK_CHAIN)
+    st = standings.reset_index(drop=True)
+    n = len(st)
+    team_ids = pd.to_numeric(st["team_id"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    codes, labels = pd.factorize(st["group"].astype(str))
+    sizes = np.bincount(codes)
+
+    i, j = open_fixtures(st, matches_df)
+    r = len(i)
+
+    def base(c):
+        return pd.to_numeric(st[c], errors="coerce").fillna(0).to_numpy(dtype="float64") if c in st.columns else np.zeros(n)
+
+    stats = {c: np.tile(base(c), (n_sims, 1)) for c in ("points", "wins", "sets_won", "sets_lost", "games_won", "games_lost")}
+    if r:
+        rng = np.random.default_rng(seed)
+        s = np.zeros(n) if strength is None else strength.reindex(team_ids).fillna(0.0).to_numpy(dtype="float64")
+        pg = game_win_probability(s[i] - s[j])
+        s1, s2, g1, g2 = _simulate_sets(rng, set_win_probability(pg), pg, (n_sims, r))
+        w1 = (s1 > s2).astype("float64")
+        rows = np.repeat(np.arange(n_sims) * n, r)
+        at_i = rows + np.tile(i, n_sims)
+        at_j = rows + np.tile(j, n_sims)
+        total = n_sims * n
+        for c, a, b in (("wins", w1, 1.0 - w1), ("sets_won", s1, s2), ("sets_lost", s2, s1), ("games_won", g1, g2), ("games_lost", g2, g1)):
+            add = np.bincount(at_i, weights=a.ravel(), minlength=total) + np.bincount(at_j, weights=np.asarray(b, dtype="float64").ravel(), minlength=total)
+            stats[c] += add.reshape(n_sims, n)
+        stats["points"] += WIN_POINTS * (np.bincount(at_i, weights=w1.ravel(), minlength=total) + np.bincount(at_j, weights=(1.0 - w1).ravel(), minlength=total)).reshape(n_sims, n)
+    stats["sets_diff"] = stats["sets_won"] - stats["sets_lost"]
+    stats["games_diff"] = stats["games_won"] - stats["games_lost"]
+
+    # Higher is better for every key; fully tied teams keep their current order
+    keys = []
+    for rule in chain:
+        if rule == "seed":
+            keys.append(np.broadcast_to(seed_values(team_ids, teams_df), (n_sims, n)))
+        elif not is_h2h(rule) and rule in stats:
+            keys.append(stats[rule])
+    sims = np.broadcast_to(np.arange(n_sims)[:, None], (n_sims, n))
+    order = np.lexsort(
+        [np.broadcast_to(np.arange(n), (n_sims, n)).ravel()]
+        + [-k.ravel() for k in reversed(keys)]
+        + [np.broadcast_to(codes, (n_sims, n)).ravel(), sims.ravel()]
+    ).reshape(n_sims, n) - (np.arange(n_sims) * n)[:, None]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    place = np.empty((n_sims, n), dtype="int64")
+    np.put_along_axis(place, order, np.arange(n)[None, :] - starts[codes[order]], axis=1)
+
+    k = int(sizes.max())
+    counts = np.bincount((np.arange(n)[None, :] * k + place).ravel(), minlength=n * k).reshape(n, k)
+    out = pd.DataFrame(counts / n_sims, columns=[f"pos_{p + 1}" for p in range(k)])
+    out.insert(0, "group", labels[codes])
+    out.insert(0, "team_id", st["team_id"].to_numpy())
+    return out
+
+
+def qualify_probability(odds: pd.DataFrame, top_n: int) -> pd.Series:
+    # P(finishing in the top `top_n` of the group) per row of simulate_positions output
+    cols = [c for c in odds.columns if c.startswith("pos_")][:max(0, int(top_n))]
+    return odds[cols].sum(axis=1) if cols else pd.Series(0.0, index=odds.index)
@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
 
+SET_COLUMNS = [("set1_t1", "set1_t2"), ("set2_t1", "set2_t2"), ("set3_t1", "set3_t2")]
+STAT_COLUMNS = ["played", "wins", "losses", "sets_won", "sets_lost", "games_won", "games_lost", "points"]
+
+
 def compute_match_result(row: pd.Series) -> tuple[int, int]:
     t1_sets = 0
     t2_sets = 0
@@ -17,57 +22,118 @@ def compute_match_result(row: pd.Series) -> tuple[int, int]:
     return t1_sets, t2_sets
 
 
-def compute_standings(teams_df: pd.DataFrame, matches_df: pd.DataFrame) -> pd.DataFrame:
-    base = teams_df[["team_id", "team_name", "group"]].copy()
-    base["played"] = 0
-    base["wins"] = 0
-    base["losses"] = 0
-    base["sets_won"] = 0
-    base["sets_lost"] = 0
-    base["games_won"] = 0
-    base["games_lost"] = 0
-    base["points"] = 0
-
-    for _, m in matches_df.iterrows():
-        t1 = m.get("team1_id"); t2 = m.get("team2_id")
-        if pd.isna(t1) or pd.isna(t2):
-            continue
-        t1 = int(t1); t2 = int(t2)
-        t1_sets, t2_sets = compute_match_result(m)
-        if t1_sets == 0 and t2_sets == 0:
-            continue
-        gw1 = 0; gw2 = 0
-        for a, b in [
-            (m.get("set1_t1"), m.get("set1_t2")),
-            (m.get("set2_t1"), m.get("set2_t2")),
-            (m.get("set3_t1"), m.get("set3_t2")),
-        ]:
-            if pd.isna(a) or pd.isna(b):
-                continue
-            gw1 += int(a); gw2 += int(b)
-        base.loc[base["team_id"] == t1, "played"] += 1
-        base.loc[base["team_id"] == t2, "played"] += 1
-        base.loc[base["team_id"] == t1, "sets_won"] += t1_sets
-        base.loc[base["team_id"] == t1, "sets_lost"] += t2_sets
-        base.loc[base["team_id"] == t1, "games_won"] += gw1
-        base.loc[base["team_id"] == t1, "games_lost"] += gw2
-        base.loc[base["team_id"] == t2, "sets_won"] += t2_sets
-        base.loc[base["team_id"] == t2, "sets_lost"] += t1_sets
-        base.loc[base["team_id"] == t2, "games_won"] += gw2
-        base.loc[base["team_id"] == t2, "games_lost"] += gw1
-        if t1_sets > t2_sets:
-            base.loc[base["team_id"] == t1, "wins"] += 1
-            base.loc[base["team_id"] == t2, "losses"] += 1
-            base.loc[base["team_id"] == t1, "points"] += 3
-        elif t2_sets > t1_sets:
-            base.loc[base["team_id"] == t2, "wins"] += 1
-            base.loc[base["team_id"] == t1, "losses"] += 1
-            base.loc[base["team_id"] == t2, "points"] += 3
+def _numeric_column(matches_df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in matches_df.columns:
+        return np.full(len(matches_df), np.nan)
+    return pd.to_numeric(matches_df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def compute_match_results(matches_df: pd.DataFrame) -> pd.DataFrame:
+    # Column-wise equivalent of compute_match_result plus games, for all matches at once
+    n = len(matches_df)
+    t1_sets = np.zeros(n, dtype="int64"); t2_sets = np.zeros(n, dtype="int64")
+    t1_games = np.zeros(n, dtype="int64"); t2_games = np.zeros(n, dtype="int64")
+    for c1, c2 in SET_COLUMNS:
+        a = _numeric_column(matches_df, c1)
+        b = _numeric_column(matches_df, c2)
+        valid = ~(np.isnan(a) | np.isnan(b))
+        t1_sets += (valid & (a > b)).astype("int64")
+        t2_sets += (valid & (b > a)).astype("int64")
+        t1_games += np.where(valid, np.trunc(np.nan_to_num(a)), 0).astype("int64")
+        t2_games += np.where(valid, np.trunc(np.nan_to_num(b)), 0).astype("int64")
+    return pd.DataFrame(
+        {"t1_sets": t1_sets, "t2_sets": t2_sets, "t1_games": t1_games, "t2_games": t2_games},
+        index=matches_df.index,
+    )
+
+
+def _nullable_int(values: np.ndarray) -> pd.arrays.IntegerArray:
+    return pd.array(np.trunc(values), dtype="Float64").astype("Int64")
+
+
+def team_labels(teams_df: pd.DataFrame) -> pd.Series:
+    # Display label per team_id: the team name, or "player1 vs player2" when it has none
+    if teams_df is None or teams_df.empty:
+        return pd.Series(dtype=object, index=pd.Index([], dtype="float64"))
+    name = teams_df["team_name"].fillna("").astype(str)
+    blank = pd.Series("", index=teams_df.index)
+    players = teams_df.get("player1", blank).fillna("").astype(str) + " vs " + teams_df.get("player2", blank).fillna("").astype(str)
+    labels = name.where(name.str.len() > 0, players)
+    ids = pd.to_numeric(teams_df["team_id"], errors="coerce").astype("float64")
+    labels.index = ids
+    return labels[~labels.index.isna() & ~labels.index.duplicated(keep="first")]
+
 
+def summarize_matches(matches_df: pd.DataFrame, teams_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    # Sets, games, winner (and team labels when teams_df is given) for every match as columns
+    out = compute_match_results(matches_df)
+    t1 = _numeric_column(matches_df, "team1_id")
+    t2 = _numeric_column(matches_df, "team2_id")
+    out["team1_id"] = _nullable_int(t1)
+    out["team2_id"] = _nullable_int(t2)
+    s1 = out["t1_sets"].to_numpy(); s2 = out["t2_sets"].to_numpy()
+    winner = np.where(s1 > s2, t1, np.where(s2 > s1, t2, np.nan))
+    out["winner_id"] = _nullable_int(winner)
+    if teams_df is not None:
+        labels = team_labels(teams_df)
+        out["team1_label"] = labels.reindex(t1).fillna("?").to_numpy()
+        out["team2_label"] = labels.reindex(t2).fillna("?").to_numpy()
+    return out
+
+
+def team_long_format(matches_df: pd.DataFrame) -> pd.DataFrame:
+    # One row per (match, side) with that team's contribution to every stat column
+    res = summarize_matches(matches_df)
+    keep = (res["team1_id"].notna() & res["team2_id"].notna() & ((res["t1_sets"] > 0) | (res["t2_sets"] > 0))).to_numpy()
+    res = res[keep]
+    t1 = res["team1_id"].to_numpy(dtype="int64"); t2 = res["team2_id"].to_numpy(dtype="int64")
+    s1 = res["t1_sets"].to_numpy(); s2 = res["t2_sets"].to_numpy()
+    g1 = res["t1_games"].to_numpy(); g2 = res["t2_games"].to_numpy()
+    w1 = (s1 > s2).astype("int64"); w2 = (s2 > s1).astype("int64")
+    ones = np.ones(len(res), dtype="int64")
+    return pd.DataFrame({
+        "team_id": np.concatenate([t1, t2]),
+        "played": np.concatenate([ones, ones]),
+        "wins": np.concatenate([w1, w2]),
+        "losses": np.concatenate([w2, w1]),
+        "sets_won": np.concatenate([s1, s2]),
+        "sets_lost": np.concatenate([s2, s1]),
+        "games_won": np.concatenate([g1, g2]),
+        "games_lost": np.concatenate([g2, g1]),
+        "points": np.concatenate([3 * w1, 3 * w2]),
+    })
+
+
+def group_stage_matches(matches_df: pd.DataFrame) -> pd.DataFrame:
+    # Knockout and consolation matches carry a stage and don't count towards group standings
+    if matches_df is None or "stage" not in matches_df.columns:
+        return matches_df
+    stage = matches_df["stage"]
+    return matches_df[(stage.isna() | (stage.astype(str).str.strip() == "")).to_numpy()]
+
+
+def aggregate_team_stats(matches_df: pd.DataFrame) -> pd.DataFrame:
+    matches_df = group_stage_matches(matches_df)
+    if matches_df is None or matches_df.empty:
+        return pd.DataFrame(columns=STAT_COLUMNS, dtype="int64").rename_axis("team_id")
+    return team_long_format(matches_df).groupby("team_id", sort=False)[STAT_COLUMNS].sum()
+
+
+def rank_standings(base: pd.DataFrame) -> pd.DataFrame:
+    base = base.copy()
     base["sets_diff"] = base["sets_won"] - base["sets_lost"]
     base["games_diff"] = base["games_won"] - base["games_lost"]
-
-    base = base.sort_values(
+    return base.sort_values(
         by=["group", "points", "wins", "sets_diff", "games_diff"], ascending=[True, False, False, False, False]
     ).reset_index(drop=True)
-    return base
+
+
+def compute_standings(teams_df: pd.DataFrame, matches_df: pd.DataFrame) -> pd.DataFrame:
+    base = teams_df[["team_id", "team_name", "group"]].copy()
+    agg = aggregate_team_stats(matches_df)
+    keys = pd.to_numeric(base["team_id"], errors="coerce")
+    agg = agg.reindex(keys.astype("float64"))
+    agg.index = base.index
+    for c in STAT_COLUMNS:
+        base[c] = agg[c].fillna(0).astype("int64")
+    return rank_standings(base)
@@ -0,0 +1,187 @@
+import argparse
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from services.players import apply_player_changes
+from services.standings import STAT_COLUMNS, aggregate_team_stats, compute_standings, rank_standings
+
+MATCH_SELECT = "SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, stage FROM matches"
+TEAM_SELECT = "SELECT team_id, team_name, \"group\" FROM teams"
+
+_UPSERT_DELTA = text(
+    "INSERT INTO team_standings(tournament_id, team_id, " + ", ".join(STAT_COLUMNS) + ") "
+    "VALUES(:tournament_id, :team_id, " + ", ".join(":" + c for c in STAT_COLUMNS) + ") "
+    "ON CONFLICT(tournament_id, team_id) DO UPDATE SET "
+    + ", ".join(f"{c} = team_standings.{c} + excluded.{c}" for c in STAT_COLUMNS)
+)
+
+
+def standings_delta(old_df: pd.DataFrame | None, new_df: pd.DataFrame | None) -> pd.DataFrame:
+    # Per-team change in every stat column when old_df rows are replaced by new_df rows.
+    # Unchanged rows contribute equally to both sides and cancel out.
+    new_agg = aggregate_team_stats(new_df)
+    old_agg = aggregate_team_stats(old_df)
+    delta = new_agg.sub(old_agg, fill_value=0).fillna(0).astype("int64")
+    return delta[(delta != 0).any(axis=1)]
+
+
+def apply_standings_delta(conn: Connection, tournament_id: int, delta: pd.DataFrame) -> int:
+    if tournament_id is None or delta.empty:
+        return 0
+    rows = [
+        {"tournament_id": int(tournament_id), "team_id": int(team_id), **{c: int(v) for c, v in zip(STAT_COLUMNS, vals)}}
+        for team_id, vals in zip(delta.index, delta[STAT_COLUMNS].itertuples(index=False, name=None))
+    ]
+    conn.execute(_UPSERT_DELTA, rows)
+    return len(rows)
+
+
+def apply_match_changes(conn: Connection, tournament_id: int, old_df: pd.DataFrame | None, new_df: pd.DataFrame | None) -> int:
+    n = apply_standings_delta(conn, tournament_id, standings_delta(old_df, new_df))
+    # Player career stats and ratings follow the same match rows
+    apply_player_changes(conn, tournament_id, old_df, new_df)
+    return n
+
+
+def read_tournament_matches(conn: Connection, tournament_id: int) -> pd.DataFrame:
+    return pd.read_sql(text(MATCH_SELECT + " WHERE tournament_id = :tid"), conn, params={"tid": tournament_id})
+
+
+def read_stored_standings(conn: Connection, tournament_id: int) -> pd.DataFrame:
+    return pd.read_sql(
+        text("SELECT team_id, " + ", ".join(STAT_COLUMNS) + " FROM team_standings WHERE tournament_id = :tid"),
+        conn,
+        params={"tid": tournament_id},
+    )
+
+
+def load_standings(conn: Connection, tournament_id: int, teams_df: pd.DataFrame) -> pd.DataFrame | None:
+    # Same frame as compute_standings, read from the maintained aggregate in O(teams). Only
+    # reads; None means the tournament's aggregate was never built (see backfill_standings)
+    base = teams_df[["team_id", "team_name", "group"]].copy()
+    stored = read_stored_standings(conn, tournament_id)
+    if stored.empty and not base.empty:
+        return None
+    agg = stored.set_index(stored["team_id"].astype("float64"))[STAT_COLUMNS]
+    agg = agg.reindex(pd.to_numeric(base["team_id"], errors="coerce").astype("float64"))
+    agg.index = base.index
+    for c in STAT_COLUMNS:
+        base[c] = agg[c].fillna(0).astype("int64")
+    return rank_standings(base)
+
+
+def rebuild_standings(conn: Connection, tournament_id: int) -> int:
+    conn.execute(text("DELETE FROM team_standings WHERE tournament_id = :tid"), {"tid": tournament_id})
+    delta = aggregate_team_stats(read_tournament_matches(conn, tournament_id))
+    try:
+        team_ids = pd.read_sql(text("SELECT team_id FROM teams WHERE tournament_id = :tid"), conn, params={"tid": tournament_id})["team_id"]
+    except Exception:
+        team_ids = pd.Series(dtype="float64")
+    # Seed a zero row for every roster team so an empty aggregate means "never built"
+    team_ids = pd.to_numeric(team_ids, errors="coerce").dropna().astype("int64")
+    missing = team_ids[~team_ids.isin(delta.index)].unique()
+    if len(missing):
+        delta = pd.concat([delta, pd.DataFrame(0, index=pd.Index(missing, name="team_id"), columns=STAT_COLUMNS)])
+    return apply_standings_delta(conn, tournament_id, delta)
+
+
+def forget_tournament_results(conn: Connection, tournament_id: int) -> int:
+    # Career stats and ratings only count tournaments that exist: call before a tournament row
+    # is deleted, while its teams and matches can still be read
+    gone = read_tournament_matches(conn, tournament_id)
+    apply_player_changes(conn, tournament_id, gone, None)
+    return len(gone)
+
+
+def delete_tournament(conn: Connection, tournament_id: int, cascade: bool = True) -> int:
+    # Deletes a tournament and, with cascade, its teams, matches and standings aggregate
+    n = forget_tournament_results(conn, tournament_id)
+    conn.execute(text("DELETE FROM tournaments WHERE tournament_id = :tid"), {"tid": tournament_id})
+    if cascade:
+        for table in ("matches", "teams", "team_standings"):
+            conn.execute(text(f"DELETE FROM {table} WHERE tournament_id = :tid"), {"tid": tournament_id})
+    return n
+
+
+def seed_standings(conn: Connection, tournament_id: int) -> int:
+    # Zero rows for roster teams without one, so a tournament with teams but no results yet is
+    # served from the aggregate instead of recomputed on every load
+    return conn.execute(text(
+        "INSERT INTO team_standings(tournament_id, team_id, " + ", ".join(STAT_COLUMNS) + ") "
+        "SELECT tournament_id, team_id, " + ", ".join("0" for _ in STAT_COLUMNS) + " FROM teams "
+        "WHERE tournament_id = :tid AND team_id IS NOT NULL "
+        "ON CONFLICT(tournament_id, team_id) DO NOTHING"
+    ), {"tid": tournament_id}).rowcount
+
+
+def list_tournaments(conn: Connection) -> list[int]:
+    try:
+        tids = pd.read_sql(text("SELECT tournament_id FROM tournaments ORDER BY tournament_id"), conn)["tournament_id"]
+    except Exception:
+        return []
+    return [int(t) for t in pd.to_numeric(tids, errors="coerce").dropna()]
+
+
+def backfill_standings(conn: Connection) -> list[int]:
+    # Builds the aggregate of every tournament with teams or matches but no stored rows, e.g.
+    # data from before team_standings existed. Runs once per process from services.bootstrap,
+    # so viewer reads never have to write.
+    try:
+        tids = pd.read_sql(text(
+            "SELECT tournament_id FROM teams WHERE tournament_id IS NOT NULL "
+            "UNION SELECT tournament_id FROM matches WHERE tournament_id IS NOT NULL "
+            "EXCEPT SELECT tournament_id FROM team_standings"
+        ), conn)["tournament_id"]
+    except Exception:
+        return []
+    built = [int(t) for t in pd.to_numeric(tids, errors="coerce").dropna()]
+    for tid in built:
+        rebuild_standings(conn, tid)
+    return built
+
+
+def verify_standings(conn: Connection, tournament_id: int) -> pd.DataFrame:
+    # Rows where the stored aggregate disagrees with a full recompute; empty means consistent
+    try:
+        teams_df = pd.read_sql(text(TEAM_SELECT + " WHERE tournament_id = :tid"), conn, params={"tid": tournament_id})
+    except Exception:
+        teams_df = pd.DataFrame(columns=["team_id", "team_name", "group"])
+    expected = compute_standings(teams_df, read_tournament_matches(conn, tournament_id)).set_index("team_id")[STAT_COLUMNS]
+    stored = load_standings(conn, tournament_id, teams_df)
+    if stored is None:
+        # Never built: every team differs
+        stored = pd.DataFrame(index=expected.index, columns=STAT_COLUMNS, dtype="float64")
+    else:
+        stored = stored.set_index("team_id")[STAT_COLUMNS].reindex(expected.index)
+    bad = (expected != stored).any(axis=1)
+    return expected[bad].join(stored[bad], rsuffix="_stored")
+
+
+def main(argv: list[str] | None = None) -> int:
+    from data.db import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify the persisted team_standings aggregate.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--tournament", type=int, default=None, help="Tournament ID (default: all tournaments)")
+    args = parser.parse_args(argv)
+    init_db()
+    with engine.begin() as conn:
+        tids = [args.tournament] if args.tournament is not None else list_tournaments(conn)
+        failed = 0
+        for tid in tids:
+            if args.command == "rebuild":
+                n = rebuild_standings(conn, tid)
+                print(f"Tournament {tid}: rebuilt {n} team rows")
+            else:
+                diff = verify_standings(conn, tid)
+                if diff.empty:
+                    print(f"Tournament {tid}: OK")
+                else:
+                    failed += 1
+                    print(f"Tournament {tid}: {len(diff)} team rows differ")
+                    print(diff.to_string())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+import html
+import re
+import numpy as np
+import pandas as pd
+from services import cache
+
+_NEEDS_ESCAPE = re.compile(r"[&<>\"']")
+
+
+def _column_cells(series: pd.Series) -> np.ndarray:
+    # Format and escape each distinct value once; missing values render as empty cells
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    labels = list(map(str, uniques.tolist()))
+    if _NEEDS_ESCAPE.search("".join(labels)):
+        labels = list(map(html.escape, labels))
+    return np.array(labels + [""], dtype=object)[codes]
+
+
+def table_body_html(df: pd.DataFrame, columns: list[str]) -> str:
+    if df.empty or not columns:
+        return ""
+    df = df.reindex(columns=columns)
+    cells = [_column_cells(df[c]) for c in columns]
+    sep = "</td><td>"
+    return "<tr><td>" + "</td></tr><tr><td>".join(map(sep.join, zip(*cells))) + "</td></tr>"
+
+
+def table_html(df: pd.DataFrame, columns: list[str], headers: list[str]) -> str:
+    head = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+    return "\n".join([
+        "<div class='table-outer'>",
+        "<div class='table-wrap'>",
+        "<div class='table-scroll'>",
+        "<div class='table-inner'>",
+        "<table class='custom'>",
+        f"<thead><tr>{head}</tr></thead><tbody>",
+        table_body_html(df, columns),
+        "</tbody></table></div></div></div></div>",
+    ])
+
+
+def cached_table_html(scope, name: str, df: pd.DataFrame, columns: list[str], headers: list[str], version: tuple[int, int]) -> str:
+    # Memoized per data version of `scope`, so refreshes with unchanged data reuse the markup.
+    # version is cache.data_version(scope) captured before df was read: markup is only cached
+    # while that version is current, so it never outlives the rows it was built from
+    key = f"html:{name}:{tuple(columns)!r}:{tuple(headers)!r}"
+    return cache.get_or_load(scope, key, lambda: table_html(df, columns, headers), version)
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from services.standings import group_stage_matches, summarize_matches
+
+# Configurable tiebreak chains. Overall rules compare each team's whole group record;
+# head-to-head ("h2h_") rules only count the matches among the teams still tied, i.e. a
+# mini-league. Rules are applied in order to every tied block. When a head-to-head rule
+# splits a block, the head-to-head rules start over on each smaller block, as federation
+# regulations require. A group's pairwise results are kept in n x n matrices, so any
+# mini-league table is the row/column sums of a sub-matrix rather than a match rescan.
+
+TIEBREAK_RULES = {
+    "points": "Points",
+    "wins": "Matches won",
+    "sets_diff": "Set difference",
+    "games_diff": "Game difference",
+    "sets_won": "Sets won",
+    "games_won": "Games won",
+    "h2h_points": "Head-to-head points",
+    "h2h_wins": "Head-to-head matches won",
+    "h2h_sets_diff": "Head-to-head set difference",
+    "h2h_games_diff": "Head-to-head game difference",
+    "h2h_games_won": "Head-to-head games won",
+    "seed": "Seed (lower first)",
+}
+DEFAULT_TIEBREAK_CHAIN = ["points", "wins", "sets_diff", "games_diff"]
+WIN_POINTS = 3
+
+
+def normalize_rules(raw) -> tuple[list[str], bool]:
+    # Settings value -> (chain, reapply_h2h); unknown rule names are dropped
+    if isinstance(raw, list):
+        raw = {"chain": raw}
+    if not isinstance(raw, dict):
+        raw = {}
+    chain = []
+    for r in raw.get("chain") or []:
+        if r in TIEBREAK_RULES and r not in chain:
+            chain.append(r)
+    return chain or list(DEFAULT_TIEBREAK_CHAIN), bool(raw.get("reapply_h2h", True))
+
+
+def is_h2h(rule: str) -> bool:
+    return rule.startswith("h2h_")
+
+
+def has_h2h(chain: list[str] | None) -> bool:
+    # Only head-to-head rules need the match results; other chains can skip loading them
+    return any(is_h2h(r) for r in (chain or DEFAULT_TIEBREAK_CHAIN))
+
+
+class _Group:
+    def __init__(self, stats: dict[str, np.ndarray], pairs: dict[str, np.ndarray] | None, chain: list[str], reapply: bool):
+        self.stats = stats
+        self.pairs = pairs
+        self.chain = chain
+        self.reapply = reapply
+        # Where the run of head-to-head rules containing each rule starts
+        self.h2h_start = []
+        for k, rule in enumerate(chain):
+            if is_h2h(rule) and k > 0 and is_h2h(chain[k - 1]):
+                self.h2h_start.append(self.h2h_start[-1])
+            else:
+                self.h2h_start.append(k)
+
+    def values(self, rule: str, block: np.ndarray) -> np.ndarray:
+        # Higher is better for every rule
+        if not is_h2h(rule):
+            return self.stats[rule][block]
+        sub = np.ix_(block, block)
+        if rule == "h2h_points":
+            return self.pairs["points"][sub].sum(axis=1)
+        if rule == "h2h_wins":
+            return self.pairs["wins"][sub].sum(axis=1)
+        if rule == "h2h_sets_diff":
+            m = self.pairs["sets"][sub]
+            return m.sum(axis=1) - m.sum(axis=0)
+        if rule == "h2h_games_diff":
+            m = self.pairs["games"][sub]
+            return m.sum(axis=1) - m.sum(axis=0)
+        return self.pairs["games"][sub].sum(axis=1)
+
+    def order(self, block: np.ndarray, k: int = 0) -> list[int]:
+        if len(block) <= 1 or k >= len(self.chain):
+            return block.tolist()
+        rule = self.chain[k]
+        vals = self.values(rule, block)
+        idx = np.argsort(-vals, kind="stable")
+        block, vals = block[idx], vals[idx]
+        cuts = np.flatnonzero(vals[1:] != vals[:-1]) + 1
+        if len(cuts) == 0:
+            return self.order(block, k + 1)
+        out = []
+        for tier in np.split(block, cuts):
+            if len(tier) == 1:
+                out.append(int(tier[0]))
+            elif is_h2h(rule) and self.reapply:
+                out.extend(self.order(tier, self.h2h_start[k]))
+            else:
+                out.extend(self.order(tier, k + 1))
+        return out
+
+
+def pairwise_matrices(n: int, i: np.ndarray, j: np.ndarray, results: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    # points/wins/sets/games[a, b]: what team a earned against team b, for matches i[k] vs j[k]
+    pairs = {k: np.zeros((n, n), dtype="int64") for k in ("points", "wins", "sets", "games")}
+    s1, s2, g1, g2 = results["s1"], results["s2"], results["g1"], results["g2"]
+    w1 = (s1 > s2).astype("int64"); w2 = (s2 > s1).astype("int64")
+    for a, b, w, s, g in ((i, j, w1, s1, g1), (j, i, w2, s2, g2)):
+        np.add.at(pairs["wins"], (a, b), w)
+        np.add.at(pairs["points"], (a, b), WIN_POINTS * w)
+        np.add.at(pairs["sets"], (a, b), s)
+        np.add.at(pairs["games"], (a, b), g)
+    return pairs
+
+
+def seed_values(team_ids: np.ndarray, teams_df: pd.DataFrame | None) -> np.ndarray:
+    # Negated so that higher is better; unseeded teams rank after every seed
+    if teams_df is None or teams_df.empty or "seed" not in teams_df.columns:
+        return np.full(len(team_ids), -np.inf)
+    seeds = pd.to_numeric(teams_df["seed"], errors="coerce")
+    seeds.index = pd.to_numeric(teams_df["team_id"], errors="coerce").astype("float64")
+    seeds = seeds[~seeds.index.duplicated()]
+    vals = seeds.reindex(team_ids).to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(np.isnan(vals), -np.inf, -vals)
+
+
+def _group_results(team_ids: np.ndarray, codes: np.ndarray, matches_df: pd.DataFrame) -> dict[str, np.ndarray]:
+    # Completed group-stage matches between two teams of the same group, as standings positions,
+    # sorted by group so each group's matches are one contiguous slice
+    res = summarize_matches(group_stage_matches(matches_df))
+    pos = pd.Series(np.arange(len(team_ids)), index=team_ids)
+    pos = pos[~pos.index.duplicated()]
+    i = pos.reindex(res["team1_id"].to_numpy(dtype="float64", na_value=np.nan)).to_numpy()
+    j = pos.reindex(res["team2_id"].to_numpy(dtype="float64", na_value=np.nan)).to_numpy()
+    s1 = res["t1_sets"].to_numpy(); s2 = res["t2_sets"].to_numpy()
+    keep = ~(np.isnan(i) | np.isnan(j)) & ((s1 > 0) | (s2 > 0))
+    i, j = i[keep].astype("int64"), j[keep].astype("int64")
+    keep_idx = np.flatnonzero(keep)
+    same = codes[i] == codes[j]
+    i, j, keep_idx = i[same], j[same], keep_idx[same]
+    order = np.argsort(codes[i], kind="stable")
+    i, j, keep_idx = i[order], j[order], keep_idx[order]
+    return {
+        "i": i, "j": j, "code": codes[i],
+        "s1": s1[keep_idx], "s2": s2[keep_idx],
+        "g1": res["t1_games"].to_numpy()[keep_idx], "g2": res["t2_games"].to_numpy()[keep_idx],
+    }
+
+
+def apply_tiebreaks(standings: pd.DataFrame, matches_df: pd.DataFrame | None, chain: list[str] | None = None, reapply_h2h: bool = True, teams_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    # Re-orders each group of rank_standings output by the chain; group order is unchanged and
+    # fully tied teams keep their input order
+    if standings is None or standings.empty:
+        return standings
+    chain = chain or list(DEFAULT_TIEBREAK_CHAIN)
+    standings = standings.sort_values("group", kind="stable").reset_index(drop=True)
+    codes, _ = pd.factorize(standings["group"].astype(str))
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], bounds]); ends = np.concatenate([bounds, [len(codes)]])
+    team_ids = pd.to_numeric(standings["team_id"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+    stats = {}
+    for rule in chain:
+        if rule == "seed":
+            stats[rule] = seed_values(team_ids, teams_df)
+        elif not is_h2h(rule):
+            stats[rule] = pd.to_numeric(standings[rule], errors="coerce").fillna(0).to_numpy(dtype="float64")
+    results = None
+    if matches_df is not None and not matches_df.empty and any(is_h2h(r) for r in chain):
+        results = _group_results(team_ids, codes, matches_df)
+
+    order = []
+    for lo, hi in zip(starts, ends):
+        n = hi - lo
+        if n == 1:
+            order.append(lo)
+            continue
+        pairs = None
+        if results is not None:
+            a, b = np.searchsorted(results["code"], [codes[lo], codes[lo] + 1])
+            part = {k: v[a:b] for k, v in results.items()}
+            pairs = pairwise_matrices(n, part["i"] - lo, part["j"] - lo, part)
+        elif any(is_h2h(r) for r in chain):
+            pairs = {k: np.zeros((n, n), dtype="int64") for k in ("points", "wins", "sets", "games")}
+        group = _Group({k: v[lo:hi] for k, v in stats.items()}, pairs, chain, reapply_h2h)
+        order.extend(int(lo) + x for x in group.order(np.arange(n)))
+    return standings.iloc[order].reset_index(drop=True)
@@ -0,0 +1,341 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import text
+from data.db import engine, read_engine
+from services import cache, versions
+from services.settings import SETTINGS_SCOPE, get_json_setting, get_setting, set_json_setting, set_setting
+from services.import_export import MATCHES_COLUMNS, TEAMS_COLUMNS
+from services.standings import compute_standings
+from services.standings_store import load_standings
+from services.ranking import DEFAULT_NORMALIZATION, NORMALIZATIONS, before_latest_round, build_leaderboard
+from services.tiebreaks import apply_tiebreaks, has_h2h, normalize_rules
+from services.prediction import fit_strengths, team_strengths
+from services.simulation import open_fixtures, simulate_positions
+from services.clinch import qualification_status
+
+logger = logging.getLogger(__name__)
+
+_TEAM_SELECT = "SELECT team_id, team_name, player1, player2, \"group\", seed FROM teams"
+_MATCH_SELECT = "SELECT match_id, \"group\", team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2, stage, round_no FROM matches"
+
+
+def _reader(*scopes: str):
+    # The read engine, or the primary while a replica still lags behind a known write
+    return versions.fresh_engine(engine, read_engine, *scopes)
+
+
+def _read_scoped(sql: str, tid, columns: list[str]) -> pd.DataFrame:
+    try:
+        if tid is None:
+            return pd.read_sql(text(sql), _reader())
+        return pd.read_sql(text(sql + " WHERE tournament_id = :tid"), _reader(tournament_scope(tid)), params={"tid": tid})
+    except Exception:
+        return pd.DataFrame(columns=columns)
+
+
+def tournament_scope(tid) -> str:
+    return f"tournament:{tid if tid is not None else 'none'}"
+
+
+# Cache scope for data derived from every tournament; any tournament change invalidates it
+HISTORY_SCOPE = "history"
+DEFAULT_QUALIFIERS = 2
+
+
+def get_teams(tid) -> pd.DataFrame:
+    return cache.get_or_load(tournament_scope(tid), "teams", lambda: _read_scoped(_TEAM_SELECT, tid, TEAMS_COLUMNS))
+
+
+def get_matches(tid) -> pd.DataFrame:
+    return cache.get_or_load(tournament_scope(tid), "matches", lambda: _read_scoped(_MATCH_SELECT, tid, MATCHES_COLUMNS))
+
+
+def tiebreak_key(tid) -> str:
+    return f"tiebreak_rules:{tid}"
+
+
+def get_tiebreak_rules(tid) -> tuple[list[str], bool]:
+    return normalize_rules(get_json_setting(tiebreak_key(tid)))
+
+
+def set_tiebreak_rules(tid, chain: list[str], reapply_h2h: bool = True) -> None:
+    set_json_setting(tiebreak_key(tid), {"chain": list(chain), "reapply_h2h": bool(reapply_h2h)})
+    # Cached standings were ordered by the old chain
+    invalidate_tournament(tid)
+
+
+def _load_standings(tid) -> pd.DataFrame:
+    teams_df = get_teams(tid)
+    if teams_df.empty:
+        return pd.DataFrame()
+    standings = None
+    if tid is not None:
+        try:
+            with _reader(tournament_scope(tid)).connect() as conn:
+                standings = load_standings(conn, tid, teams_df)
+        except Exception:
+            standings = None
+    if standings is None:
+        # Aggregate not built yet; reads stay read-only and recompute from the matches
+        standings = compute_standings(teams_df, get_matches(tid))
+    chain, reapply = get_tiebreak_rules(tid)
+    try:
+        return apply_tiebreaks(standings, get_matches(tid) if has_h2h(chain) else None, chain, reapply, teams_df)
+    except Exception:
+        return standings
+
+
+def get_standings(tid) -> pd.DataFrame:
+    return cache.get_or_load(tournament_scope(tid), "standings", lambda: _load_standings(tid))
+
+
+def leaderboard_key(tid) -> str:
+    return f"leaderboard_normalization:{tid}"
+
+
+def get_leaderboard_normalization(tid) -> str:
+    value = get_setting(leaderboard_key(tid))
+    return value if value in NORMALIZATIONS else DEFAULT_NORMALIZATION
+
+
+def set_leaderboard_normalization(tid, normalization: str) -> None:
+    set_setting(leaderboard_key(tid), normalization if normalization in NORMALIZATIONS else DEFAULT_NORMALIZATION)
+
+
+def qualifiers_key(tid) -> str:
+    return f"qualifiers_per_group:{tid}"
+
+
+def get_qualifiers_per_group(tid) -> int:
+    try:
+        return max(1, int(get_setting(qualifiers_key(tid)) or DEFAULT_QUALIFIERS))
+    except (TypeError, ValueError):
+        return DEFAULT_QUALIFIERS
+
+
+def set_qualifiers_per_group(tid, n: int) -> None:
+    set_setting(qualifiers_key(tid), str(max(1, int(n))))
+
+
+def get_qualification_status(tid) -> pd.Series:
+    # team_id -> clinched / eliminated / alive for the tournament's qualifier count
+    top_n = get_qualifiers_per_group(tid)
+    return cache.get_or_load(
+        tournament_scope(tid), f"qualification_status:{top_n}",
+        lambda: qualification_status(get_standings(tid), get_matches(tid), top_n),
+    )
+
+
+def _load_leaderboard(tid, normalization: str) -> pd.DataFrame:
+    standings = get_standings(tid)
+    if standings.empty:
+        return build_leaderboard(standings)
+    teams_df, matches_df = get_teams(tid), get_matches(tid)
+    previous = None
+    earlier = before_latest_round(matches_df)
+    if earlier is not None:
+        chain, reapply = get_tiebreak_rules(tid)
+        try:
+            previous = apply_tiebreaks(compute_standings(teams_df, earlier), earlier, chain, reapply, teams_df)
+        except Exception:
+            previous = None
+    return build_leaderboard(standings, previous, normalization)
+
+
+def get_leaderboard(tid) -> pd.DataFrame:
+    # Keyed by normalization too, so changing it needs no invalidation of the tournament scope
+    normalization = get_leaderboard_normalization(tid)
+    return cache.get_or_load(tournament_scope(tid), f"leaderboard:{normalization}", lambda: _load_leaderboard(tid, normalization))
+
+
+def _load_tournament(tid) -> dict:
+    try:
+        tinfo = pd.read_sql(
+            text("SELECT name, location, start_date, end_date, description, icon_path FROM tournaments WHERE tournament_id = :tid"),
+            _reader(tournament_scope(tid)),
+            params={"tid": tid},
+        )
+    except Exception:
+        return {}
+    return tinfo.iloc[0].to_dict() if not tinfo.empty else {}
+
+
+def get_tournament(tid) -> dict:
+    if tid is None:
+        return {}
+    return cache.get_or_load(tournament_scope(tid), "tournament", lambda: _load_tournament(tid))
+
+
+def _load_player_strengths() -> pd.Series:
+    try:
+        # Every tournament feeds the fit, so the replica must hold every known version
+        reader = _reader()
+        teams = pd.read_sql(text("SELECT tournament_id, team_id, player1, player2 FROM teams WHERE tournament_id IS NOT NULL"), reader)
+        matches = pd.read_sql(
+            text("SELECT tournament_id, team1_id, team2_id, status, set1_t1, set1_t2, set2_t1, set2_t2, set3_t1, set3_t2 FROM matches WHERE status = 'Completed'"),
+            reader,
+        )
+        dates = pd.read_sql(text("SELECT tournament_id, start_date FROM tournaments"), reader).set_index("tournament_id")["start_date"]
+    except Exception:
+        return pd.Series(dtype="float64")
+    return fit_strengths(teams, matches, dates)
+
+
+def get_player_strengths() -> pd.Series:
+    # Fitted once per data version for the whole history
+    return cache.get_or_load(HISTORY_SCOPE, "player_strengths", _load_player_strengths)
+
+
+def count_open_fixtures(tid) -> int:
+    # Group matches still to decide, unscheduled round-robin pairs included
+    return cache.get_or_load(
+        tournament_scope(tid), "open_fixtures",
+        lambda: len(open_fixtures(get_standings(tid), get_matches(tid))[0]),
+    )
+
+
+# Qualification odds are simulated off the request path: renders only read the latest result
+# (tournament id -> (data version, odds)) and a stale one starts a background run
+_odds_lock = threading.Lock()
+_odds: dict = {}
+_odds_running: set = set()
+# tournament id -> (consecutive failures, monotonic time before which no run starts)
+_odds_failures: dict = {}
+ODDS_RETRY_SECONDS = 5
+ODDS_MAX_RETRY_SECONDS = 300
+
+
+def _simulate_odds(tid) -> tuple[tuple[int, int], pd.DataFrame]:
+    version = cache.data_version(tournament_scope(tid))
+    teams_df = get_teams(tid)
+    chain, _ = get_tiebreak_rules(tid)
+    strength = team_strengths(get_player_strengths(), teams_df)
+    return version, simulate_positions(get_standings(tid), get_matches(tid), strength, chain, teams_df)
+
+
+def _odds_worker(tid) -> None:
+    try:
+        while True:
+            if not count_open_fixtures(tid):
+                with _odds_lock:
+                    _odds_running.discard(tid)
+                return
+            version, odds = _simulate_odds(tid)
+            with _odds_lock:
+                _odds[tid] = (version, odds)
+                _odds_failures.pop(tid, None)
+                # A write landed while simulating; run again on the new data
+                if cache.data_version(tournament_scope(tid)) == version:
+                    _odds_running.discard(tid)
+                    return
+    except Exception:
+        logger.exception("Qualification odds simulation failed for tournament %s", tid)
+        with _odds_lock:
+            failures = _odds_failures.get(tid, (0, 0.0))[0] + 1
+            delay = min(ODDS_MAX_RETRY_SECONDS, ODDS_RETRY_SECONDS * 2 ** (failures - 1))
+            _odds_failures[tid] = (failures, time.monotonic() + delay)
+            _odds_running.discard(tid)
+
+
+def refresh_qualification_odds(tid) -> None:
+    # Starts a background simulation unless one is already running for the tournament, or the
+    # last one failed too recently
+    if tid is None:
+        return
+    with _odds_lock:
+        if tid in _odds_running or time.monotonic() < _odds_failures.get(tid, (0, 0.0))[1]:
+            return
+        _odds_running.add(tid)
+    threading.Thread(target=_odds_worker, args=(tid,), name=f"padel-odds-{tid}", daemon=True).start()
+
+
+def get_qualification_odds(tid) -> tuple[pd.DataFrame | None, bool]:
+    # Latest simulated odds (None before the first run) and whether they match the current data.
+    # Nothing left to play means nothing to simulate: the group order is final
+    if tid is None or not count_open_fixtures(tid):
+        return None, True
+    with _odds_lock:
+        hit = _odds.get(tid)
+    fresh = hit is not None and hit[0] == cache.data_version(tournament_scope(tid))
+    if not fresh:
+        refresh_qualification_odds(tid)
+    return (hit[1] if hit else None), fresh
+
+
+def qualification_odds_version(tid):
+    with _odds_lock:
+        hit = _odds.get(tid)
+    return hit[0] if hit else None
+
+
+def _bump(scope: str) -> None:
+    try:
+        with engine.begin() as conn:
+            versions.bump_version(conn, scope)
+    except Exception:
+        # Other processes keep serving their cached copy until the next successful bump
+        logger.exception("Could not bump the data version of %s", scope)
+
+
+def _drop_tournament(tid) -> None:
+    cache.invalidate(tournament_scope(tid), HISTORY_SCOPE)
+    refresh_qualification_odds(tid)
+
+
+def invalidate_tournament(tid) -> None:
+    # For writes made outside tournament_write. Bump first, so a reload straight after the
+    # invalidation knows to wait for the replica
+    _bump(tournament_scope(tid))
+    _drop_tournament(tid)
+
+
+def invalidate_all_data() -> None:
+    _bump(versions.ALL_SCOPE)
+    cache.invalidate_all()
+
+
+@contextmanager
+def tournament_write(tid):
+    # Transaction for a write to one tournament's data. The version bump commits with the
+    # write, so other processes never see one without the other; this process drops its
+    # cached copy once the write has committed
+    with engine.begin() as conn:
+        yield conn
+        versions.bump_version(conn, tournament_scope(tid))
+    _drop_tournament(tid)
+
+
+@contextmanager
+def all_data_write():
+    # Same for writes that can touch every tournament
+    with engine.begin() as conn:
+        yield conn
+        versions.bump_version(conn, versions.ALL_SCOPE)
+    cache.invalidate_all()
+
+
+def _on_remote_change(scope: str) -> None:
+    # Another server process wrote; drop what this process cached for that scope
+    if scope == versions.ALL_SCOPE:
+        cache.invalidate_all()
+    elif scope.startswith("tournament:"):
+        cache.invalidate(scope, HISTORY_SCOPE)
+    else:
+        cache.invalidate(scope)
+
+
+def start_change_watcher() -> None:
+    versions.add_listener(_on_remote_change)
+    versions.start_watcher(engine)
+
+
+def view_version(tid) -> tuple[int, int, int]:
+    # Everything the Overview renders depends on these three scopes
+    return (
+        versions.current_version(versions.ALL_SCOPE),
+        versions.current_version(SETTINGS_SCOPE),
+        versions.current_version(tournament_scope(tid)),
+    )
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from typing import Callable
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# Persisted per-scope data versions ("tournament:<id>", "settings", "*" for everything).
+# Writers bump a scope; every server process runs one watcher thread that keeps the
+# latest versions in memory, so viewer sessions compare versions without a query.
+
+ALL_SCOPE = "*"
+NOTIFY_CHANNEL = "padel_data"
+POLL_INTERVAL = float(os.getenv("PADEL_VERSION_POLL_SECONDS", "1.0"))
+USE_PG_NOTIFY = os.getenv("PADEL_PG_NOTIFY", "").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_known: dict[str, int] = {}
+_listeners: list[Callable[[str], None]] = []
+_watcher: threading.Thread | None = None
+
+
+def bump_version(conn: Connection, scope: str) -> int:
+    conn.execute(
+        text("INSERT INTO data_versions(scope, version) VALUES(:s, 1) ON CONFLICT(scope) DO UPDATE SET version = data_versions.version + 1"),
+        {"s": scope},
+    )
+    version = int(conn.execute(text("SELECT version FROM data_versions WHERE scope = :s"), {"s": scope}).scalar_one())
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_notify(:ch, :s)"), {"ch": NOTIFY_CHANNEL, "s": scope})
+    # The writing process already invalidated its own cache; don't let the watcher do it again
+    with _lock:
+        _known[scope] = max(_known.get(scope, 0), version)
+    return version
+
+
+def read_versions(conn: Connection) -> dict[str, int]:
+    rows = conn.execute(text("SELECT scope, version FROM data_versions")).all()
+    return {str(s): int(v or 0) for s, v in rows}
+
+
+def current_version(scope: str) -> int:
+    with _lock:
+        return _known.get(scope, 0)
+
+
+def fresh_engine(primary: Engine, replica: Engine, *scopes: str) -> Engine:
+    # A replica (DATABASE_READ_URL) can lag the primary. A cache load right after a write
+    # would keep its old rows for the whole version, so use the replica only once it holds
+    # every version this process knows for `scopes` (all scopes when none are given).
+    if replica is primary or replica.url == primary.url:
+        return replica
+    try:
+        with replica.connect() as conn:
+            stored = read_versions(conn)
+    except Exception:
+        return primary
+    with _lock:
+        wanted = {s: v for s, v in _known.items() if not scopes or s in scopes or s == ALL_SCOPE}
+    return replica if all(stored.get(s, 0) >= v for s, v in wanted.items()) else primary
+
+
+def add_listener(fn: Callable[[str], None]) -> None:
+    with _lock:
+        if fn not in _listeners:
+            _listeners.append(fn)
+
+
+def _apply(versions: dict[str, int]) -> None:
+    changed = []
+    with _lock:
+        for scope, version in versions.items():
+            if version > _known.get(scope, 0):
+                _known[scope] = version
+                changed.append(scope)
+        listeners = list(_listeners)
+    for scope in changed:
+        for fn in listeners:
+            try:
+                fn(scope)
+            except Exception:
+                pass
+
+
+def refresh(engine: Engine) -> None:
+    try:
+        with engine.connect() as conn:
+            _apply(read_versions(conn))
+    except Exception:
+        pass
+
+
+def _poll_loop(engine: Engine) -> None:
+    while True:
+        refresh(engine)
+        time.sleep(POLL_INTERVAL)
+
+
+def _listen_loop(engine: Engine) -> None:
+    # LISTEN/NOTIFY wakes the watcher immediately; the timeout doubles as a fallback poll
+    while True:
+        try:
+            raw = engine.raw_connection()
+            try:
+                pg = raw.driver_connection
+                pg.autocommit = True
+                pg.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while True:
+                    refresh(engine)
+                    for _ in pg.notifies(timeout=max(POLL_INTERVAL, 5.0), stop_after=1):
+                        pass
+            finally:
+                raw.close()
+        except Exception:
+            time.sleep(POLL_INTERVAL)
+
+
+def start_watcher(engine: Engine) -> None:
+    global _watcher
+    with _lock:
+        if _watcher is not None:
+            return
+        target = _listen_loop if USE_PG_NOTIFY and engine.dialect.name == "postgresql" else _poll_loop
+        _watcher = threading.Thread(target=target, args=(engine,), name="padel-version-watcher", daemon=True)
+    refresh(engine)
+    _watcher.start()
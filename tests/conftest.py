@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# data.db builds its engine at import time; never let a test touch the real padel.db
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="padel_tests_"), "padel.db"))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # A fresh SQLite database with the declared schema
+    from data.db import make_engine
+    from data.models import Base
+
+    eng = make_engine("sqlite:///" + str(tmp_path / "test.db"))
+    Base.metadata.create_all(eng)
+    yield eng
+    eng.dispose()
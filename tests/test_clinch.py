@@ -0,0 +1,84 @@
+import itertools
+import random
+import pandas as pd
+from services import clinch
+from services.clinch import ALIVE, CLINCHED, ELIMINATED, group_status, qualification_status
+from services.tiebreaks import WIN_POINTS
+
+
+def standings(points: list[int], group: str = "A", first_id: int = 1) -> pd.DataFrame:
+    # Already in group order; team ids first_id, first_id + 1, ...
+    ids = range(first_id, first_id + len(points))
+    return pd.DataFrame({"team_id": list(ids), "group": group, "points": points})
+
+
+def completed(pairs) -> pd.DataFrame:
+    # Team 1 won every listed match
+    return pd.DataFrame([
+        {"match_id": k, "team1_id": a, "team2_id": b, "status": "Completed", "stage": None, "set1_t1": 6, "set1_t2": 2}
+        for k, (a, b) in enumerate(pairs, start=1)
+    ])
+
+
+def brute_force(points: list[int], matches: list[tuple[int, int]], top_n: int) -> list[str]:
+    # Every outcome of the remaining matches; ties on points count against the team
+    finals = []
+    for winners in itertools.product(*matches):
+        pts = list(points)
+        for w in winners:
+            pts[w] += WIN_POINTS
+        finals.append(pts)
+    out = []
+    for t in range(len(points)):
+        if all(sum(p[k] > p[t] for k in range(len(p)) if k != t) >= top_n for p in finals):
+            out.append(ELIMINATED)
+        elif all(sum(p[k] >= p[t] for k in range(len(p)) if k != t) < top_n for p in finals):
+            out.append(CLINCHED)
+        else:
+            out.append(ALIVE)
+    return out
+
+
+def test_group_without_matches_is_alive():
+    status = qualification_status(standings([0, 0, 0, 0]), pd.DataFrame(), 2)
+    assert status.tolist() == [ALIVE] * 4
+
+
+def test_partial_round_robin_counts_unscheduled_pairs():
+    # 1 beat 2 and 3, 2 beat 3; no match of 4 exists yet, so 4 can still win all three, and
+    # 3 (one win at most) is the only team already out
+    status = qualification_status(standings([2 * WIN_POINTS, WIN_POINTS, 0, 0]), completed([(1, 2), (1, 3), (2, 3)]), 1)
+    assert status.tolist() == [ALIVE, ALIVE, ELIMINATED, ALIVE]
+
+
+def test_finished_group_is_settled_by_order():
+    pairs = list(itertools.combinations(range(1, 5), 2))
+    status = qualification_status(standings([3 * WIN_POINTS, 2 * WIN_POINTS, WIN_POINTS, 0]), completed(pairs), 2)
+    assert status.tolist() == [CLINCHED, CLINCHED, ELIMINATED, ELIMINATED]
+
+
+def test_groups_are_independent():
+    table = pd.concat([standings([WIN_POINTS, 0]), standings([0, 0, 0], group="B", first_id=3)], ignore_index=True)
+    status = qualification_status(table, completed([(1, 2)]), 1)
+    assert status.tolist() == [CLINCHED, ELIMINATED, ALIVE, ALIVE, ALIVE]
+
+
+def test_matches_brute_force(monkeypatch):
+    rng = random.Random(7)
+    for _ in range(300):
+        n = rng.randint(2, 6)
+        pairs = list(itertools.combinations(range(n), 2))
+        played = [p for p in pairs if rng.random() < 0.6]
+        left = [p for p in pairs if p not in played]
+        points = [0] * n
+        for a, b in played:
+            points[rng.choice((a, b))] += WIN_POINTS
+        top_n = rng.randint(1, n - 1)
+        expected = brute_force(points, left, top_n)
+        assert group_status(points, left, top_n) == expected
+        # The bound checks alone may only fall back to alive, never claim a wrong status
+        with monkeypatch.context() as m:
+            m.setattr(clinch, "MAX_EXACT_TEAMS", 0)
+            bounds = group_status(points, left, top_n)
+        assert all(got in (ALIVE, want) for got, want in zip(bounds, expected))
+
@@ -0,0 +1,71 @@
+import io
+import pandas as pd
+import pytest
+from services import import_export
+from data.repository import insert_rows, read_rows
+from services.import_export import IMPORT_CHUNK_ROWS, import_into_tournament, open_excel, read_excel
+
+N_MATCHES = IMPORT_CHUNK_ROWS + 700
+
+
+def workbook() -> bytes:
+    teams = pd.DataFrame({"team_id": [1, 2, 3, 4], "team_name": list("ABCD"), "player1": list("abcd"),
+                          "player2": list("efgh"), "group": "A", "seed": [1, 2, 3, 4]})
+    ids = range(1, N_MATCHES + 1)
+    matches = pd.DataFrame({
+        "match_id": ids, "group": "A", "team1_id": [1 + i % 2 for i in ids], "team2_id": [3 + i % 2 for i in ids],
+        "status": "Completed", "set1_t1": 6, "set1_t2": pd.Series([i % 5 for i in ids], dtype=object), "set2_t1": 6, "set2_t2": 4,
+        "set3_t1": None, "set3_t2": None,
+    })
+    matches.loc[10, "set1_t2"] = "six"
+    matches.loc[N_MATCHES - 1, "status"] = "Done"
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        teams.to_excel(writer, sheet_name="Teams", index=False)
+        matches.to_excel(writer, sheet_name="Matches", index=False)
+    return buf.getvalue()
+
+
+def test_chunked_import_matches_whole_frame_import(engine, tmp_path):
+    from data.db import make_engine
+    from data.models import Base
+
+    data = workbook()
+    other = make_engine("sqlite:///" + str(tmp_path / "other.db"))
+    Base.metadata.create_all(other)
+    results = []
+    for eng, chunked in ((engine, True), (other, False)):
+        with eng.begin() as conn:
+            insert_rows(conn, "tournaments", pd.DataFrame([{"tournament_id": 1, "name": "Open"}]))
+            if chunked:
+                with open_excel(io.BytesIO(data)) as (teams, matches, errors):
+                    summary = import_into_tournament(conn, 1, teams, matches)
+            else:
+                teams, matches, errors = read_excel(data)
+                summary = import_into_tournament(conn, 1, teams, matches)
+        with eng.connect() as conn:
+            stored = read_rows(conn, "matches").sort_values("match_id", ignore_index=True)
+            standings = read_rows(conn, "team_standings").sort_values("team_id", ignore_index=True)
+        results.append((summary, list(errors), stored, standings))
+    other.dispose()
+
+    (summary, errors, stored, standings), (summary2, errors2, stored2, standings2) = results
+    assert summary == summary2
+    assert summary["matches"]["inserted"] == N_MATCHES
+    assert errors == errors2 and len(errors) == 2
+    pd.testing.assert_frame_equal(stored, stored2)
+    pd.testing.assert_frame_equal(standings, standings2)
+    assert pd.isna(stored.loc[10, "set1_t2"])
+
+
+def test_streaming_reader_matches_calamine(monkeypatch):
+    # openpyxl streams big workbooks; calamine, when installed, only reads small ones
+    pytest.importorskip("python_calamine")
+    data = workbook()
+    monkeypatch.setattr(import_export, "CALAMINE_MAX_BYTES", 0)
+    streamed = read_excel(data)
+    monkeypatch.setattr(import_export, "CALAMINE_MAX_BYTES", len(data))
+    loaded = read_excel(data)
+    pd.testing.assert_frame_equal(streamed[0], loaded[0])
+    pd.testing.assert_frame_equal(streamed[1], loaded[1])
+    assert streamed[2] == loaded[2]
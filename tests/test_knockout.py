@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from data.repository import insert_rows, read_rows
+from services.knockout import advance_results, clear_bracket, generate_bracket
+from services.players import verify_players
+from services.standings_store import apply_match_changes, rebuild_standings, verify_standings
+
+TID = 1
+
+
+def seeded(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"team_id": range(1, n + 1), "group": ["A", "B", "C", "D"] * (n // 4) + ["A", "B", "C", "D"][: n % 4]})
+
+
+@pytest.mark.parametrize("n", [2, 3, 4, 5, 6, 7, 8, 9, 12, 16, 17])
+def test_bracket_sizes_with_byes(n):
+    bracket = generate_bracket(seeded(n), 100)
+    # One match per eliminated team; byes never become matches
+    assert len(bracket) == n - 1
+    assert bracket["match_id"].tolist() == list(range(100, 100 + n - 1))
+    entered = pd.concat([bracket["team1_id"], bracket["team2_id"]]).dropna().astype(int)
+    assert sorted(entered) == list(range(1, n + 1))
+    # Every match but the final feeds exactly one later side
+    fed = bracket.dropna(subset=["next_match_id"])
+    assert len(fed) == n - 2
+    assert not fed.duplicated(["next_match_id", "next_slot"]).any()
+    sides = bracket[["team1_id", "team2_id"]].notna().sum(axis=1) + bracket["match_id"].map(fed["next_match_id"].value_counts()).fillna(0)
+    assert (sides == 2).all()
+
+    with_third = generate_bracket(seeded(n), 1, third_place=True)
+    assert len(with_third) == n - 1 + (n >= 4)
+
+
+def play(conn, match_id, t1_games, t2_games):
+    prev = read_rows(conn, "matches", {"tournament_id": TID})
+    conn.execute(
+        text("UPDATE matches SET set1_t1=:a, set1_t2=:b, set2_t1=:a, set2_t2=:b, status='Completed' WHERE tournament_id=:tid AND match_id=:mid"),
+        {"a": t1_games, "b": t2_games, "tid": TID, "mid": match_id},
+    )
+    apply_match_changes(conn, TID, prev[prev["match_id"] == match_id], read_rows(conn, "matches", {"tournament_id": TID, "match_id": match_id}))
+    advance_results(conn, TID, [match_id])
+
+
+def cup(conn):
+    # Four teams straight into a bracket with a 3rd place match
+    insert_rows(conn, "tournaments", pd.DataFrame([{"tournament_id": TID, "name": "Cup"}]))
+    insert_rows(conn, "teams", pd.DataFrame({
+        "team_id": [1, 2, 3, 4], "team_name": list("ABCD"), "player1": list("abcd"), "player2": list("efgh"), "group": ["A", "B", "A", "B"],
+    }), {"tournament_id": TID})
+    insert_rows(conn, "matches", generate_bracket(seeded(4), 1, third_place=True), {"tournament_id": TID})
+    rebuild_standings(conn, TID)
+
+
+def test_corrected_semifinal_reopens_the_final(engine):
+    with engine.begin() as conn:
+        cup(conn)
+        ko = read_rows(conn, "matches", {"tournament_id": TID}).set_index("match_id")
+        semis = sorted(ko.index[ko["group"] == "Semifinal"])
+        final = int(ko.index[ko["group"] == "Final"][0])
+        third = int(ko.index[ko["group"] == "3rd Place"][0])
+
+        play(conn, semis[0], 6, 2)
+        play(conn, semis[1], 6, 3)
+        play(conn, final, 6, 4)
+        ko = read_rows(conn, "matches", {"tournament_id": TID}).set_index("match_id")
+        winner_before = ko.at[semis[0], "team1_id"]
+        assert ko.at[final, "team1_id"] == winner_before and ko.at[final, "status"] == "Completed"
+
+        # The first semifinal was entered the wrong way round
+        play(conn, semis[0], 2, 6)
+        ko = read_rows(conn, "matches", {"tournament_id": TID}).set_index("match_id")
+        assert ko.at[final, "team1_id"] == ko.at[semis[0], "team2_id"]
+        assert ko.at[third, "team1_id"] == winner_before
+        assert ko.at[final, "status"] == "Scheduled"
+        assert ko.loc[final, ["set1_t1", "set1_t2", "set2_t1", "set2_t2"]].isna().all()
+        assert verify_players(conn).empty
+
+
+def test_regenerate_after_results_takes_them_back(engine):
+    with engine.begin() as conn:
+        cup(conn)
+        ko = read_rows(conn, "matches", {"tournament_id": TID}).set_index("match_id")
+        for mid in sorted(ko.index[ko["group"] == "Semifinal"]):
+            play(conn, mid, 6, 2)
+        play(conn, int(ko.index[ko["group"] == "Final"][0]), 6, 3)
+        assert conn.execute(text("SELECT COUNT(*) FROM player_rating_events")).scalar_one() > 0
+
+        # What "Generate Bracket" with "Replace existing knockout matches" does
+        assert clear_bracket(conn, TID) == len(ko)
+        insert_rows(conn, "matches", generate_bracket(seeded(4), len(ko) + 1, third_place=True), {"tournament_id": TID})
+        assert verify_players(conn).empty
+        assert verify_standings(conn, TID).empty
+        assert conn.execute(text("SELECT COUNT(*) FROM player_rating_events")).scalar_one() == 0
+        assert conn.execute(text("SELECT COALESCE(SUM(matches), 0) FROM player_stats")).scalar_one() == 0
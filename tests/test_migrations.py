@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from sqlalchemy import inspect, text
+from data.db import make_engine
+from data.migrations import migrate
+from data.repository import read_rows
+
+
+def old_database(path, active=None):
+    # teams as the pre-key schema left them: nullable tournament_id, plus a column the model lacks
+    eng = make_engine("sqlite:///" + str(path))
+    with eng.begin() as conn:
+        conn.execute(text('CREATE TABLE teams (tournament_id INTEGER, team_id INTEGER, team_name TEXT, player1 TEXT, '
+                          'player2 TEXT, "group" TEXT, seed INTEGER, notes TEXT, PRIMARY KEY (tournament_id, team_id))'))
+        conn.execute(text("INSERT INTO teams VALUES (NULL, 1, 'A', 'p1', 'p2', 'A', 1, 'left-handed'), (2, 1, 'B', 'p3', 'p4', 'A', 1, NULL)"))
+        conn.execute(text("CREATE TABLE settings (key VARCHAR(255) PRIMARY KEY, value TEXT)"))
+        if active is not None:
+            conn.execute(text("INSERT INTO settings VALUES ('active_tournament_id', :v)"), {"v": str(active)})
+    return eng
+
+
+def test_rebuild_backfills_keys_and_keeps_extra_columns(tmp_path):
+    eng = old_database(tmp_path / "old.db", active=5)
+    assert "teams" in migrate(eng)
+    with eng.connect() as conn:
+        cols = {c["name"]: c for c in inspect(conn).get_columns("teams")}
+        rows = read_rows(conn, "teams").sort_values("tournament_id")
+    assert not cols["tournament_id"]["nullable"]
+    assert rows["tournament_id"].tolist() == [2, 5]
+    assert rows["notes"].tolist() == [None, "left-handed"]
+    assert migrate(eng) == []
+    eng.dispose()
+
+
+def test_rebuild_refuses_rows_without_tournament(tmp_path):
+    eng = old_database(tmp_path / "old.db")
+    with pytest.raises(RuntimeError, match="no tournament_id"):
+        migrate(eng)
+    with eng.connect() as conn:
+        assert len(read_rows(conn, "teams")) == 2
+    eng.dispose()
+
@@ -0,0 +1,120 @@
+import pandas as pd
+from sqlalchemy import text
+from data.repository import insert_rows, read_rows, sync_rows
+from services.import_export import import_into_tournament
+from services.players import INITIAL_RATING, apply_roster_changes, read_team_rosters, verify_players
+from services.standings_store import apply_match_changes, delete_tournament
+
+TEAMS = pd.DataFrame({
+    "team_id": [1, 2, 3, 4], "team_name": list("ABCD"),
+    "player1": ["Ana", "Bea", "Cris", "Dani"], "player2": ["Eva", "Fran", "Gus", "Hugo"], "group": "A",
+})
+
+
+def matches(tid: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "match_id": [1, 2, 3, 4], "group": "A", "team1_id": [1, 3, 1, 2], "team2_id": [2, 4, 3, 4],
+        "status": ["Completed", "Completed", "Completed", "Scheduled"],
+        "set1_t1": [6, 2, 7, None], "set1_t2": [3, 6, 5, None], "set2_t1": [6, 4, 6, None], "set2_t2": [4, 6, 1, None],
+    })
+
+
+def seed(conn):
+    insert_rows(conn, "tournaments", pd.DataFrame({"tournament_id": [1, 2], "name": ["Spring", "Summer"],
+                                                   "start_date": pd.to_datetime(["2026-03-01", "2026-06-01"])}))
+    for tid in (1, 2):
+        insert_rows(conn, "teams", TEAMS, {"tournament_id": tid})
+        insert_rows(conn, "matches", matches(tid), {"tournament_id": tid})
+        apply_match_changes(conn, tid, None, read_rows(conn, "matches", {"tournament_id": tid}))
+
+
+def check(conn):
+    # Stats match a full recompute, and every rating is the sum of the events that made it
+    assert verify_players(conn).empty
+    rows = conn.execute(text(
+        "SELECT s.player_id, s.rating, s.rated_matches, COALESCE(SUM(e.delta), 0), COUNT(e.delta) "
+        "FROM player_stats s LEFT JOIN player_rating_events e ON e.player_id = s.player_id "
+        "GROUP BY s.player_id, s.rating, s.rated_matches"
+    )).all()
+    assert rows
+    for _, rating, rated, total, n in rows:
+        assert abs(rating - (INITIAL_RATING + total)) < 1e-6 and rated == n
+
+
+def save_teams(conn, tid, edited):
+    # What "Save Team Changes" does
+    old = read_team_rosters(conn, tid)
+    sync_rows(conn, "teams", edited, "team_id", {"tournament_id": tid})
+    apply_roster_changes(conn, tid, old)
+
+
+def test_match_edits_keep_player_stats_consistent(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        check(conn)
+        prev = read_rows(conn, "matches", {"tournament_id": 1})
+        edited = prev.drop(columns="tournament_id")
+        edited.loc[edited["match_id"] == 1, ["set1_t1", "set1_t2", "set2_t1", "set2_t2"]] = [3, 6, 4, 6]
+        edited.loc[edited["match_id"] == 4, ["status", "set1_t1", "set1_t2", "set2_t1", "set2_t2"]] = ["Completed", 6, 0, 6, 0]
+        edited = edited[edited["match_id"] != 2]
+        _, saved = sync_rows(conn, "matches", edited, "match_id", {"tournament_id": 1}, stored=prev)
+        apply_match_changes(conn, 1, prev, saved)
+        check(conn)
+
+
+def test_roster_changes_move_career_stats(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        # Ana is replaced by Zoe in team 1 of the first tournament only
+        save_teams(conn, 1, TEAMS.assign(player1=["Zoe", "Bea", "Cris", "Dani"]))
+        check(conn)
+        ana = conn.execute(text("SELECT s.matches FROM player_stats s JOIN players p ON p.player_id = s.player_id WHERE p.name_key = 'ana'")).scalar_one()
+        zoe = conn.execute(text("SELECT s.matches FROM player_stats s JOIN players p ON p.player_id = s.player_id WHERE p.name_key = 'zoe'")).scalar_one()
+        assert (ana, zoe) == (2, 2)
+
+        # Renaming only the spelling keeps the same player
+        save_teams(conn, 1, TEAMS.assign(player1=["ZOE ", "Bea", "Cris", "Dani"]))
+        check(conn)
+
+        # A deleted team's matches no longer count for its players
+        old = read_team_rosters(conn, 2)
+        conn.execute(text("DELETE FROM teams WHERE tournament_id = 2 AND team_id = 4"))
+        apply_roster_changes(conn, 2, old)
+        check(conn)
+
+
+def test_import_with_new_rosters(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        teams = TEAMS.assign(player2=["Eva", "Fran", "Iris", "Hugo"])
+        updated = matches(2)
+        updated.loc[3, ["status", "set1_t1", "set1_t2", "set2_t1", "set2_t2"]] = ["Completed", 6, 2, 6, 2]
+        import_into_tournament(conn, 2, teams, updated)
+        check(conn)
+
+
+def test_deleted_tournament_leaves_career_stats(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        # Without cascade the teams and matches stay, but only existing tournaments count
+        delete_tournament(conn, 1, cascade=False)
+        check(conn)
+        assert conn.execute(text("SELECT COUNT(*) FROM matches WHERE tournament_id = 1")).scalar_one() == 4
+        delete_tournament(conn, 2)
+        assert verify_players(conn).empty
+        assert conn.execute(text("SELECT COUNT(*) FROM player_rating_events")).scalar_one() == 0
+        assert conn.execute(text("SELECT COUNT(*) FROM matches WHERE tournament_id = 2")).scalar_one() == 0
+
+
+def test_roster_changes_mark_ratings_dirty_outside_settings(engine):
+    from services.rating_job import run_ratings
+
+    with engine.begin() as conn:
+        seed(conn)
+        run_ratings(conn)
+        assert conn.execute(text("SELECT COUNT(*) FROM ratings_dirty")).scalar_one() == 0
+        save_teams(conn, 2, TEAMS.assign(player2=["Eva", "Fran", "Gus", "Ivan"]))
+        assert conn.execute(text("SELECT tournament_id FROM ratings_dirty")).scalars().all() == [2]
+        assert conn.execute(text("SELECT COUNT(*) FROM settings")).scalar_one() == 0
+        assert run_ratings(conn)["status"] == "recomputed"
+        assert conn.execute(text("SELECT COUNT(*) FROM ratings_dirty")).scalar_one() == 0
@@ -0,0 +1,21 @@
+import pandas as pd
+from services.schedule_optimizer import build_slots, optimize_schedule
+
+
+def test_plan_is_one_based_and_keeps_fixed_matches_in_place():
+    slots = build_slots([{"date": "2026-05-02", "start": "09:00", "end": "12:00", "courts": 2}], 60)
+    teams = pd.DataFrame({"team_id": range(1, 9), "player1": [f"p{i}" for i in range(1, 9)], "player2": None})
+    todo = pd.DataFrame({"match_id": [2, 3, 4, 5], "team1_id": [1, 5, 7, 3], "team2_id": [3, 6, 8, 4]})
+    # Under way on court 1 in the first slot
+    fixed = pd.DataFrame({"match_id": [1], "team1_id": [1], "team2_id": [2], "status": ["In Progress"],
+                          "court": [1], "slot": [1], "scheduled_at": [pd.Timestamp("2026-05-02 09:00")]})
+    plan, report = optimize_schedule(todo, teams, slots, min_rest=0, time_budget=0.2, seed=1, fixed=fixed)
+
+    assert report["feasible"] and report["fixed"] == 1
+    assert plan["slot"].between(1, len(slots)).all()
+    assert (plan["scheduled_at"] == slots["start"].to_numpy()[plan["slot"] - 1]).all()
+    # One court is left next to the fixed match, and team 1 can't play twice at once
+    first = plan[plan["slot"] == 1]
+    assert len(first) <= 1 and (first["court"] != 1).all()
+    assert not ((plan["slot"] == 1) & (plan["match_id"] == 2)).any()
+    assert not plan.duplicated(["slot", "court"]).any()
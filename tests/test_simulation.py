@@ -0,0 +1,71 @@
+import pandas as pd
+from services import tournament_data
+from services.simulation import open_fixtures, qualify_probability, simulate_positions
+
+
+def standings(groups: dict) -> pd.DataFrame:
+    # groups: group -> team ids, nobody has played yet
+    rows = [{"team_id": t, "group": g, "points": 0} for g, ids in groups.items() for t in ids]
+    return pd.DataFrame(rows)
+
+
+def fixtures(matches) -> pd.DataFrame:
+    # matches: (team1, team2, status, set1 games or None)
+    rows = []
+    for k, (a, b, status, set1) in enumerate(matches, start=1):
+        s1, s2 = set1 or (None, None)
+        rows.append({"match_id": k, "team1_id": a, "team2_id": b, "status": status, "stage": None, "set1_t1": s1, "set1_t2": s2})
+    return pd.DataFrame(rows)
+
+
+def pairs(table, matches_df):
+    ids = table["team_id"].to_numpy()
+    i, j = open_fixtures(table, matches_df)
+    return sorted(tuple(sorted((int(ids[a]), int(ids[b])))) for a, b in zip(i, j))
+
+
+def test_open_fixtures_adds_unscheduled_round_robin_pairs():
+    table = standings({"A": [1, 2, 3], "B": [4, 5]})
+    played = fixtures([(1, 2, "Completed", (6, 3)), (3, 1, "Scheduled", None)])
+    # 1-2 is decided, 1-3 is scheduled, 2-3 and 4-5 are not even generated yet
+    assert pairs(table, played) == [(1, 3), (2, 3), (4, 5)]
+    assert pairs(table, None) == [(1, 2), (1, 3), (2, 3), (4, 5)]
+    # A tournament without teams has no standings columns at all
+    assert len(open_fixtures(pd.DataFrame(), played)[0]) == 0
+
+
+def test_finished_group_has_no_open_fixtures():
+    table = standings({"A": [1, 2, 3]})
+    done = fixtures([(1, 2, "Completed", (6, 3)), (2, 3, "Completed", (6, 3)), (1, 3, "Completed", (3, 6))])
+    assert pairs(table, done) == []
+
+
+def test_group_without_matches_is_not_certain():
+    odds = simulate_positions(standings({"A": [1, 2, 3, 4]}), None, n_sims=500)
+    qualify = qualify_probability(odds, 2)
+    assert ((qualify > 0.05) & (qualify < 0.95)).all()
+
+
+def test_failed_simulation_is_logged_and_backs_off(monkeypatch, caplog):
+    def boom(tid):
+        raise RuntimeError("no data")
+
+    monkeypatch.setattr(tournament_data, "count_open_fixtures", lambda tid: 3)
+    monkeypatch.setattr(tournament_data, "_simulate_odds", boom)
+    monkeypatch.setattr(tournament_data, "_odds_failures", {})
+    tournament_data._odds_running.add(99)
+    tournament_data._odds_worker(99)
+    assert "no data" in caplog.text
+    assert 99 not in tournament_data._odds_running
+    assert tournament_data._odds_failures[99][0] == 1
+    # Within the backoff window no new run starts
+    tournament_data.refresh_qualification_odds(99)
+    assert 99 not in tournament_data._odds_running
+
+
+def test_no_open_fixtures_means_no_simulation(monkeypatch):
+    started = []
+    monkeypatch.setattr(tournament_data, "count_open_fixtures", lambda tid: 0)
+    monkeypatch.setattr(tournament_data, "refresh_qualification_odds", started.append)
+    assert tournament_data.get_qualification_odds(7) == (None, True)
+    assert started == []
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from services.standings import compute_standings
+
+
+def reference_standings(teams_df: pd.DataFrame, matches_df: pd.DataFrame) -> pd.DataFrame:
+    # The original row-by-row implementation, kept as the specification
+    base = teams_df[["team_id", "team_name", "group"]].copy()
+    cols = ["played", "wins", "losses", "sets_won", "sets_lost", "games_won", "games_lost", "points"]
+    totals = {t: dict.fromkeys(cols, 0) for t in base["team_id"]}
+    for _, m in matches_df.iterrows():
+        t1, t2 = m.get("team1_id"), m.get("team2_id")
+        if pd.isna(t1) or pd.isna(t2):
+            continue
+        t1, t2 = int(t1), int(t2)
+        s1 = s2 = g1 = g2 = 0
+        for a, b in [(m.get(f"set{k}_t1"), m.get(f"set{k}_t2")) for k in (1, 2, 3)]:
+            if pd.isna(a) or pd.isna(b):
+                continue
+            s1 += a > b
+            s2 += b > a
+            g1 += int(a); g2 += int(b)
+        if s1 == 0 and s2 == 0:
+            continue
+        for t, sw, sl, gw, gl in ((t1, s1, s2, g1, g2), (t2, s2, s1, g2, g1)):
+            if t in totals:
+                row = totals[t]
+                row["played"] += 1
+                row["sets_won"] += sw; row["sets_lost"] += sl
+                row["games_won"] += gw; row["games_lost"] += gl
+        if s1 != s2:
+            w, l = (t1, t2) if s1 > s2 else (t2, t1)
+            if w in totals:
+                totals[w]["wins"] += 1; totals[w]["points"] += 3
+            if l in totals:
+                totals[l]["losses"] += 1
+    for c in cols:
+        base[c] = [totals[t][c] for t in base["team_id"]]
+    base["sets_diff"] = base["sets_won"] - base["sets_lost"]
+    base["games_diff"] = base["games_won"] - base["games_lost"]
+    return base.sort_values(
+        by=["group", "points", "wins", "sets_diff", "games_diff"], ascending=[True, False, False, False, False]
+    ).reset_index(drop=True)
+
+
+def random_tournament(rng: np.random.Generator):
+    n_teams = int(rng.integers(2, 13))
+    teams = pd.DataFrame({
+        "team_id": np.arange(1, n_teams + 1),
+        "team_name": [f"T{i}" for i in range(1, n_teams + 1)],
+        "group": rng.choice(["A", "B", "C"], n_teams),
+    })
+    n_matches = int(rng.integers(0, 30))
+    # Unknown team ids, missing teams, half-entered sets and unplayed matches all occur
+    ids = rng.integers(0, n_teams + 3, size=(n_matches, 2)).astype("float64")
+    ids[rng.random((n_matches, 2)) < 0.05] = np.nan
+    matches = pd.DataFrame({"match_id": np.arange(1, n_matches + 1), "team1_id": ids[:, 0], "team2_id": ids[:, 1]})
+    for k in (1, 2, 3):
+        for side in ("t1", "t2"):
+            vals = rng.integers(0, 8, n_matches).astype("float64")
+            vals[rng.random(n_matches) < 0.3] = np.nan
+            matches[f"set{k}_{side}"] = vals
+    return teams, matches
+
+
+def test_compute_standings_matches_row_by_row_reference():
+    rng = np.random.default_rng(7)
+    for _ in range(300):
+        teams, matches = random_tournament(rng)
+        got = compute_standings(teams, matches)
+        want = reference_standings(teams, matches)
+        pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+def test_compute_standings_without_matches():
+    teams = pd.DataFrame({"team_id": [1, 2], "team_name": ["A1", "A2"], "group": ["A", "A"]})
+    out = compute_standings(teams, pd.DataFrame(columns=["team1_id", "team2_id"]))
+    assert out["played"].tolist() == [0, 0]
+    assert out["points"].tolist() == [0, 0]
+
+
+def test_knockout_matches_do_not_count():
+    teams = pd.DataFrame({"team_id": [1, 2], "team_name": ["A1", "A2"], "group": ["A", "A"]})
+    matches = pd.DataFrame({
+        "team1_id": [1, 1], "team2_id": [2, 2], "stage": [None, "knockout"],
+        "set1_t1": [6, 6], "set1_t2": [2, 2], "set2_t1": [6, 6], "set2_t2": [3, 3],
+    })
+    out = compute_standings(teams, matches).set_index("team_id")
+    assert out.loc[1, "played"] == 1
+    assert out.loc[1, "points"] == 3
@@ -0,0 +1,115 @@
+import pandas as pd
+from sqlalchemy import text
+from data.repository import insert_rows, read_rows, sync_rows
+from services.import_export import import_into_tournament
+from services.standings_store import (
+    apply_match_changes, backfill_standings, list_tournaments, load_standings, read_stored_standings, rebuild_standings,
+    seed_standings, verify_standings,
+)
+
+TID = 1
+
+
+def seed(conn):
+    insert_rows(conn, "tournaments", pd.DataFrame([{"tournament_id": TID, "name": "Open"}]))
+    insert_rows(conn, "teams", pd.DataFrame({
+        "team_id": [1, 2, 3, 4], "team_name": ["A", "B", "C", "D"],
+        "player1": ["Ana", "Bea", "Cris", "Dani"], "player2": ["Eva", "Fer", "Gil", "Hugo"],
+        "group": ["A", "A", "A", "A"], "seed": [1, 2, 3, 4],
+    }), {"tournament_id": TID})
+    insert_rows(conn, "matches", pd.DataFrame({
+        "match_id": [1, 2, 3], "group": "A", "team1_id": [1, 3, 1], "team2_id": [2, 4, 3],
+        "status": ["Completed", "Completed", "Scheduled"],
+        "set1_t1": [6, 2, None], "set1_t2": [3, 6, None], "set2_t1": [6, 4, None], "set2_t2": [4, 6, None],
+    }), {"tournament_id": TID})
+
+
+def save_matches(conn, edited):
+    # What the Scoring tab does on "Save Match Changes"
+    prev = read_rows(conn, "matches", {"tournament_id": TID})
+    _, saved = sync_rows(conn, "matches", edited, "match_id", {"tournament_id": TID}, stored=prev)
+    apply_match_changes(conn, TID, prev, saved)
+
+
+def test_duplicate_and_unkeyed_rows_count_once(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        rebuild_standings(conn, TID)
+        edited = read_rows(conn, "matches", {"tournament_id": TID}).drop(columns="tournament_id")
+        dup = edited.iloc[[0]].assign(set1_t1=1, set1_t2=6, set2_t1=2, set2_t2=6)
+        blank = edited.iloc[[1]].assign(match_id=None)
+        save_matches(conn, pd.concat([edited, dup, blank], ignore_index=True))
+        assert verify_standings(conn, TID).empty
+
+
+def test_aggregate_follows_edits_deletes_and_imports(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        rebuild_standings(conn, TID)
+        assert verify_standings(conn, TID).empty
+
+        edited = read_rows(conn, "matches", {"tournament_id": TID}).drop(columns="tournament_id")
+        # Reverse a result and score the open match
+        edited.loc[edited["match_id"] == 1, ["set1_t1", "set1_t2"]] = [1, 6]
+        edited.loc[edited["match_id"] == 1, ["set2_t1", "set2_t2"]] = [2, 6]
+        edited.loc[edited["match_id"] == 3, ["status", "set1_t1", "set1_t2", "set2_t1", "set2_t2"]] = ["Completed", 7, 5, 6, 0]
+        save_matches(conn, edited)
+        assert verify_standings(conn, TID).empty
+
+        # Delete a played match
+        save_matches(conn, edited[edited["match_id"] != 2])
+        assert verify_standings(conn, TID).empty
+
+        teams = pd.DataFrame({"team_id": [5], "team_name": ["E"], "player1": ["Ivo"], "player2": ["Juan"], "group": ["A"], "seed": [5]})
+        matches = pd.DataFrame({
+            "match_id": [1, 4], "group": "A", "team1_id": [1, 5], "team2_id": [2, 4], "status": "Completed",
+            "set1_t1": [6, 6], "set1_t2": [0, 1], "set2_t1": [6, 6], "set2_t2": [0, 1], "set3_t1": None, "set3_t2": None,
+        })
+        import_into_tournament(conn, TID, teams, matches)
+        assert verify_standings(conn, TID).empty
+        stored = read_stored_standings(conn, TID).set_index("team_id")
+        assert stored.loc[5, "points"] == 3
+        assert stored.loc[1, "points"] == 6
+
+
+def test_load_standings_only_reads(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        teams = read_rows(conn, "teams", {"tournament_id": TID})
+        # Never built: the read path reports it instead of writing
+        assert load_standings(conn, TID, teams) is None
+        assert read_stored_standings(conn, TID).empty
+        assert not verify_standings(conn, TID).empty
+
+        assert backfill_standings(conn) == [TID]
+        assert verify_standings(conn, TID).empty
+        # Built once; later runs find nothing to do
+        assert backfill_standings(conn) == []
+        out = load_standings(conn, TID, teams).set_index("team_id")
+        assert out.loc[1, "points"] == 3 and out.loc[4, "points"] == 3
+
+
+def test_teams_without_matches_count_as_built(engine):
+    with engine.begin() as conn:
+        seed(conn)
+        conn.execute(text("DELETE FROM matches"))
+        backfill_standings(conn)
+        teams = read_rows(conn, "teams", {"tournament_id": TID})
+        assert load_standings(conn, TID, teams) is not None
+        assert backfill_standings(conn) == []
+
+
+def test_new_teams_get_zero_rows(engine):
+    with engine.begin() as conn:
+        insert_rows(conn, "tournaments", pd.DataFrame([{"tournament_id": 2, "name": "New"}]))
+        teams = pd.DataFrame({"team_id": [1, 2], "team_name": ["A", "B"], "player1": ["Ana", "Bea"], "player2": ["Eva", "Fer"], "group": "A"})
+        # An import with teams only, then a team added by hand
+        import_into_tournament(conn, 2, teams, pd.DataFrame(columns=["match_id"]))
+        insert_rows(conn, "teams", teams.assign(team_id=3, team_name="C").head(1), {"tournament_id": 2})
+        assert seed_standings(conn, 2) == 1
+        assert seed_standings(conn, 2) == 0
+        stored = load_standings(conn, 2, read_rows(conn, "teams", {"tournament_id": 2}))
+        assert stored is not None and sorted(stored["team_id"]) == [1, 2, 3]
+        # The CLI walks every tournament, not only those with matches
+        assert list_tournaments(conn) == [2]
+        assert verify_standings(conn, 2).empty
@@ -0,0 +1,22 @@
+import pandas as pd
+from services import cache
+from services.table_html import cached_table_html
+
+SCOPE = "tournament:test-html"
+
+
+def render(df, version):
+    return cached_table_html(SCOPE, "t", df, ["Team"], ["Team"], version)
+
+
+def test_markup_never_outlives_its_rows():
+    old, new = pd.DataFrame({"Team": ["Old"]}), pd.DataFrame({"Team": ["New"]})
+    before = cache.data_version(SCOPE)
+    assert "Old" in render(old, before)
+    # A write lands after a render read the old rows but before it built the markup
+    cache.invalidate(SCOPE)
+    assert "Old" in render(old, before)
+    after = cache.data_version(SCOPE)
+    assert "New" in render(new, after)
+    # Unchanged data at the current version reuses the markup
+    assert "New" in render(pd.DataFrame({"Team": ["Ignored"]}), after)
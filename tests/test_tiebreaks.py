@@ -0,0 +1,68 @@
+import pandas as pd
+from services.standings import compute_standings
+from services.tiebreaks import DEFAULT_TIEBREAK_CHAIN, apply_tiebreaks, has_h2h
+
+SETS = ["set1_t1", "set1_t2", "set2_t1", "set2_t2", "set3_t1", "set3_t2"]
+
+
+def matches(results) -> pd.DataFrame:
+    # results: (team1, team2, [(games1, games2), ...]) per completed group match
+    rows = []
+    for k, (a, b, sets) in enumerate(results, start=1):
+        row = {"match_id": k, "group": "A", "team1_id": a, "team2_id": b, "status": "Completed", "stage": None}
+        flat = [g for s in sets for g in s] + [None] * (6 - 2 * len(sets))
+        row.update(dict(zip(SETS, flat)))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def table(games_won: dict) -> pd.DataFrame:
+    # Everyone level on points, so the chain has to decide
+    ids = sorted(games_won)
+    return pd.DataFrame({"team_id": ids, "team_name": [str(t) for t in ids], "group": "A", "points": 6, "games_won": [games_won[t] for t in ids]})
+
+
+# 1 beat 2 by 12 games, 2 beat 3 by 8, 3 beat 1 by 4: all three have 3 head-to-head points.
+# The head-to-head game difference puts 1 first (+8) and leaves 2 and 3 level (-4 each).
+CYCLE = matches([(1, 2, [(6, 0), (6, 0)]), (2, 3, [(6, 2), (6, 2)]), (3, 1, [(6, 4), (6, 4)])])
+CHAIN = ["points", "h2h_points", "h2h_games_diff", "games_won"]
+
+
+def order(standings, matches_df, chain, reapply=True, teams_df=None):
+    return apply_tiebreaks(standings, matches_df, chain, reapply, teams_df)["team_id"].tolist()
+
+
+def test_h2h_restarts_on_the_smaller_block():
+    # Restarting on {2, 3}: 2 won their match, whatever the overall games
+    assert order(table({1: 30, 2: 20, 3: 40}), CYCLE, CHAIN) == [1, 2, 3]
+
+
+def test_without_restart_the_chain_moves_on():
+    assert order(table({1: 30, 2: 20, 3: 40}), CYCLE, CHAIN, reapply=False) == [1, 3, 2]
+
+
+def test_restart_goes_back_to_the_start_of_the_h2h_run_only():
+    # The restart begins at h2h_points, not at the overall rules before it
+    standings = table({1: 30, 2: 20, 3: 40}).assign(wins=[2, 1, 3])
+    assert order(standings, CYCLE, ["points", "h2h_points", "h2h_games_diff", "wins"]) == [1, 2, 3]
+    # After a split by an overall rule the h2h rules only count the matches within {1, 2}
+    standings = table({1: 20, 2: 30, 3: 40}).assign(wins=[2, 2, 3])
+    assert order(standings, CYCLE, ["wins", "h2h_points", "games_won"]) == [3, 1, 2]
+
+
+def test_h2h_without_results_falls_through():
+    assert order(table({1: 30, 2: 20, 3: 40}), None, CHAIN) == [3, 1, 2]
+    unplayed = CYCLE.assign(status="Scheduled", **{c: None for c in SETS})
+    assert order(table({1: 30, 2: 20, 3: 40}), unplayed, CHAIN) == [3, 1, 2]
+
+
+def test_seed_rule_and_default_chain():
+    teams = pd.DataFrame({"team_id": [1, 2, 3], "seed": [2, None, 1]})
+    assert order(table({1: 1, 2: 1, 3: 1}), None, ["points", "seed"], teams_df=teams) == [3, 1, 2]
+    teams_df = pd.DataFrame({"team_id": [1, 2, 3], "team_name": list("abc"), "group": "A"})
+    ranked = compute_standings(teams_df, CYCLE)
+    assert apply_tiebreaks(ranked, CYCLE, DEFAULT_TIEBREAK_CHAIN)["team_id"].tolist() == ranked["team_id"].tolist()
+
+
+def test_has_h2h():
+    assert has_h2h(CHAIN) and not has_h2h(DEFAULT_TIEBREAK_CHAIN) and not has_h2h(None)
@@ -0,0 +1,26 @@
+from data.db import make_engine
+from data.models import Base
+from services import versions
+
+
+def test_lagging_replica_falls_back_to_primary(tmp_path, monkeypatch):
+    monkeypatch.setattr(versions, "_known", {})
+    primary = make_engine("sqlite:///" + str(tmp_path / "primary.db"))
+    replica = make_engine("sqlite:///" + str(tmp_path / "replica.db"), readonly=True)
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(make_engine("sqlite:///" + str(tmp_path / "replica.db")))
+    scope = "tournament:test-lag"
+
+    assert versions.fresh_engine(primary, replica, scope) is replica
+    with primary.begin() as conn:
+        versions.bump_version(conn, scope)
+    # The replica has not seen the write yet
+    assert versions.fresh_engine(primary, replica, scope) is primary
+    assert versions.fresh_engine(primary, replica, "settings") is replica
+    assert versions.fresh_engine(primary, replica) is primary
+
+    with make_engine("sqlite:///" + str(tmp_path / "replica.db")).begin() as conn:
+        versions.bump_version(conn, scope)
+    assert versions.fresh_engine(primary, replica, scope) is replica
+    # The local read pool on the same file never lags
+    assert versions.fresh_engine(primary, make_engine("sqlite:///" + str(tmp_path / "primary.db"), readonly=True)).url == primary.url